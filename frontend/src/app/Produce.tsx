@@ -1396,6 +1396,7 @@ export default function ProducePage() {
           uploadId,
           presetId: selectedScreenTitlePresetId,
           text,
+          maxPreviewWidth: Math.round(360 * Math.min(3, window.devicePixelRatio || 1)),
         }),
       })
       if (!res.ok) {
@@ -838,6 +838,7 @@ export default function ScreenTitlePresetsPage() {
         text: buildStylePreviewText(draft.description),
         frame: { width: 1080, height: 1920 },
         preset: draft,
+        maxPreviewWidth: Math.round(360 * Math.min(3, window.devicePixelRatio || 1)),
       }
       const res = await fetch('/api/screen-title-presets/preview', {
         method: 'POST',
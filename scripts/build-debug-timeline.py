@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 import argparse
+import concurrent.futures
+import hashlib
+import heapq
 import json
+import mmap
+import os
 import re
-from datetime import datetime, timezone
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 
 HTTP_OPERATION_BY_PRESET = {
@@ -69,23 +77,11 @@ def parse_iso_utc(s: Optional[str]) -> Optional[datetime]:
 def parse_window_bounds(start_iso: Optional[str], end_iso: Optional[str]) -> (Optional[int], Optional[int]):
     start_dt = parse_iso_utc(start_iso)
     end_dt = parse_iso_utc(end_iso)
-    start_us = int(start_dt.timestamp() * 1_000_000) if start_dt else None
-    end_us = int(end_dt.timestamp() * 1_000_000) if end_dt else None
+    start_us = micros(start_dt) if start_dt else None
+    end_us = micros(end_dt) if end_dt else None
     return start_us, end_us
 
 
-def jaeger_span_in_window(span: Dict[str, Any], start_us: Optional[int], end_us: Optional[int]) -> bool:
-    try:
-        us = int(span.get("startTime"))
-    except Exception:
-        return False
-    if start_us is not None and us < start_us:
-        return False
-    if end_us is not None and us > end_us:
-        return False
-    return True
-
-
 def load_json(path: Path) -> Optional[Dict[str, Any]]:
     if not path.exists():
         return None
@@ -105,42 +101,273 @@ def span_tags_map(span: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
-def build_preset_counts(art_dir: Path, start_us: Optional[int], end_us: Optional[int]) -> List[List[str]]:
+# Only these tags are read by the reports and the timeline; everything else in a
+# span is dropped when it enters the store.
+SPAN_TAG_KEYS = (
+    "app.operation",
+    "app.operation_detail",
+    "app.message_id",
+    "app.message_session_id",
+    "app.journey_id",
+    "app.journey_rejected_count",
+    "app.journey_drop_reason",
+    "span.kind",
+)
+
+
+class Span(NamedTuple):
+    preset: str
+    trace: int  # position of the trace in its jaeger-<preset>.json
+    trace_id: Any
+    start_us: int
+    operation_name: str
+    tags: Dict[str, Any]
+    app_operations: Tuple[str, ...]  # every app.operation tag value, duplicates kept
+
+
+def jaeger_preset(path: Path) -> str:
+    return path.name[len("jaeger-"):-len(".json")]
+
+
+def normalize_jaeger_trace(preset: str, trace_idx: int, tr: Dict[str, Any]) -> List[Span]:
+    out: List[Span] = []
+    trace_id = tr.get("traceID")
+    for span in tr.get("spans", []) or []:
+        try:
+            us = int(span.get("startTime"))
+        except Exception:
+            continue
+        tags = span_tags_map(span)
+        out.append(Span(
+            preset=preset,
+            trace=trace_idx,
+            trace_id=trace_id,
+            start_us=us,
+            operation_name=str(span.get("operationName", "")),
+            tags={k: tags[k] for k in SPAN_TAG_KEYS if k in tags},
+            app_operations=tuple(
+                str(t.get("value", "")) for t in (span.get("tags") or []) if t.get("key") == "app.operation"
+            ),
+        ))
+    return out
+
+
+def normalize_jaeger_spans(preset: str, payload: Dict[str, Any]) -> List[Span]:
+    out: List[Span] = []
+    for trace_idx, tr in enumerate(payload.get("data", []) or []):
+        out.extend(normalize_jaeger_trace(preset, trace_idx, tr))
+    return out
+
+
+# Streaming reader for Jaeger exports: the top-level object is walked key by key
+# and each element of "data" (one trace) is decoded on its own from a sliding
+# text buffer, so only one trace's object graph is alive at a time. Anything it
+# doesn't expect (a second "data" key, a non-array "data", malformed JSON) makes
+# the caller fall back to the whole-file loader, which keeps its old semantics.
+JAEGER_STREAM_CHUNK = 1 << 20
+JSON_WS = " \t\n\r"
+
+
+class JsonStream:
+    def __init__(self, f: Any) -> None:
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        # Read at least as much as is buffered, so re-decoding a value that spans
+        # many chunks stays linear overall.
+        chunk = self.f.read(max(JAEGER_STREAM_CHUNK, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in JSON_WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                v, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number ending exactly at the buffer edge may continue in the next chunk.
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return v
+
+
+def iter_jaeger_traces(path: Path) -> Iterator[Any]:
+    with path.open("r", encoding="utf-8") as f:
+        r = JsonStream(f)
+        r.expect("{")
+        seen_data = False
+        if r.peek() == "}":
+            r.pos += 1
+        else:
+            while True:
+                key = r.value()
+                if not isinstance(key, str):
+                    raise ValueError("invalid key")
+                r.expect(":")
+                if key == "data":
+                    if seen_data:
+                        raise ValueError("duplicate data key")
+                    seen_data = True
+                    if r.peek() == "[":
+                        r.pos += 1
+                        if r.peek() == "]":
+                            r.pos += 1
+                        else:
+                            while True:
+                                yield r.value()
+                                c = r.peek()
+                                r.pos += 1
+                                if c == "]":
+                                    break
+                                if c != ",":
+                                    raise ValueError("invalid data array")
+                    elif r.value():
+                        raise ValueError("data is not an array")
+                else:
+                    r.value()
+                c = r.peek()
+                r.pos += 1
+                if c == "}":
+                    break
+                if c != ",":
+                    raise ValueError("invalid object")
+        if r.peek() != "":
+            raise ValueError("trailing data")
+
+
+def load_jaeger_spans(path: Path, stream: bool = True) -> Optional[List[Span]]:
+    # None when the export is missing or unreadable, like load_json. A file only
+    # contributes once it has been read to the end.
+    if not path.exists():
+        return None
+    preset = jaeger_preset(path)
+    if stream:
+        try:
+            out: List[Span] = []
+            for trace_idx, tr in enumerate(iter_jaeger_traces(path)):
+                out.extend(normalize_jaeger_trace(preset, trace_idx, tr))
+            return out
+        except Exception:
+            pass
+    payload = load_json(path)
+    if not payload:
+        return None
+    return normalize_jaeger_spans(preset, payload)
+
+
+class SpanStore:
+    # In-window spans from every jaeger-*.json, in file/trace/span order, plus
+    # position indexes. Built once per run; the TSV builders and the timeline all
+    # read from it instead of re-loading the exports.
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self.by_preset: Dict[str, List[int]] = {}
+        self.by_operation_name: Dict[str, List[int]] = {}
+        self.by_app_operation: Dict[str, List[int]] = {}
+        self.by_message_id: Dict[str, List[int]] = {}
+        self.by_trace_id: Dict[Any, List[int]] = {}
+
+    def add(self, spans: Iterable[Span], start_us: Optional[int], end_us: Optional[int]) -> None:
+        for s in spans:
+            if start_us is not None and s.start_us < start_us:
+                continue
+            if end_us is not None and s.start_us > end_us:
+                continue
+            i = len(self.spans)
+            self.spans.append(s)
+            self.by_preset.setdefault(s.preset, []).append(i)
+            self.by_operation_name.setdefault(s.operation_name, []).append(i)
+            self.by_app_operation.setdefault(str(s.tags.get("app.operation", "")), []).append(i)
+            mid = s.tags.get("app.message_id")
+            if mid is not None:
+                self.by_message_id.setdefault(str(mid), []).append(i)
+            self.by_trace_id.setdefault(s.trace_id, []).append(i)
+
+    def select(
+        self,
+        preset: Optional[str] = None,
+        operation_name: Optional[str] = None,
+        app_operation: Optional[str] = None,
+    ) -> List[Span]:
+        lists = []
+        if preset is not None:
+            lists.append(self.by_preset.get(preset, []))
+        if operation_name is not None:
+            lists.append(self.by_operation_name.get(operation_name, []))
+        if app_operation is not None:
+            lists.append(self.by_app_operation.get(app_operation, []))
+        if not lists:
+            return list(self.spans)
+        lists.sort(key=len)
+        rest = [set(l) for l in lists[1:]]
+        return [self.spans[i] for i in lists[0] if all(i in r for r in rest)]
+
+    def traces(self, preset: str) -> Dict[int, List[Span]]:
+        out: Dict[int, List[Span]] = {}
+        for i in self.by_preset.get(preset, []):
+            s = self.spans[i]
+            out.setdefault(s.trace, []).append(s)
+        return out
+
+
+def load_span_store(
+    art_dir: Path,
+    start_us: Optional[int],
+    end_us: Optional[int],
+    stream: bool = True,
+    cache: Optional["ParseCache"] = None,
+) -> SpanStore:
+    store = SpanStore()
+    for p in art_dir.glob("jaeger-*.json"):
+        spans = load_jaeger_source(p, stream, start_us, end_us, cache)
+        if not spans:
+            continue
+        store.add(spans, start_us, end_us)
+    return store
+
+
+def build_preset_counts(store: SpanStore) -> List[List[str]]:
     rows: List[List[str]] = [["preset", "trace_count"]]
     for preset in PRESET_FILES:
-        p = art_dir / f"jaeger-{preset}.json"
-        payload = load_json(p)
-        if not payload:
-            rows.append([preset, "0"])
-            continue
-        count = 0
-        for tr in payload.get("data", []) or []:
-            spans = tr.get("spans", []) or []
-            if any(jaeger_span_in_window(s, start_us, end_us) for s in spans):
-                count += 1
-        rows.append([preset, str(count)])
+        rows.append([preset, str(len(store.traces(preset)))])
     return rows
 
 
-def build_http_operation_counts(art_dir: Path, start_us: Optional[int], end_us: Optional[int]) -> List[List[str]]:
+def build_http_operation_counts(store: SpanStore) -> List[List[str]]:
     rows: List[List[str]] = [["preset", "http_operation", "trace_count"]]
     for preset, operation_name in HTTP_OPERATION_BY_PRESET.items():
-        p = art_dir / f"jaeger-{preset}.json"
-        payload = load_json(p)
-        if not payload:
-            rows.append([preset, operation_name, "0"])
-            continue
         count = 0
-        for tr in payload.get("data", []) or []:
-            spans = [
-                s for s in (tr.get("spans", []) or [])
-                if jaeger_span_in_window(s, start_us, end_us)
-            ]
+        for spans in store.traces(preset).values():
             if preset == "payment_webhook_ingest" or preset == "payment_subscription_action":
-                if any(
-                    any((t.get("key") == "app.operation" and str(t.get("value", "")) == operation_name) for t in (s.get("tags") or []))
-                    for s in spans
-                ):
+                if any(operation_name in s.app_operations for s in spans):
                     count += 1
             else:
                 def op_match(op_name: str) -> bool:
@@ -159,41 +386,34 @@ def build_http_operation_counts(art_dir: Path, start_us: Optional[int], end_us:
                         return op.startswith("HTTP GET /my/support")
                     return False
 
-                if any(op_match(str(s.get("operationName", ""))) for s in spans):
+                if any(op_match(s.operation_name) for s in spans):
                     count += 1
         rows.append([preset, operation_name, str(count)])
     return rows
 
 
-def build_message_id_counts(art_dir: Path, start_us: Optional[int], end_us: Optional[int]) -> List[List[str]]:
+def message_id_sort_key(key: str) -> Tuple[int, str]:
+    return (int(key) if key.isdigit() else 10**9, key)
+
+
+def build_message_id_counts(store: SpanStore) -> List[List[str]]:
     rows: List[List[str]] = [["message_id", "decide", "fetch", "event"]]
-    signal_to_preset = {
-        "decide": "message_decide",
-        "fetch": "message_fetch",
-        "event": "message_event",
+    preset_to_signal = {
+        "message_decide": "decide",
+        "message_fetch": "fetch",
+        "message_event": "event",
     }
     agg: Dict[str, Dict[str, int]] = {}
-    for signal, preset in signal_to_preset.items():
-        p = art_dir / f"jaeger-{preset}.json"
-        payload = load_json(p)
-        if not payload:
-            continue
-        expected_op = HTTP_OPERATION_BY_PRESET[preset]
-        for tr in payload.get("data", []) or []:
-            for span in tr.get("spans", []) or []:
-                if not jaeger_span_in_window(span, start_us, end_us):
-                    continue
-                if str(span.get("operationName", "")) != expected_op:
-                    continue
-                tags = span_tags_map(span)
-                mid = tags.get("app.message_id")
-                if mid is None:
-                    continue
-                key = str(mid)
-                if key not in agg:
-                    agg[key] = {"decide": 0, "fetch": 0, "event": 0}
-                agg[key][signal] += 1
-    for key in sorted(agg.keys(), key=lambda x: (int(x) if x.isdigit() else 10**9, x)):
+    for key, idxs in store.by_message_id.items():
+        for i in idxs:
+            span = store.spans[i]
+            signal = preset_to_signal.get(span.preset)
+            if signal is None or span.operation_name != HTTP_OPERATION_BY_PRESET[span.preset]:
+                continue
+            if key not in agg:
+                agg[key] = {"decide": 0, "fetch": 0, "event": 0}
+            agg[key][signal] += 1
+    for key in sorted(agg.keys(), key=message_id_sort_key):
         v = agg[key]
         rows.append([key, str(v["decide"]), str(v["fetch"]), str(v["event"])])
     return rows
@@ -206,37 +426,25 @@ def to_int(v: Any, default: int = 0) -> int:
         return default
 
 
-def build_journey_decision_counts(art_dir: Path, start_us: Optional[int], end_us: Optional[int]) -> List[List[str]]:
+def build_journey_decision_counts(store: SpanStore) -> List[List[str]]:
     rows: List[List[str]] = [["metric", "value"]]
-    p = art_dir / "jaeger-message_decide.json"
-    payload = load_json(p)
-    if not payload:
-        rows.extend([
-            ["journey_selected", "0"],
-            ["journey_rejected", "0"],
-            ["journey_drop_reason_present", "0"],
-        ])
-        return rows
-
     selected = 0
     rejected = 0
     drop_reason_present = 0
 
-    for tr in payload.get("data", []) or []:
-        for span in tr.get("spans", []) or []:
-            if not jaeger_span_in_window(span, start_us, end_us):
-                continue
-            if str(span.get("operationName", "")) != HTTP_OPERATION_BY_PRESET["message_decide"]:
-                continue
-            tags = span_tags_map(span)
-            if str(tags.get("app.operation", "")) != "feed.message.decide":
-                continue
-            if tags.get("app.journey_id") not in (None, ""):
-                selected += 1
-            if to_int(tags.get("app.journey_rejected_count"), 0) > 0:
-                rejected += 1
-            if tags.get("app.journey_drop_reason") not in (None, ""):
-                drop_reason_present += 1
+    decide_spans = store.select(
+        preset="message_decide",
+        operation_name=HTTP_OPERATION_BY_PRESET["message_decide"],
+        app_operation="feed.message.decide",
+    )
+    for span in decide_spans:
+        tags = span.tags
+        if tags.get("app.journey_id") not in (None, ""):
+            selected += 1
+        if to_int(tags.get("app.journey_rejected_count"), 0) > 0:
+            rejected += 1
+        if tags.get("app.journey_drop_reason") not in (None, ""):
+            drop_reason_present += 1
 
     rows.append(["journey_selected", str(selected)])
     rows.append(["journey_rejected", str(rejected)])
@@ -284,13 +492,100 @@ def write_tsv(path: Path, rows: List[List[str]]) -> None:
     path.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
 
-def parse_console_events(console_path: Path, start_iso: Optional[str], end_iso: Optional[str]) -> List[Dict[str, Any]]:
+# Windowed log reading: the log is memory-mapped and binary-searched for the first
+# record stamped at or after the window start (less LOG_SEEK_SLACK_US), and the
+# parsers stop at the first record stamped past the window end (plus the slack).
+# Work is proportional to the window, not the file. The slack absorbs the small
+# reorderings concurrent writers produce; the probes assume the log is otherwise
+# in time order. Records are still filtered against the exact window.
+LOG_SEEK_SLACK_US = 5_000_000
+
+
+def micros(dt: datetime) -> int:
+    return int(dt.timestamp() * 1_000_000)
+
+
+def next_stamped_line(mm: Any, pos: int, stamp: Callable[[str], Optional[int]]) -> Optional[Tuple[int, int]]:
+    # (offset, micros) of the first stamped line starting at or after pos.
+    if pos > 0 and mm[pos - 1:pos] != b"\n":
+        nl = mm.find(b"\n", pos)
+        if nl < 0:
+            return None
+        pos = nl + 1
+    size = len(mm)
+    while pos < size:
+        nl = mm.find(b"\n", pos)
+        end = size if nl < 0 else nl + 1
+        us = stamp(mm[pos:end].decode("utf-8", errors="ignore").strip("\r\n"))
+        if us is not None:
+            return pos, us
+        pos = end
+    return None
+
+
+def seek_stamped(mm: Any, target_us: int, stamp: Callable[[str], Optional[int]]) -> int:
+    # Smallest line offset whose next stamped line is stamped >= target_us.
+    lo, hi = 0, len(mm)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        found = next_stamped_line(mm, mid, stamp)
+        if found is None or found[1] >= target_us:
+            hi = mid
+        else:
+            lo = found[0] + 1
+    if lo > 0 and mm[lo - 1:lo] != b"\n":
+        nl = mm.find(b"\n", lo)
+        lo = len(mm) if nl < 0 else nl + 1
+    return lo
+
+
+def iter_log_lines(
+    path: Path,
+    start_us: Optional[int],
+    stamp: Callable[[str], Optional[int]],
+    seek: bool = True,
+) -> Iterator[str]:
+    # Lines as read_text().splitlines() would give them, starting near start_us.
+    if not seek:
+        yield from path.read_text(encoding="utf-8", errors="ignore").splitlines()
+        return
+    with path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0 if start_us is None else seek_stamped(mm, start_us - LOG_SEEK_SLACK_US, stamp)
+            while pos < size:
+                nl = mm.find(b"\n", pos)
+                end = size if nl < 0 else nl + 1
+                yield from mm[pos:end].decode("utf-8", errors="ignore").splitlines()
+                pos = end
+
+
+def console_line_us(line: str) -> Optional[int]:
+    try:
+        rec = json.loads(line)
+    except Exception:
+        return None
+    ts = rec.get("ts") if isinstance(rec, dict) else None
+    ts_dt = parse_iso_utc(str(ts)) if ts else None
+    return micros(ts_dt) if ts_dt else None
+
+
+def parse_console_events(
+    console_path: Path,
+    start_iso: Optional[str],
+    end_iso: Optional[str],
+    seek: bool = True,
+) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     start_dt = parse_iso_utc(start_iso)
     end_dt = parse_iso_utc(end_iso)
     if not console_path.exists():
         return out
-    for line in console_path.read_text(encoding="utf-8", errors="ignore").splitlines():
+    start_us = micros(start_dt) if start_dt else None
+    stop_us = micros(end_dt) + LOG_SEEK_SLACK_US if end_dt else None
+    for line in iter_log_lines(console_path, start_us, console_line_us, seek):
         if not line.strip():
             continue
         try:
@@ -301,6 +596,8 @@ def parse_console_events(console_path: Path, start_iso: Optional[str], end_iso:
         if not ts:
             continue
         ts_dt = parse_iso_utc(str(ts))
+        if seek and stop_us is not None and ts_dt and micros(ts_dt) > stop_us:
+            break
         if start_dt and ts_dt and ts_dt < start_dt:
             continue
         if end_dt and ts_dt and ts_dt > end_dt:
@@ -326,13 +623,34 @@ HEADER_RE = re.compile(r"^\[(?P<ts>[\d\-:\.\s\+]+)\]\s+(?P<level>[A-Z]+):\s+(?P<
 KV_RE = re.compile(r'^\s*(?P<k>[a-zA-Z0-9_.-]+):\s*"?(?P<v>[^"]+?)"?\s*$')
 
 
-def parse_terminal_events(terminal_path: Path, start_iso: Optional[str], end_iso: Optional[str]) -> List[Dict[str, Any]]:
+def parse_terminal_ts(raw_ts: str) -> Optional[datetime]:
+    try:
+        # Format example: 2026-03-20 05:58:56.174 +0000
+        return datetime.strptime(raw_ts, "%Y-%m-%d %H:%M:%S.%f %z").astimezone(timezone.utc)
+    except Exception:
+        return None
+
+
+def terminal_line_us(line: str) -> Optional[int]:
+    m = HEADER_RE.match(line)
+    dt = parse_terminal_ts(m.group("ts")) if m else None
+    return micros(dt) if dt else None
+
+
+def parse_terminal_events(
+    terminal_path: Path,
+    start_iso: Optional[str],
+    end_iso: Optional[str],
+    seek: bool = True,
+) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     start_dt = parse_iso_utc(start_iso)
     end_dt = parse_iso_utc(end_iso)
     if not terminal_path.exists():
         return out
-    lines = terminal_path.read_text(encoding="utf-8", errors="ignore").splitlines()
+    start_us = micros(start_dt) if start_dt else None
+    stop_us = micros(end_dt) + LOG_SEEK_SLACK_US if end_dt else None
+    lines = iter_log_lines(terminal_path, start_us, terminal_line_us, seek)
     current: Optional[Dict[str, Any]] = None
 
     def flush() -> None:
@@ -383,14 +701,10 @@ def parse_terminal_events(terminal_path: Path, start_iso: Optional[str], end_iso
         m = HEADER_RE.match(line)
         if m:
             flush()
-            raw_ts = m.group("ts")
-            ts_iso = None
-            try:
-                # Format example: 2026-03-20 05:58:56.174 +0000
-                dt = datetime.strptime(raw_ts, "%Y-%m-%d %H:%M:%S.%f %z")
-                ts_iso = dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
-            except Exception:
-                pass
+            dt = parse_terminal_ts(m.group("ts"))
+            if seek and stop_us is not None and dt and micros(dt) > stop_us:
+                break
+            ts_iso = dt.isoformat().replace("+00:00", "Z") if dt else None
             current = {
                 "ts_iso": ts_iso,
                 "level": m.group("level"),
@@ -409,61 +723,90 @@ def parse_terminal_events(terminal_path: Path, start_iso: Optional[str], end_iso
     return out
 
 
-def parse_jaeger_events(art_dir: Path, start_us: Optional[int], end_us: Optional[int]) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    for p in art_dir.glob("jaeger-*.json"):
-        payload = load_json(p)
-        if not payload:
+def parse_jaeger_events(store: SpanStore) -> Iterator[Dict[str, Any]]:
+    # Built lazily, in start-time order (store order among equal start times).
+    return (e for _us, e in jaeger_timeline(store))
+
+
+def jaeger_timeline(store: SpanStore) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    order = sorted(range(len(store.spans)), key=lambda i: store.spans[i].start_us)
+    for i in order:
+        span = store.spans[i]
+        name = span.operation_name
+        tags = span.tags
+        op = str(tags.get("app.operation", "") or "")
+        op_detail = str(tags.get("app.operation_detail", "") or "")
+        keep = (
+            name.startswith("HTTP ") and (
+                "/api/feed/message-" in name
+                or "/api/admin/message-analytics" in name
+                or "/api/admin/messages" in name
+                or "/admin/message-analytics" in name
+                or "/admin/messages" in name
+                or "/checkout/" in name
+                or "/api/payments/paypal/webhook" in name
+            )
+        ) or op.startswith("feed.message") or op.startswith("message.analytics") or op.startswith("payments.")
+        if not keep:
             continue
-        for tr in payload.get("data", []) or []:
-            trace_id = tr.get("traceID")
-            for span in tr.get("spans", []) or []:
-                if not jaeger_span_in_window(span, start_us, end_us):
-                    continue
-                name = str(span.get("operationName", ""))
-                tags = span_tags_map(span)
-                op = str(tags.get("app.operation", "") or "")
-                op_detail = str(tags.get("app.operation_detail", "") or "")
-                keep = (
-                    name.startswith("HTTP ") and (
-                        "/api/feed/message-" in name
-                        or "/api/admin/message-analytics" in name
-                        or "/api/admin/messages" in name
-                        or "/admin/message-analytics" in name
-                        or "/admin/messages" in name
-                        or "/checkout/" in name
-                        or "/api/payments/paypal/webhook" in name
-                    )
-                ) or op.startswith("feed.message") or op.startswith("message.analytics") or op.startswith("payments.")
-                if not keep:
-                    continue
-                out.append({
-                    "ts": iso_from_jaeger_micros(span.get("startTime")),
-                    "source": "jaeger",
-                    "signal": name or op or op_detail or "span",
-                    "message_id": tags.get("app.message_id"),
-                    "message_session_id": tags.get("app.message_session_id"),
-                    "trace_id": trace_id,
-                    "context": {
-                        "app_operation": op or None,
-                        "app_operation_detail": op_detail or None,
-                        "span_kind": tags.get("span.kind"),
-                    },
-                })
-    return out
+        yield span.start_us, {
+            "ts": iso_from_jaeger_micros(span.start_us),
+            "source": "jaeger",
+            "signal": name or op or op_detail or "span",
+            "message_id": tags.get("app.message_id"),
+            "message_session_id": tags.get("app.message_session_id"),
+            "trace_id": span.trace_id,
+            "context": {
+                "app_operation": op or None,
+                "app_operation_detail": op_detail or None,
+                "span_kind": tags.get("span.kind"),
+            },
+        }
+
+
+# The timeline is a k-way merge of per-source streams keyed by integer
+# microseconds, written as it is merged. Ties keep source order (console,
+# terminal, jaeger), then each source's own order. Timestamps that don't parse
+# sort after every parsed one.
+TIMELINE_TOP_N = 80
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+UNPARSED_TS_KEY = 1 << 62
+
+
+def timeline_key(ts: Any) -> int:
+    dt = parse_iso_utc(str(ts))
+    if dt is None:
+        return UNPARSED_TS_KEY
+    return (dt - UNIX_EPOCH) // timedelta(microseconds=1)
+
 
+def timeline_source(events: Iterable[Dict[str, Any]], ordered: bool = False) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    # (key, event) pairs in time order. Log sources are mostly in order already,
+    # which the stable sort handles in near-linear time; ordered=True trusts the input.
+    keyed = ((timeline_key(e["ts"]), e) for e in events if e.get("ts"))
+    if ordered:
+        yield from keyed
+        return
+    rows = list(keyed)
+    rows.sort(key=itemgetter(0))
+    yield from rows
 
-def write_timeline(art_dir: Path, events: List[Dict[str, Any]]) -> None:
-    clean = [e for e in events if e.get("ts")]
-    clean.sort(key=lambda x: x["ts"])
+
+def write_timeline(art_dir: Path, sources: List[Iterator[Tuple[int, Dict[str, Any]]]], jaeger_base: str = "") -> None:
+    top: List[Dict[str, Any]] = []
     ndjson_path = art_dir / "timeline.ndjson"
     with ndjson_path.open("w", encoding="utf-8") as f:
-        for e in clean:
+        for _key, e in heapq.merge(*sources, key=itemgetter(0)):
+            tid = e.get("trace_id")
+            if jaeger_base and tid:
+                e["trace_url"] = f"{jaeger_base}/trace/{tid}"
             f.write(json.dumps(e, ensure_ascii=True) + "\n")
+            if len(top) < TIMELINE_TOP_N:
+                top.append(e)
 
     top_txt = art_dir / "timeline-top.txt"
     lines = []
-    for e in clean[:80]:
+    for e in top:
         trace_url = e.get("trace_url") or "-"
         lines.append(
             f'{e.get("ts")} | {e.get("source")} | {e.get("signal")} | '
@@ -472,21 +815,350 @@ def write_timeline(art_dir: Path, events: List[Dict[str, Any]]) -> None:
     top_txt.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
 
 
+# Parsed-source cache (--cache-dir, off by default): the normalized spans of
+# every jaeger-*.json, kept in SQLite, so rebuilding a timeline over the same
+# exports skips parsing them. That is its one use: re-running this script by hand
+# on an existing or copied bundle. debug-bundle.sh doesn't pass it; each bundle
+# fetches new exports, which would only ever miss. A file is matched by path + size + mtime, then by
+# size + content hash (a copied bundle hits too). Spans are stored unfiltered and
+# the window is applied when they are read back. Exports fetched again for a new
+# window are new content and miss. The console/terminal logs aren't cached: they
+# are live, append-only files, and the windowed reader only reads the window.
+PARSE_CACHE_VERSION = 1
+PARSE_CACHE_FILENAME = "parsed-sources.sqlite"
+PARSE_CACHE_MAX_SOURCES = 200
+HASH_CHUNK = 1 << 20
+
+PARSE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    readable INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    UNIQUE (size, sha256)
+);
+CREATE TABLE IF NOT EXISTS paths (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    source_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS spans (
+    source_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    trace INTEGER NOT NULL,
+    start_us INTEGER NOT NULL,
+    operation_name TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS spans_by_source ON spans (source_id, start_us);
+"""
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ParseCache:
+    def __init__(self, cache_dir: Path) -> None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(cache_dir / PARSE_CACHE_FILENAME), timeout=60.0)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            if self.db.execute("PRAGMA user_version").fetchone()[0] != PARSE_CACHE_VERSION:
+                for table in ("sources", "paths", "spans"):
+                    self.db.execute(f"DROP TABLE IF EXISTS {table}")
+                self.db.execute(f"PRAGMA user_version = {PARSE_CACHE_VERSION}")
+            self.db.executescript(PARSE_CACHE_SCHEMA)
+
+    def lookup(self, path: Path) -> Tuple[Optional[int], Tuple[int, int, str]]:
+        # (source id or None, fingerprint to store on a miss).
+        key_path = str(path.resolve())
+        st = path.stat()
+        row = self.db.execute(
+            "SELECT source_id FROM paths WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (key_path, st.st_size, st.st_mtime_ns),
+        ).fetchone()
+        digest = ""
+        if row is None:
+            digest = file_sha256(path)
+            row = self.db.execute(
+                "SELECT id FROM sources WHERE size = ? AND sha256 = ?", (st.st_size, digest)
+            ).fetchone()
+        fingerprint = (st.st_size, st.st_mtime_ns, digest)
+        if row is None:
+            return None, fingerprint
+        with self.db:
+            self.db.execute("UPDATE sources SET last_used = ? WHERE id = ?", (time.time(), row[0]))
+            if digest:
+                self.remember_path(key_path, fingerprint, row[0])
+        return row[0], fingerprint
+
+    def remember_path(self, key_path: str, fingerprint: Tuple[int, int, str], source_id: int) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO paths (path, size, mtime_ns, source_id) VALUES (?, ?, ?, ?)",
+            (key_path, fingerprint[0], fingerprint[1], source_id),
+        )
+
+    def put(self, path: Path, fingerprint: Tuple[int, int, str], spans: Optional[List[Span]]) -> None:
+        size, _mtime_ns, digest = fingerprint
+        with self.db:
+            cur = self.db.execute(
+                "INSERT OR IGNORE INTO sources (size, sha256, readable, last_used) VALUES (?, ?, ?, ?)",
+                (size, digest, 0 if spans is None else 1, time.time()),
+            )
+            if cur.rowcount == 0:
+                # Another worker cached the same content first.
+                return
+            source_id = cur.lastrowid
+            self.remember_path(str(path.resolve()), fingerprint, source_id)
+            if spans:
+                self.db.executemany(
+                    "INSERT INTO spans (source_id, seq, trace, start_us, operation_name, fields)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (
+                            source_id,
+                            seq,
+                            s.trace,
+                            s.start_us,
+                            s.operation_name,
+                            json.dumps([s.trace_id, s.tags, s.app_operations]),
+                        )
+                        for seq, s in enumerate(spans)
+                    ),
+                )
+
+    def spans(
+        self, source_id: int, preset: str, start_us: Optional[int], end_us: Optional[int]
+    ) -> Optional[List[Span]]:
+        if not self.db.execute("SELECT readable FROM sources WHERE id = ?", (source_id,)).fetchone()[0]:
+            return None
+        sql = "SELECT trace, start_us, operation_name, fields FROM spans WHERE source_id = ?"
+        params: List[Any] = [source_id]
+        if start_us is not None:
+            sql += " AND start_us >= ?"
+            params.append(start_us)
+        if end_us is not None:
+            sql += " AND start_us <= ?"
+            params.append(end_us)
+        spans: List[Span] = []
+        for trace, us, op, fields in self.db.execute(sql + " ORDER BY seq", params):
+            trace_id, tags, app_ops = json.loads(fields)
+            spans.append(Span(preset, trace, trace_id, us, op, tags, tuple(app_ops)))
+        return spans
+
+    def prune(self) -> None:
+        # Keep the most recently used sources; drop the rest with their rows.
+        stale = [
+            r[0]
+            for r in self.db.execute(
+                "SELECT id FROM sources ORDER BY last_used DESC LIMIT -1 OFFSET ?", (PARSE_CACHE_MAX_SOURCES,)
+            )
+        ]
+        if not stale:
+            return
+        with self.db:
+            for table, col in (("spans", "source_id"), ("paths", "source_id"), ("sources", "id")):
+                self.db.executemany(f"DELETE FROM {table} WHERE {col} = ?", [(i,) for i in stale])
+
+
+_parse_caches: Dict[Tuple[str, int], ParseCache] = {}
+
+
+def open_parse_cache(cache_dir: Optional[Path]) -> Optional[ParseCache]:
+    # One connection per process: pool workers must not reuse the parent's.
+    if cache_dir is None:
+        return None
+    key = (str(cache_dir), os.getpid())
+    if key not in _parse_caches:
+        _parse_caches[key] = ParseCache(cache_dir)
+    return _parse_caches[key]
+
+
+def load_jaeger_source(
+    path: Path,
+    stream: bool,
+    start_us: Optional[int],
+    end_us: Optional[int],
+    cache: Optional[ParseCache],
+) -> Optional[List[Span]]:
+    if cache is None or not path.exists():
+        return load_jaeger_spans(path, stream)
+    source_id, fingerprint = cache.lookup(path)
+    if source_id is not None:
+        return cache.spans(source_id, jaeger_preset(path), start_us, end_us)
+    spans = load_jaeger_spans(path, stream)
+    cache.put(path, fingerprint, spans)
+    return spans
+
+
+# Parallel parsing (--jobs N): every source file is parsed in its own worker.
+# A worker returns only compact, picklable partials: the four count tables for
+# its one export (the builders run on a single-file store; every count is
+# per-preset, so they add up across files) or a time-sorted event chunk. The
+# parent merges them in a fixed order, so output matches the serial run.
+COUNT_TABLE_KEY_COLS = (1, 2, 1, 1)  # preset, http operation, message id, journey
+
+
+def count_tables(store: SpanStore) -> List[List[List[str]]]:
+    return [
+        build_preset_counts(store),
+        build_http_operation_counts(store),
+        build_message_id_counts(store),
+        build_journey_decision_counts(store),
+    ]
+
+
+def merge_count_rows(tables: List[List[List[str]]], key_cols: int) -> List[List[str]]:
+    # Sums the count columns of per-file tables; row keys stay in first-seen order.
+    merged: Dict[Tuple[str, ...], List[int]] = {}
+    for rows in tables:
+        for r in rows[1:]:
+            k = tuple(r[:key_cols])
+            v = [int(x) for x in r[key_cols:]]
+            prev = merged.get(k)
+            merged[k] = v if prev is None else [a + b for a, b in zip(prev, v)]
+    return [tables[0][0]] + [list(k) + [str(x) for x in v] for k, v in merged.items()]
+
+
+def jaeger_file_partial(
+    path: Path,
+    start_us: Optional[int],
+    end_us: Optional[int],
+    stream: bool,
+    cache_dir: Optional[Path] = None,
+) -> Optional[Tuple[List[List[List[str]]], List[Tuple[int, Dict[str, Any]]]]]:
+    spans = load_jaeger_source(path, stream, start_us, end_us, open_parse_cache(cache_dir))
+    if not spans:
+        return None
+    store = SpanStore()
+    store.add(spans, start_us, end_us)
+    return count_tables(store), list(jaeger_timeline(store))
+
+
+def log_file_chunk(
+    parse: Callable[..., List[Dict[str, Any]]],
+    path: Path,
+    start_iso: Optional[str],
+    end_iso: Optional[str],
+    seek: bool,
+) -> List[Tuple[int, Dict[str, Any]]]:
+    return list(timeline_source(parse(path, start_iso, end_iso, seek)))
+
+
+def parse_parallel(
+    art_dir: Path,
+    args: argparse.Namespace,
+    start_us: Optional[int],
+    end_us: Optional[int],
+    jobs: int,
+    cache_dir: Optional[Path] = None,
+) -> Tuple[List[List[List[str]]], List[Iterator[Tuple[int, Dict[str, Any]]]]]:
+    seek = args.log_scan == "seek"
+    stream = args.jaeger_loader == "stream"
+    jaeger_paths = list(art_dir.glob("jaeger-*.json"))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        console = pool.submit(
+            log_file_chunk, parse_console_events, art_dir / "console-latest.ndjson",
+            args.window_start_iso, args.window_end_iso, seek,
+        )
+        terminal = pool.submit(
+            log_file_chunk, parse_terminal_events, art_dir / "terminal-latest.log",
+            args.window_start_iso, args.window_end_iso, seek,
+        )
+        # Biggest exports first so one large file doesn't finish last on its own.
+        by_size = sorted(range(len(jaeger_paths)), key=lambda i: -jaeger_paths[i].stat().st_size)
+        futures = {
+            i: pool.submit(jaeger_file_partial, jaeger_paths[i], start_us, end_us, stream, cache_dir) for i in by_size
+        }
+        partials = [futures[i].result() for i in range(len(jaeger_paths))]
+        console_chunk = console.result()
+        terminal_chunk = terminal.result()
+
+    parts = [p for p in partials if p is not None]
+    per_table = [count_tables(SpanStore())] + [p[0] for p in parts]
+    tables = [merge_count_rows([t[n] for t in per_table], COUNT_TABLE_KEY_COLS[n]) for n in range(4)]
+    tables[2] = tables[2][:1] + sorted(tables[2][1:], key=lambda r: message_id_sort_key(r[0]))
+    # Chunks merge on start time with file (glob) order breaking ties, which is
+    # exactly the serial store order.
+    jaeger_events = (e for _us, e in heapq.merge(*[p[1] for p in parts], key=itemgetter(0)))
+    return tables, [
+        iter(console_chunk),
+        iter(terminal_chunk),
+        timeline_source(jaeger_events, ordered=True),
+    ]
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--artifacts-dir", required=True)
     ap.add_argument("--window-start-iso")
     ap.add_argument("--window-end-iso")
     ap.add_argument("--jaeger-base-url")
+    ap.add_argument(
+        "--jaeger-loader",
+        choices=["stream", "whole"],
+        default="stream",
+        help="stream: decode jaeger-*.json one trace at a time (default); whole: json.loads each file",
+    )
+    ap.add_argument(
+        "--log-scan",
+        choices=["seek", "full"],
+        default="seek",
+        help="seek: binary-search the console/terminal logs to the window (default); full: read them whole",
+    )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="parse the logs and jaeger-*.json files in N worker processes (0 = one per CPU)",
+    )
+    ap.add_argument(
+        "--cache-dir",
+        help=(
+            "reuse parsed jaeger-*.json spans from earlier runs, kept in this directory (default: no cache). "
+            "Only helps when rebuilding a timeline over exports already parsed, e.g. a copied bundle; "
+            "debug-bundle.sh fetches fresh exports every run and does not use it"
+        ),
+    )
     args = ap.parse_args()
     art_dir = Path(args.artifacts_dir)
     art_dir.mkdir(parents=True, exist_ok=True)
 
     start_us, end_us = parse_window_bounds(args.window_start_iso, args.window_end_iso)
-    preset_rows = build_preset_counts(art_dir, start_us, end_us)
-    op_rows = build_http_operation_counts(art_dir, start_us, end_us)
-    message_rows = build_message_id_counts(art_dir, start_us, end_us)
-    journey_rows = build_journey_decision_counts(art_dir, start_us, end_us)
+    cache_dir = Path(args.cache_dir) if args.cache_dir else None
+    # Opened here first so the schema exists before any worker connects.
+    cache = open_parse_cache(cache_dir)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if jobs > 1:
+        tables, sources = parse_parallel(art_dir, args, start_us, end_us, jobs, cache_dir)
+    else:
+        store = load_span_store(art_dir, start_us, end_us, args.jaeger_loader == "stream", cache)
+        tables = count_tables(store)
+        seek_logs = args.log_scan == "seek"
+        console_events = parse_console_events(
+            art_dir / "console-latest.ndjson", args.window_start_iso, args.window_end_iso, seek_logs
+        )
+        terminal_events = parse_terminal_events(
+            art_dir / "terminal-latest.log", args.window_start_iso, args.window_end_iso, seek_logs
+        )
+        sources = [
+            timeline_source(console_events),
+            timeline_source(terminal_events),
+            timeline_source(parse_jaeger_events(store), ordered=True),
+        ]
+
+    preset_rows, op_rows, message_rows, journey_rows = tables
     checks = build_expectation_checks(preset_rows)
     write_tsv(art_dir / "jaeger-counts.tsv", preset_rows)
     write_tsv(art_dir / "jaeger-http-operation-counts.tsv", op_rows)
@@ -494,17 +1166,10 @@ def main() -> None:
     write_tsv(art_dir / "jaeger-journey-counts.tsv", journey_rows)
     (art_dir / "expectation-checks.txt").write_text("\n".join(checks) + "\n", encoding="utf-8")
 
-    console_events = parse_console_events(art_dir / "console-latest.ndjson", args.window_start_iso, args.window_end_iso)
-    terminal_events = parse_terminal_events(art_dir / "terminal-latest.log", args.window_start_iso, args.window_end_iso)
-    jaeger_events = parse_jaeger_events(art_dir, start_us, end_us)
     jaeger_base = (args.jaeger_base_url or "").strip().rstrip("/")
-    merged = console_events + terminal_events + jaeger_events
-    if jaeger_base:
-        for e in merged:
-            tid = e.get("trace_id")
-            if tid:
-                e["trace_url"] = f"{jaeger_base}/trace/{tid}"
-    write_timeline(art_dir, merged)
+    write_timeline(art_dir, sources, jaeger_base)
+    if cache is not None:
+        cache.prune()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+
+# Benchmark + golden-image check for render_screen_title_png.py.
+#
+# Every case is rendered twice:
+# - cold: a fresh one-shot renderer process (GI import + Fontconfig + render), with
+#   wall time and the child's peak RSS from wait4();
+# - warm: --repeat round trips against one long-lived --serve renderer.
+# The cold PNG is compared against <golden-dir>/<case>.png with a per-channel
+# tolerance; --update-golden rewrites the references instead.
+#
+# Run from anywhere; paths (assets/, fonts.conf) are resolved from the repo root:
+#   python3 scripts/pango/bench_screen_title_png.py --repeat 5 --json /tmp/bench.json
+#   python3 scripts/pango/bench_screen_title_png.py --filter portrait/font- --update-golden
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+RENDERER = os.path.join(SCRIPT_DIR, "render_screen_title_png.py")
+sys.path.insert(0, SCRIPT_DIR)
+
+import render_screen_title_png as renderer  # noqa: E402
+
+FRAMES = {
+  "portrait": (1080, 1920),
+  "landscape": (1920, 1080),
+  "4k": (3840, 2160),
+}
+
+SHORT_TEXT = "Screen Title"
+LONG_TEXT = "A longer screen title that wraps\nacross a few lines with Ünïcödé & punctuation!"
+
+BASE_PRESET = {
+  "style": "pill",
+  "fontKey": "dejavu_sans_bold",
+  "fontSizePct": 4.5,
+  "fontColor": "#ffffff",
+  "pillBgColor": "#000000",
+  "pillBgOpacityPct": 55,
+  "shadowColor": "#000000",
+  "shadowOffsetPx": 2,
+  "shadowBlurPx": 0,
+  "shadowOpacityPct": 65,
+  "alignment": "center",
+  "position": "bottom",
+  "maxWidthPct": 90,
+}
+
+
+def fc_font_keys():
+  # fc:<family>:<style> for every face under assets/fonts. Prefer fc-scan's names
+  # (what Fontconfig will match); fall back to the file name.
+  keys = []
+  fonts_dir = os.path.join(REPO_ROOT, "assets", "fonts")
+  fc_scan = shutil.which("fc-scan")
+  for root, _dirs, files in sorted(os.walk(fonts_dir)):
+    for name in sorted(files):
+      if not name.lower().endswith((".ttf", ".otf")):
+        continue
+      path = os.path.join(root, name)
+      family = style = None
+      if fc_scan:
+        try:
+          out = subprocess.run(
+            [fc_scan, "--format", "%{family[0]}|%{style[0]}\n", path],
+            capture_output=True, text=True, timeout=10,
+          ).stdout.strip().splitlines()
+          if out and "|" in out[0]:
+            family, style = out[0].split("|", 1)
+        except Exception:
+          family = style = None
+      if not family:
+        stem = os.path.splitext(name)[0].replace("_", "-")
+        family = os.path.basename(root)
+        style = " ".join(stem.split("-")[1:]) or "Regular"
+      keys.append("fc:" + urllib.parse.quote(family) + ":" + urllib.parse.quote(style or "Regular"))
+  return sorted(set(keys))
+
+
+def gradient_keys():
+  gdir = os.path.join(REPO_ROOT, "assets", "font_gradients")
+  try:
+    return sorted(n for n in os.listdir(gdir) if n.lower().endswith(".png"))
+  except FileNotFoundError:
+    return []
+
+
+def case(case_id, frame, text, **overrides):
+  w, h = FRAMES[frame]
+  preset = dict(BASE_PRESET, **overrides)
+  return {"id": f"{frame}/{case_id}", "input": {"frame": {"width": w, "height": h}, "text": text, "preset": preset}}
+
+
+def build_corpus():
+  cases = []
+  for frame in FRAMES:
+    cases.append(case("style-pill", frame, SHORT_TEXT, style="pill"))
+    cases.append(case("style-merged_pill", frame, LONG_TEXT, style="merged_pill"))
+    cases.append(case("style-none", frame, SHORT_TEXT, style="none"))
+    cases.append(case("style-outline", frame, SHORT_TEXT, style="none", outlineWidthPct=8, outlineOpacityPct=100))
+    cases.append(case("blur-off", frame, LONG_TEXT, shadowBlurPx=0, shadowOffsetPx=4))
+    cases.append(case("blur-on", frame, LONG_TEXT, shadowBlurPx=10, shadowOffsetPx=4))
+    # Multi-instance frame: exercises the shared prepare/draw path.
+    w, h = FRAMES[frame]
+    cases.append({
+      "id": f"{frame}/instances-3",
+      "input": {
+        "frame": {"width": w, "height": h},
+        "instances": [
+          {"text": SHORT_TEXT, "preset": dict(BASE_PRESET, position="top")},
+          {"text": LONG_TEXT, "preset": dict(BASE_PRESET, position="middle", style="merged_pill")},
+          {"text": SHORT_TEXT, "preset": dict(BASE_PRESET, position="bottom", style="none", shadowBlurPx=6)},
+        ],
+      },
+    })
+  for frame in ("portrait", "landscape"):
+    cases.append(case("tracking", frame, LONG_TEXT, trackingPct=12))
+    cases.append(case("tracking-negative", frame, LONG_TEXT, trackingPct=-6))
+    cases.append(case("line-spacing", frame, LONG_TEXT, lineSpacingPct=40))
+  for key in sorted(renderer.CURATED_FONTS):
+    cases.append(case(f"font-{key}", "portrait", LONG_TEXT, fontKey=key))
+  for key in fc_font_keys():
+    slug = urllib.parse.unquote(key[3:]).replace(":", "-").replace(" ", "_")
+    cases.append(case(f"fc-{slug}", "portrait", LONG_TEXT, fontKey=key))
+  for g in gradient_keys():
+    cases.append(case(f"gradient-{os.path.splitext(g)[0]}", "portrait", LONG_TEXT, fontGradientKey=g, style="none"))
+    cases.append(case(f"gradient-{os.path.splitext(g)[0]}", "4k", LONG_TEXT, fontGradientKey=g, style="none"))
+  return cases
+
+
+def renderer_env(blur_mode=None):
+  env = dict(os.environ)
+  env["FONTCONFIG_FILE"] = os.path.join(REPO_ROOT, "assets", "fonts", "fonts.conf")
+  if blur_mode:
+    env["SCREEN_TITLE_SHADOW_BLUR"] = blur_mode
+  return env
+
+
+def run_cold(c, work_dir, env):
+  input_path = os.path.join(work_dir, "input.json")
+  with open(input_path, "w", encoding="utf-8") as f:
+    json.dump(c["input"], f)
+  out_path = os.path.join(work_dir, case_file(c["id"]))
+  t0 = time.perf_counter()
+  p = subprocess.Popen(
+    [sys.executable, RENDERER, "--input-json", input_path, "--out", out_path, "--timings"],
+    cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+  )
+  stderr = p.stderr.read().decode("utf-8", "replace")
+  p.stderr.close()
+  # wait4 gives this child's own rusage (RUSAGE_CHILDREN would be cumulative).
+  _pid, status, usage = os.wait4(p.pid, 0)
+  p.returncode = os.waitstatus_to_exitcode(status)
+  wall_ms = (time.perf_counter() - t0) * 1000.0
+  timings = None
+  errors = []
+  for line in stderr.splitlines():
+    if line.startswith('{"event": "timings"'):
+      try:
+        timings = json.loads(line)
+      except ValueError:
+        pass
+    elif line.strip():
+      errors.append(line.strip())
+  return {
+    "ok": p.returncode == 0,
+    "exitCode": p.returncode,
+    "error": "; ".join(errors)[:400] or None,
+    "wallMs": wall_ms,
+    # Linux reports ru_maxrss in KiB.
+    "peakRssKb": usage.ru_maxrss,
+    "timings": timings,
+    "out": out_path,
+    "bytes": os.path.getsize(out_path) if p.returncode == 0 else None,
+  }
+
+
+class WarmRenderer:
+  def __init__(self, env):
+    self.proc = subprocess.Popen(
+      [sys.executable, RENDERER, "--serve"],
+      cwd=REPO_ROOT, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    t0 = time.perf_counter()
+    ready = self.recv()
+    self.startup_ms = (time.perf_counter() - t0) * 1000.0
+    if not ready or ready.get("event") != "ready":
+      raise RuntimeError(f"renderer_not_ready: {ready}")
+    self.next_id = 0
+
+  def recv(self):
+    raw = renderer.read_frame(self.proc.stdout)
+    return json.loads(raw.decode("utf-8")) if raw is not None else None
+
+  def request(self, req):
+    self.next_id += 1
+    renderer.write_frame(self.proc.stdin, dict(req, id=self.next_id))
+    return self.recv()
+
+  def close(self):
+    try:
+      renderer.write_frame(self.proc.stdin, {"op": "shutdown"})
+      self.recv()
+      self.proc.stdin.close()
+    except Exception:
+      pass
+    _pid, _status, usage = os.wait4(self.proc.pid, 0)
+    self.proc.returncode = 0
+    return usage.ru_maxrss
+
+
+def run_warm(server, c, work_dir, repeat):
+  out_path = os.path.join(work_dir, "warm-" + case_file(c["id"]))
+  samples = []
+  resp = None
+  for _ in range(max(1, repeat)):
+    t0 = time.perf_counter()
+    resp = server.request({"op": "render", "input": c["input"], "out": out_path, "cache": False})
+    samples.append((time.perf_counter() - t0) * 1000.0)
+    if not resp or not resp.get("ok"):
+      return {"ok": False, "error": (resp or {}).get("error"), "out": out_path}
+  samples.sort()
+  return {
+    "ok": True,
+    "out": out_path,
+    "minMs": samples[0],
+    "medianMs": statistics.median(samples),
+    "p95Ms": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+  }
+
+
+def case_file(case_id):
+  return case_id.replace("/", "__") + ".png"
+
+
+def load_argb(path, cairo):
+  s = cairo.ImageSurface.create_from_png(path)
+  s.flush()
+  return s.get_width(), s.get_height(), s.get_stride(), bytes(s.get_data())
+
+
+def pixel_diff(a_path, b_path, tolerance):
+  # Returns (max channel delta, pixels over tolerance, total pixels). Compares the
+  # premultiplied ARGB32 buffers cairo decodes to.
+  _pango, _pangocairo, cairo = renderer.load_render_libs()
+  aw, ah, astride, a = load_argb(a_path, cairo)
+  bw, bh, bstride, b = load_argb(b_path, cairo)
+  if (aw, ah) != (bw, bh):
+    return None, None, aw * ah
+  total = aw * ah
+  if a == b:
+    return 0, 0, total
+  np = renderer.load_numpy()
+  if np is not None:
+    av = np.frombuffer(a, dtype=np.uint8).reshape(ah, astride)[:, : aw * 4].reshape(ah, aw, 4).astype(np.int16)
+    bv = np.frombuffer(b, dtype=np.uint8).reshape(bh, bstride)[:, : bw * 4].reshape(bh, bw, 4).astype(np.int16)
+    d = np.abs(av - bv).max(axis=2)
+    return int(d.max()), int((d > tolerance).sum()), total
+  max_delta = 0
+  over = 0
+  for y in range(ah):
+    ra = a[y * astride:y * astride + aw * 4]
+    rb = b[y * bstride:y * bstride + bw * 4]
+    if ra == rb:
+      continue
+    for x in range(0, aw * 4, 4):
+      px = max(abs(ra[x + i] - rb[x + i]) for i in range(4))
+      if px:
+        max_delta = max(max_delta, px)
+        if px > tolerance:
+          over += 1
+  return max_delta, over, total
+
+
+def check_golden(c, out_path, golden_dir, update, tolerance, max_diff_pct):
+  golden = os.path.join(golden_dir, case_file(c["id"]))
+  if update:
+    os.makedirs(golden_dir, exist_ok=True)
+    shutil.copyfile(out_path, golden)
+    return {"status": "updated"}
+  if not os.path.exists(golden):
+    return {"status": "missing"}
+  max_delta, over, total = pixel_diff(golden, out_path, tolerance)
+  if max_delta is None:
+    return {"status": "size_mismatch"}
+  diff_pct = 100.0 * over / float(total or 1)
+  return {
+    "status": "ok" if diff_pct <= max_diff_pct else "mismatch",
+    "maxDelta": max_delta,
+    "diffPct": round(diff_pct, 4),
+  }
+
+
+def fmt_ms(v):
+  return "-" if v is None else f"{v:.1f}"
+
+
+def main():
+  ap = argparse.ArgumentParser()
+  ap.add_argument("--filter", action="append", help="only cases whose id contains this substring (repeatable)")
+  ap.add_argument("--list", action="store_true", help="print case ids and exit")
+  ap.add_argument("--repeat", type=int, default=5, help="warm renders per case")
+  ap.add_argument("--no-cold", action="store_true", help="skip cold one-shot runs (and golden checks)")
+  ap.add_argument("--no-warm", action="store_true", help="skip warm --serve runs")
+  ap.add_argument("--blur-mode", choices=("auto", "gaussian", "samples"), help="SCREEN_TITLE_SHADOW_BLUR for the renderer")
+  ap.add_argument("--golden-dir", default=os.path.join(SCRIPT_DIR, "golden"))
+  ap.add_argument("--update-golden", action="store_true", help="write cold outputs as the new reference images")
+  ap.add_argument("--tolerance", type=int, default=6, help="per-channel delta (0-255) still counted as equal")
+  ap.add_argument("--max-diff-pct", type=float, default=0.05, help="max %% of pixels over tolerance before a case fails")
+  ap.add_argument("--work-dir", help="keep rendered outputs here (default: a temp dir, removed afterwards)")
+  ap.add_argument("--json", help="write the full report here")
+  args = ap.parse_args()
+
+  cases = build_corpus()
+  if args.filter:
+    cases = [c for c in cases if any(f in c["id"] for f in args.filter)]
+  if args.list:
+    for c in cases:
+      sys.stdout.write(c["id"] + "\n")
+    return 0
+  if not cases:
+    sys.stderr.write("no_cases\n")
+    return 2
+
+  env = renderer_env(args.blur_mode)
+  work_dir = args.work_dir or tempfile.mkdtemp(prefix="screen-title-bench-")
+  os.makedirs(work_dir, exist_ok=True)
+  results = []
+  server = None
+  server_rss_kb = None
+  try:
+    if not args.no_warm:
+      server = WarmRenderer(env)
+    for c in cases:
+      row = {"id": c["id"]}
+      if not args.no_cold:
+        cold = run_cold(c, work_dir, env)
+        row["cold"] = cold
+        if cold["ok"]:
+          row["golden"] = check_golden(c, cold["out"], args.golden_dir, args.update_golden, args.tolerance, args.max_diff_pct)
+      if server is not None:
+        warm = run_warm(server, c, work_dir, args.repeat)
+        row["warm"] = warm
+        cold = row.get("cold")
+        if warm["ok"] and cold and cold["ok"]:
+          with open(warm["out"], "rb") as fa, open(cold["out"], "rb") as fb:
+            row["warmMatchesCold"] = fa.read() == fb.read()
+      results.append(row)
+      print_row(row)
+  finally:
+    if server is not None:
+      server_rss_kb = server.close()
+    if not args.work_dir:
+      shutil.rmtree(work_dir, ignore_errors=True)
+
+  failed = [
+    r["id"] for r in results
+    if (r.get("cold") and not r["cold"]["ok"])
+    or (r.get("warm") and not r["warm"]["ok"])
+    or (r.get("golden") or {}).get("status") in ("mismatch", "size_mismatch")
+  ]
+  summary = summarize(results)
+  summary["serverPeakRssKb"] = server_rss_kb
+  summary["serverStartupMs"] = round(server.startup_ms, 3) if server is not None else None
+  summary["failed"] = failed
+  sys.stdout.write(json.dumps(summary) + "\n")
+  if args.json:
+    with open(args.json, "w", encoding="utf-8") as f:
+      json.dump({"summary": summary, "cases": results}, f, indent=2)
+  return 1 if failed else 0
+
+
+def print_row(row):
+  cold = row.get("cold") or {}
+  warm = row.get("warm") or {}
+  golden = row.get("golden") or {}
+  cols = [
+    row["id"],
+    f"cold={fmt_ms(cold.get('wallMs'))}ms",
+    f"warm={fmt_ms(warm.get('medianMs'))}ms",
+    f"rss={cold.get('peakRssKb', '-')}KiB",
+    f"png={cold.get('bytes', '-')}B",
+    f"golden={golden.get('status', '-')}",
+  ]
+  if golden.get("maxDelta"):
+    cols.append(f"maxDelta={golden['maxDelta']} diff={golden['diffPct']}%")
+  if cold.get("error") or warm.get("error"):
+    cols.append(f"error={cold.get('error') or warm.get('error')}")
+  sys.stdout.write("\t".join(cols) + "\n")
+  sys.stdout.flush()
+
+
+def summarize(results):
+  cold = [r["cold"]["wallMs"] for r in results if (r.get("cold") or {}).get("ok")]
+  warm = [r["warm"]["medianMs"] for r in results if (r.get("warm") or {}).get("ok")]
+  rss = [r["cold"]["peakRssKb"] for r in results if (r.get("cold") or {}).get("ok")]
+  goldens = {}
+  for r in results:
+    st = (r.get("golden") or {}).get("status")
+    if st:
+      goldens[st] = goldens.get(st, 0) + 1
+  return {
+    "event": "summary",
+    "cases": len(results),
+    "coldMedianMs": round(statistics.median(cold), 3) if cold else None,
+    "warmMedianMs": round(statistics.median(warm), 3) if warm else None,
+    "coldPeakRssKb": max(rss) if rss else None,
+    "golden": goldens,
+    "warmMismatches": sum(1 for r in results if r.get("warmMatchesCold") is False),
+  }
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+# Fontconfig warm-up for the screen-title renderer.
+#
+# 1. Pre-builds the Fontconfig cache for assets/fonts (fc-cache) into the <cachedir>
+#    named by assets/fonts/fonts.conf, so a fresh container's first render doesn't
+#    stall on the directory scan.
+# 2. Writes a JSON index of every project-local family/style: the fc:<family>:<style>
+#    key the Node side exposes, plus the Pango family/weight/style that
+#    render_screen_title_png.resolve_font derives for it. Node reads the index
+#    (SCREEN_TITLE_FONT_INDEX) instead of shelling out to fc-list.
+#
+# Run from anywhere; paths are resolved from the repo root:
+#   python3 scripts/pango/build_font_index.py
+#   python3 scripts/pango/build_font_index.py --out /tmp/fonts.json --check
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import urllib.parse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+sys.path.insert(0, SCRIPT_DIR)
+
+import render_screen_title_png as renderer  # noqa: E402
+
+INDEX_VERSION = 1
+INDEX_FILENAME = "screen-title-fonts.json"
+FONT_EXTS = (".ttf", ".otf", ".ttc", ".otc", ".woff", ".woff2")
+
+
+def fail(code, exit_code, detail=None):
+  sys.stderr.write(f"{code}\n" if detail is None else f"{code}: {detail}\n")
+  sys.exit(exit_code)
+
+
+def fontconfig_cache_dir(conf_path):
+  # First <cachedir> in fonts.conf; Fontconfig writes there for project-local fonts.
+  try:
+    with open(conf_path, "r", encoding="utf-8") as f:
+      m = re.search(r"<cachedir[^>]*>\s*([^<]+?)\s*</cachedir>", f.read())
+  except OSError:
+    return None
+  return m.group(1) if m else None
+
+
+def encode_key_part(s):
+  # Same escaping as encodeURIComponent on the Node side.
+  return urllib.parse.quote(s, safe="-_.!~*'()")
+
+
+def font_files(fonts_dir):
+  out = []
+  for root, dirs, files in os.walk(fonts_dir):
+    dirs.sort()
+    for name in sorted(files):
+      if name.lower().endswith(FONT_EXTS):
+        out.append(os.path.join(root, name))
+  return out
+
+
+def build_cache(env, fonts_dir, force):
+  fc_cache = shutil.which("fc-cache")
+  if not fc_cache:
+    fail("missing_fc_cache", 3)
+  args = [fc_cache] + (["-f"] if force else []) + [fonts_dir]
+  t0 = time.perf_counter()
+  proc = subprocess.run(args, env=env, capture_output=True, text=True)
+  ms = round((time.perf_counter() - t0) * 1000.0, 1)
+  if proc.returncode != 0:
+    fail("fc_cache_failed", 3, (proc.stderr or "").strip()[:500])
+  return ms
+
+
+def list_fonts(env, fonts_dir):
+  # Same query the Node side used to run on every process start.
+  fc_list = shutil.which("fc-list")
+  if not fc_list:
+    fail("missing_fc_list", 3)
+  proc = subprocess.run(
+    [fc_list, "-f", "%{file}\t%{family[0]}\t%{style}\n"],
+    env=env,
+    capture_output=True,
+    text=True,
+  )
+  if proc.returncode != 0:
+    fail("fc_list_failed", 3, (proc.stderr or "").strip()[:500])
+  prefix = os.path.realpath(fonts_dir) + os.sep
+  builtin_families = set(f for f, _w, _s in renderer.CURATED_FONTS.values())
+  seen = set()
+  entries = []
+  for line in (proc.stdout or "").splitlines():
+    parts = line.strip().split("\t")
+    if len(parts) < 3:
+      continue
+    path = parts[0].strip()
+    family = parts[1].strip()
+    style = "\t".join(parts[2:]).strip()
+    if not path or not family or not style:
+      continue
+    if not os.path.realpath(path).startswith(prefix):
+      continue
+    if family in builtin_families:
+      continue
+    key = f"fc:{encode_key_part(family)}:{encode_key_part(style)}"
+    if key in seen:
+      continue
+    seen.add(key)
+    entries.append((key, family, style, os.path.relpath(os.path.realpath(path), REPO_ROOT)))
+  entries.sort(key=lambda e: (e[1].lower(), e[2].lower(), e[0]))
+  return entries
+
+
+def resolved_entry(key, **extra):
+  pango_family, pango_weight, pango_style = renderer.resolve_font(key)
+  return dict(extra, key=key, pangoFamily=pango_family, pangoWeight=pango_weight, pangoStyle=pango_style)
+
+
+def check_families(index):
+  # Optional: confirm Pango can see every indexed family through the same font map
+  # the renderer uses. Also warms the in-process Fontconfig state end to end.
+  try:
+    libs = renderer.load_render_libs()
+  except renderer.RenderError as e:
+    fail(e.code, e.exit_code)
+  renderer.init_fontconfig(libs)
+  available = set(f.get_name() for f in libs[1].FontMap.get_default().list_families())
+  missing = []
+  for entry in index["builtIn"] + index["fonts"]:
+    ok = entry["pangoFamily"] in available
+    entry["available"] = ok
+    if not ok:
+      missing.append(entry["key"])
+  return missing
+
+
+def main():
+  ap = argparse.ArgumentParser()
+  ap.add_argument("--fonts-conf", default=os.path.join(REPO_ROOT, "assets", "fonts", "fonts.conf"))
+  ap.add_argument("--out", help=f"index path (default: <cachedir>/{INDEX_FILENAME}; '-' for stdout)")
+  ap.add_argument("--force", action="store_true", help="rebuild the Fontconfig cache even if it looks current")
+  ap.add_argument("--no-cache", action="store_true", help="only write the index")
+  ap.add_argument("--check", action="store_true", help="verify every indexed family resolves in Pango")
+  args = ap.parse_args()
+
+  # fonts.conf uses <dir prefix="cwd">, so run Fontconfig from the repo root.
+  os.chdir(REPO_ROOT)
+  conf_path = os.path.abspath(args.fonts_conf)
+  fonts_dir = os.path.dirname(conf_path)
+  env = dict(os.environ, FONTCONFIG_FILE=conf_path)
+  os.environ["FONTCONFIG_FILE"] = conf_path
+  cache_dir = fontconfig_cache_dir(conf_path)
+  if cache_dir:
+    os.makedirs(cache_dir, exist_ok=True)
+
+  cache_ms = None
+  if not args.no_cache:
+    cache_ms = build_cache(env, fonts_dir, args.force)
+
+  files = font_files(fonts_dir)
+  index = {
+    "version": INDEX_VERSION,
+    "generatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    "fontsConf": os.path.relpath(conf_path, REPO_ROOT),
+    "cacheDir": cache_dir,
+    "fileCount": len(files),
+    "builtIn": [
+      resolved_entry(key)
+      for key in renderer.CURATED_FONTS
+    ],
+    "fonts": [
+      resolved_entry(key, family=family, style=style, file=path)
+      for key, family, style, path in list_fonts(env, fonts_dir)
+    ],
+  }
+
+  missing = check_families(index) if args.check else []
+
+  data = json.dumps(index, indent=2) + "\n"
+  out = args.out or (os.path.join(cache_dir, INDEX_FILENAME) if cache_dir else "-")
+  if out == "-":
+    sys.stdout.write(data)
+  else:
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    renderer.atomic_write_bytes(out, data.encode("utf-8"))
+
+  summary = {
+    "event": "font_index",
+    "out": out,
+    "fonts": len(index["fonts"]),
+    "builtIn": len(index["builtIn"]),
+    "cacheMs": cache_ms,
+  }
+  if args.check:
+    summary["missing"] = missing
+  sys.stderr.write(json.dumps(summary) + "\n")
+  return 1 if missing else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
 
 import argparse
+import atexit
+import collections
+import hashlib
+import io
 import json
 import math
+import os
+import struct
 import sys
+import time
+import zlib
 
 
 def clamp(v, lo, hi):
@@ -125,10 +133,77 @@ def rounded_rect(ctx, x, y, w, h, r):
   ctx.close_path()
 
 
-def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo, anchor_box_h_middle=None, anchor_box_h_bottom=None, measure_out=None, measure_only=False):
-  if not text:
-    return
+def gradient_path(key):
+  # Prevent traversal: filenames only.
+  if not key or "/" in key or "\\" in key or ".." in key:
+    return None
+  gp = os.path.join(os.getcwd(), "assets", "font_gradients", key)
+  return gp if os.path.isfile(gp) else None
+
+
+# Font: curated list via fontKey -> (family, weight, style).
+# NOTE: font files are provided via assets/fonts and discovered through Fontconfig.
+# Built-in (legacy) font keys -> (family, weight, style).
+CURATED_FONTS = {
+  "dejavu_sans_regular": ("DejaVu Sans", "Normal", "normal"),
+  # Slightly heavier than Bold so the PNG preview matches the on-page CSS (800–900).
+  "dejavu_sans_bold": ("DejaVu Sans", "UltraBold", "normal"),
+  "dejavu_sans_italic": ("DejaVu Sans", "Normal", "italic"),
+  "dejavu_sans_bold_italic": ("DejaVu Sans", "UltraBold", "italic"),
+  "caveat_regular": ("Caveat", "Normal", "normal"),
+  "caveat_medium": ("Caveat", "Medium", "normal"),
+  "caveat_semibold": ("Caveat", "SemiBold", "normal"),
+  "caveat_bold": ("Caveat", "Bold", "normal"),
+}
+
+
+def resolve_font(font_key: str):
+  raw = str(font_key or "").strip()
+  k = raw.lower()
+  # Defaults
+  family = "DejaVu Sans"
+  weight = "UltraBold"
+  style0 = "normal"
+
+  # Dynamic Fontconfig keys: fc:<family>:<style>
+  if raw.startswith("fc:"):
+    try:
+      import urllib.parse
+      parts = raw.split(":", 2)
+      if len(parts) == 3:
+        fam = urllib.parse.unquote(parts[1])
+        sty = urllib.parse.unquote(parts[2])
+        if fam:
+          family = fam
+        s = (sty or "").strip()
+        sl = s.lower()
+        style0 = "italic" if ("italic" in sl or "oblique" in sl) else "normal"
+        if "ultra" in sl or "black" in sl:
+          weight = "UltraBold"
+        elif "heavy" in sl:
+          weight = "Heavy"
+        elif "semibold" in sl or "demibold" in sl:
+          weight = "SemiBold"
+        elif "medium" in sl:
+          weight = "Medium"
+        elif "bold" in sl:
+          weight = "Bold"
+        else:
+          weight = "Normal"
+        return family, weight, style0
+    except Exception:
+      pass
+
+  if k in CURATED_FONTS:
+    family, weight, style0 = CURATED_FONTS[k]
+  return family, weight, style0
 
+
+# Frame-independent preset normalization. Everything render_instance reads from a
+# preset goes through here, so the result doubles as the canonical style for cache keys.
+def normalize_instance_style(preset):
+  if not isinstance(preset, dict):
+    preset = {}
   style = str(preset.get("style") or "pill").strip().lower()
   # Legacy support: old presets used style='outline' to mean "no background + outlined text".
   # We now model this as style='none' with explicit outline settings.
@@ -140,6 +215,11 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
   aln = normalize_alignment(preset.get("alignment"))
   font_size_pct = float(preset.get("fontSizePct") or 4.5)
   font_size_pct = clamp(font_size_pct, 1.0, 8.0)
+  # Auto-fit: largest size in [minFontSizePct, maxFontSizePct] (default: 1 .. fontSizePct)
+  # at which the text fits its region without ellipsis.
+  auto_fit = preset.get("autoFit") is True
+  auto_fit_max_pct = clamp(normalize_number(preset.get("maxFontSizePct"), font_size_pct), 1.0, 8.0)
+  auto_fit_min_pct = clamp(normalize_number(preset.get("minFontSizePct"), 1.0), 1.0, auto_fit_max_pct)
   max_width_pct_raw = preset.get("maxWidthPct")
   try:
     max_width_pct = clamp(float(max_width_pct_raw or 90.0), 20.0, 100.0) / 100.0
@@ -188,68 +268,8 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
     if font_gradient_key == "":
       font_gradient_key = None
 
-  # Font: curated list via fontKey -> (family, weight, style).
-  # NOTE: font files are provided via assets/fonts and discovered through Fontconfig.
-  def resolve_font(font_key: str):
-    raw = str(font_key or "").strip()
-    k = raw.lower()
-    # Defaults
-    family = "DejaVu Sans"
-    weight = "UltraBold"
-    style0 = "normal"
-
-    # Dynamic Fontconfig keys: fc:<family>:<style>
-    if raw.startswith("fc:"):
-      try:
-        import urllib.parse
-        parts = raw.split(":", 2)
-        if len(parts) == 3:
-          fam = urllib.parse.unquote(parts[1])
-          sty = urllib.parse.unquote(parts[2])
-          if fam:
-            family = fam
-          s = (sty or "").strip()
-          sl = s.lower()
-          style0 = "italic" if ("italic" in sl or "oblique" in sl) else "normal"
-          if "ultra" in sl or "black" in sl:
-            weight = "UltraBold"
-          elif "heavy" in sl:
-            weight = "Heavy"
-          elif "semibold" in sl or "demibold" in sl:
-            weight = "SemiBold"
-          elif "medium" in sl:
-            weight = "Medium"
-          elif "bold" in sl:
-            weight = "Bold"
-          else:
-            weight = "Normal"
-          return family, weight, style0
-      except Exception:
-        pass
-
-    if k == "dejavu_sans_regular":
-      family, weight, style0 = "DejaVu Sans", "Normal", "normal"
-    elif k == "dejavu_sans_bold":
-      # Slightly heavier than Bold so the PNG preview matches the on-page CSS (800–900).
-      family, weight, style0 = "DejaVu Sans", "UltraBold", "normal"
-    elif k == "dejavu_sans_italic":
-      family, weight, style0 = "DejaVu Sans", "Normal", "italic"
-    elif k == "dejavu_sans_bold_italic":
-      family, weight, style0 = "DejaVu Sans", "UltraBold", "italic"
-    elif k == "caveat_regular":
-      family, weight, style0 = "Caveat", "Normal", "normal"
-    elif k == "caveat_medium":
-      family, weight, style0 = "Caveat", "Medium", "normal"
-    elif k == "caveat_semibold":
-      family, weight, style0 = "Caveat", "SemiBold", "normal"
-    elif k == "caveat_bold":
-      family, weight, style0 = "Caveat", "Bold", "normal"
-    return family, weight, style0
-
   font_key = str(preset.get("fontKey") or "dejavu_sans_bold")
   font_family, font_weight, font_style = resolve_font(font_key)
-  font_px = height * (font_size_pct / 100.0)
-  font_px = clamp(font_px, 8.0, 220.0)
 
   # Outline settings (optional overrides; when unset, use style defaults).
   outline_width_pct_raw = preset.get("outlineWidthPct")
@@ -259,14 +279,12 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
   outline_width_px_default = 1.0 if style == "outline" else (0.9 if style in ("pill", "merged_pill") else 0.0)
   outline_opacity_default = 0.45 if style == "outline" else (0.25 if style in ("pill", "merged_pill") else 0.0)
 
-  outline_width_px = outline_width_px_default
+  outline_width_pct = None
   if outline_width_pct_raw is not None and str(outline_width_pct_raw).strip() != "":
     try:
       outline_width_pct = float(outline_width_pct_raw)
-      outline_width_px = font_px * (outline_width_pct / 100.0)
     except Exception:
-      outline_width_px = outline_width_px_default
-  outline_width_px = clamp(outline_width_px, 0.0, 80.0)
+      outline_width_pct = None
 
   outline_opacity = outline_opacity_default
   if outline_opacity_pct_raw is not None and str(outline_opacity_pct_raw).strip() != "":
@@ -275,28 +293,437 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
     except Exception:
       outline_opacity = outline_opacity_default
 
-  layout = PangoCairo.create_layout(ctx)
-  fd = Pango.FontDescription()
-  fd.set_family(font_family)
-  if font_weight.lower() == "ultrabold":
-    fd.set_weight(Pango.Weight.ULTRABOLD)
-  elif font_weight.lower() == "heavy":
-    fd.set_weight(Pango.Weight.HEAVY)
-  elif font_weight.lower() == "semibold":
-    fd.set_weight(Pango.Weight.SEMIBOLD)
-  elif font_weight.lower() == "medium":
-    fd.set_weight(Pango.Weight.MEDIUM)
-  else:
-    fd.set_weight(Pango.Weight.BOLD if font_weight.lower() == "bold" else Pango.Weight.NORMAL)
-  if font_style.lower() == "italic":
-    fd.set_style(Pango.Style.ITALIC)
-  elif font_style.lower() == "oblique":
-    fd.set_style(Pango.Style.OBLIQUE)
-  else:
-    fd.set_style(Pango.Style.NORMAL)
-  fd.set_absolute_size(int(font_px * Pango.SCALE))
+  # Resolve outline color. None means "auto": picked at draw time from fontColor / gradient.
+  outline_color = None
+  if outline_color_raw is not None and str(outline_color_raw).strip() != "":
+    s = str(outline_color_raw).strip()
+    if s.lower() != "auto":
+      outline_color = s
+
+  return {
+    "style": style,
+    "pos": pos,
+    "aln": aln,
+    "font_size_pct": font_size_pct,
+    "auto_fit": auto_fit,
+    "auto_fit_min_pct": auto_fit_min_pct if auto_fit else None,
+    "auto_fit_max_pct": auto_fit_max_pct if auto_fit else None,
+    "max_width_pct": max_width_pct,
+    "tracking_pct": tracking_pct,
+    "line_spacing_pct": line_spacing_pct,
+    "has_any_margin": has_any_margin,
+    "margin_left_pct": margin_left_pct,
+    "margin_right_pct": margin_right_pct,
+    "margin_top_pct": margin_top_pct,
+    "margin_bottom_pct": margin_bottom_pct,
+    "placement_rect": placement_rect,
+    "font_color": font_color,
+    "shadow_color": shadow_color,
+    "shadow_offset_px": shadow_offset_px,
+    "shadow_blur_px": shadow_blur_px,
+    "shadow_opacity": shadow_opacity,
+    "offset_x_px": offset_x_px,
+    "offset_y_px": offset_y_px,
+    "bg_color": bg_color,
+    "bg_opacity": bg_opacity,
+    "font_gradient_key": font_gradient_key,
+    "font_key": font_key,
+    "font_family": font_family,
+    "font_weight": font_weight,
+    "font_style": font_style,
+    "outline_width_pct": outline_width_pct,
+    "outline_width_px_default": outline_width_px_default,
+    "outline_opacity": outline_opacity,
+    "outline_color": outline_color,
+  }
+
+
+# Phase timings (--timings / server "timings": true). Off by default; when on,
+# each phase accumulates wall-clock ms so a slow render can be attributed to
+# import, Fontconfig, shaping, shadow, gradient load, encode or write.
+_timings = None
+
+
+def timings_reset(enabled):
+  global _timings
+  _timings = {"t0": time.perf_counter(), "phases": {}, "instances": [], "meta": {}} if enabled else None
+
+
+def timing_add(phase, t0):
+  if _timings is None:
+    return
+  ms = (time.perf_counter() - t0) * 1000.0
+  _timings["phases"][phase] = _timings["phases"].get(phase, 0.0) + ms
+
+
+def timing_meta(key, value, accumulate=False):
+  if _timings is None:
+    return
+  if accumulate:
+    value = _timings["meta"].get(key, 0) + value
+  _timings["meta"][key] = value
+
+
+def timing_instance(entry):
+  if _timings is not None:
+    _timings["instances"].append(entry)
+
+
+def timings_report():
+  if _timings is None:
+    return None
+  out = {
+    "totalMs": round((time.perf_counter() - _timings["t0"]) * 1000.0, 3),
+    "phases": {k: round(v, 3) for k, v in _timings["phases"].items()},
+    "instances": _timings["instances"],
+  }
+  out.update(_timings["meta"])
+  return out
+
+
+# In-process resource cache: decoded gradient surfaces and base FontDescriptions,
+# shared by every instance a long-lived or batch renderer draws. Entries carry a
+# stamp (file mtime/size for gradients) and are reloaded when it changes; total
+# decoded bytes are capped with LRU eviction.
+RESOURCE_CACHE_MAX_BYTES = int(float(os.environ.get("SCREEN_TITLE_RESOURCE_CACHE_MB") or 64) * 1024 * 1024)
+
+
+class ResourceCache:
+  def __init__(self, max_bytes):
+    self.max_bytes = max(0, int(max_bytes))
+    self._entries = collections.OrderedDict()
+    self.bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def get(self, key, stamp, loader, sizer):
+    entry = self._entries.get(key)
+    if entry is not None and entry[0] == stamp:
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry[1]
+    self.misses += 1
+    value = loader()
+    size = int(sizer(value))
+    self.drop(key)
+    if size <= self.max_bytes:
+      self._entries[key] = (stamp, value, size)
+      self.bytes += size
+      self.evict()
+    return value
+
+  def peek(self, key, stamp):
+    # Lookup without loading, counting or touching LRU order.
+    entry = self._entries.get(key)
+    if entry is not None and entry[0] == stamp:
+      return entry[1]
+    return None
+
+  def drop(self, key):
+    entry = self._entries.pop(key, None)
+    if entry is not None:
+      self.bytes -= entry[2]
+
+  def evict(self):
+    while self.bytes > self.max_bytes and self._entries:
+      _key, (_stamp, _value, size) = self._entries.popitem(last=False)
+      self.bytes -= size
+      self.evictions += 1
+
+  def stats(self):
+    return {
+      "entries": len(self._entries),
+      "bytes": self.bytes,
+      "maxBytes": self.max_bytes,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+    }
+
+
+_resources = ResourceCache(RESOURCE_CACHE_MAX_BYTES)
+
+
+def gradient_surface_for(path, cairo):
+  st = os.stat(path)
+  stamp = (st.st_mtime_ns, st.st_size)
+
+  def load():
+    return cairo.ImageSurface.create_from_png(path)
+
+  def size(surface):
+    return surface.get_stride() * surface.get_height()
+
+  return _resources.get(("gradient", path), stamp, load, size)
+
+
+def font_description(Pango, family, weight, style):
+  # Returns a private copy: callers set the absolute size on it.
+  def build():
+    fd = Pango.FontDescription()
+    fd.set_family(family)
+    w = weight.lower()
+    if w == "ultrabold":
+      fd.set_weight(Pango.Weight.ULTRABOLD)
+    elif w == "heavy":
+      fd.set_weight(Pango.Weight.HEAVY)
+    elif w == "semibold":
+      fd.set_weight(Pango.Weight.SEMIBOLD)
+    elif w == "medium":
+      fd.set_weight(Pango.Weight.MEDIUM)
+    else:
+      fd.set_weight(Pango.Weight.BOLD if w == "bold" else Pango.Weight.NORMAL)
+    sl = style.lower()
+    if sl == "italic":
+      fd.set_style(Pango.Style.ITALIC)
+    elif sl == "oblique":
+      fd.set_style(Pango.Style.OBLIQUE)
+    else:
+      fd.set_style(Pango.Style.NORMAL)
+    return fd
+
+  base = _resources.get(("font", family, weight, style), None, build, lambda _fd: 256)
+  return base.copy()
+
+
+def warm_up_resources(libs):
+  # Preload every gradient and the curated font descriptions so the first
+  # request of a long-lived renderer doesn't pay for PNG decode.
+  Pango, _PangoCairo, cairo = libs
+  gdir = os.path.join(os.getcwd(), "assets", "font_gradients")
+  try:
+    names = sorted(os.listdir(gdir))
+  except OSError:
+    names = []
+  for name in names:
+    gp = gradient_path(name) if name.lower().endswith(".png") else None
+    if gp is None:
+      continue
+    try:
+      gradient_surface_for(gp, cairo)
+    except Exception:
+      pass
+  for family, weight, style in CURATED_FONTS.values():
+    try:
+      font_description(Pango, family, weight, style)
+    except Exception:
+      pass
+
+
+# Shadow blur: "gaussian" renders the glyph alpha mask once and blurs it with
+# three separable box passes (NumPy); "samples" is the legacy 17x ring re-draw.
+# "auto" uses gaussian when NumPy is importable.
+SHADOW_BLUR_MODE = (os.environ.get("SCREEN_TITLE_SHADOW_BLUR") or "auto").strip().lower()
+
+_numpy = None
+
+
+def load_numpy():
+  global _numpy
+  if _numpy is None:
+    try:
+      import numpy  # type: ignore
+      _numpy = numpy
+    except Exception:
+      _numpy = False
+  return _numpy or None
+
+
+def shadow_blur_impl():
+  if SHADOW_BLUR_MODE == "samples" or load_numpy() is None:
+    return "samples"
+  return "gaussian"
+
+
+def box_sizes_for_gauss(sigma, n=3):
+  # Widths of n successive box filters whose convolution approximates a Gaussian.
+  w_ideal = math.sqrt((12.0 * sigma * sigma / n) + 1.0)
+  wl = int(math.floor(w_ideal))
+  if wl % 2 == 0:
+    wl -= 1
+  wl = max(1, wl)
+  wu = wl + 2
+  m_ideal = (12.0 * sigma * sigma - n * wl * wl - 4.0 * n * wl - 3.0 * n) / (-4.0 * wl - 4.0)
+  m = int(round(m_ideal))
+  return [wl if i < m else wu for i in range(n)]
+
+
+def box_blur_axis(np, a, r, axis):
+  # Running-sum box filter: cost is independent of the radius.
+  if r <= 0:
+    return a
+  pad = [(0, 0), (0, 0)]
+  pad[axis] = (r + 1, r)
+  c = np.cumsum(np.pad(a, pad), axis=axis, dtype=np.float32)
+  k = 2 * r + 1
+  if axis == 1:
+    return (c[:, k:] - c[:, :-k]) / float(k)
+  return (c[k:, :] - c[:-k, :]) / float(k)
+
+
+def gaussian_blur_a8(np, surface, sigma):
+  surface.flush()
+  w = surface.get_width()
+  h = surface.get_height()
+  stride = surface.get_stride()
+  buf = np.frombuffer(surface.get_data(), dtype=np.uint8).reshape(h, stride)
+  a = buf[:, :w].astype(np.float32)
+  for size in box_sizes_for_gauss(sigma):
+    r = (size - 1) // 2
+    a = box_blur_axis(np, a, r, 1)
+    a = box_blur_axis(np, a, r, 0)
+  buf[:, :w] = np.clip(a + 0.5, 0.0, 255.0).astype(np.uint8)
+  surface.mark_dirty()
+
+
+def draw_blurred_shadow(ctx, layout, ink, x, y, blur, rgba, PangoCairo, cairo, retarget=True):
+  # Rasterize the glyph coverage once into an A8 mask sized to the ink box, blur it,
+  # then composite it once in the shadow color. Returns False when the fast path is
+  # unavailable so the caller can fall back to ring samples.
+  if shadow_blur_impl() != "gaussian" or ink.width <= 0 or ink.height <= 0:
+    return False
+  np = load_numpy()
+  sigma = max(0.5, float(blur) / 2.0)
+  pad = int(math.ceil(sigma * 3.0)) + 2
+  mw = int(ink.width) + 2 * pad
+  mh = int(ink.height) + 2 * pad
+  try:
+    mask = cairo.ImageSurface(cairo.FORMAT_A8, mw, mh)
+    mctx = cairo.Context(mask)
+    mctx.translate(pad - ink.x, pad - ink.y)
+    PangoCairo.update_layout(mctx, layout)
+    PangoCairo.show_layout(mctx, layout)
+    gaussian_blur_a8(np, mask, sigma)
+  except Exception:
+    return False
+  finally:
+    if retarget:
+      PangoCairo.update_layout(ctx, layout)
+  ctx.save()
+  ctx.set_source_rgba(*rgba)
+  ctx.mask_surface(mask, x + ink.x - pad, y + ink.y - pad)
+  ctx.restore()
+  return True
+
+
+class PreparedInstance:
+  # One title instance after shaping: normalized style, the shaped Pango layout,
+  # its extents and the placed box. Built once per render; the measure pass and
+  # the draw pass both read from it, so text is shaped exactly once.
+  def __init__(self, **fields):
+    self.__dict__.update(fields)
+
+
+# Shaped-layout cache: instances that differ only in colors, shadow, outline or
+# position share one shaped PangoLayout (plus its extents). Layouts are drawn via
+# PangoCairo.update_layout, so they can be reused across surfaces. Keyed by the
+# shape tuple built in prepare_instance; capped by an estimate of Pango's memory.
+LAYOUT_CACHE_MAX_BYTES = int(float(os.environ.get("SCREEN_TITLE_LAYOUT_CACHE_MB") or 16) * 1024 * 1024)
+
+_layouts = ResourceCache(LAYOUT_CACHE_MAX_BYTES)
+
+
+def build_layout(ctx, shape, Pango, PangoCairo, layout=None):
+  # Applies every shape parameter, so an existing layout (auto-fit probes) can be
+  # re-shaped in place instead of allocating a new one per probe.
+  text, font_family, font_weight, font_style, size_units, width_units, aln, letter_units, spacing_units, height_units = shape
+  reused = layout is not None
+  if not reused:
+    layout = PangoCairo.create_layout(ctx)
+  fd = font_description(Pango, font_family, font_weight, font_style)
+  fd.set_absolute_size(size_units)
   layout.set_font_description(fd)
 
+  layout.set_width(width_units)
+  layout.set_wrap(Pango.WrapMode.WORD_CHAR)
+  if aln == "left":
+    layout.set_alignment(Pango.Alignment.LEFT)
+  elif aln == "right":
+    layout.set_alignment(Pango.Alignment.RIGHT)
+  else:
+    layout.set_alignment(Pango.Alignment.CENTER)
+
+  # Text shaping on by default; allow \n.
+  layout.set_text(text, -1)
+
+  # Extra line spacing, expressed as % of font size.
+  # Pango spacing is in Pango units (Pango.SCALE). This adds *extra* spacing between lines.
+  try:
+    layout.set_spacing(spacing_units)
+  except Exception:
+    pass
+
+  layout.set_ellipsize(Pango.EllipsizeMode.END)
+  try:
+    layout.set_height(height_units)
+  except Exception:
+    # If height clamp fails for any reason, fall back to “no limit”.
+    try:
+      layout.set_height(0)
+    except Exception:
+      pass
+
+  if letter_units != 0:
+    # Pango letter spacing is in Pango units (Pango.SCALE == 1024 units per device unit).
+    # GI bindings expose this as attr_letter_spacing_new().
+    try:
+      new_fn = getattr(Pango, "attr_letter_spacing_new", None)
+      if callable(new_fn):
+        attrs = Pango.AttrList()
+        a = new_fn(letter_units)
+        a.start_index = 0
+        a.end_index = len(text.encode("utf-8"))
+        attrs.insert(a)
+        layout.set_attributes(attrs)
+    except Exception:
+      pass
+  elif reused:
+    layout.set_attributes(None)
+
+  ink, logical = layout.get_pixel_extents()
+  return layout, ink, logical
+
+
+def shaped_layout(ctx, shape, Pango, PangoCairo, layout=None):
+  def load():
+    return build_layout(ctx, shape, Pango, PangoCairo, layout)
+
+  def size(_entry):
+    # Rough per-layout footprint: glyph strings + line/run structs.
+    return 2048 + 96 * len(shape[0])
+
+  hits = _layouts.hits
+  entry = _layouts.get(("layout",) + shape, None, load, size)
+  timing_meta("layoutCacheHits" if _layouts.hits > hits else "layoutCacheMisses", 1, accumulate=True)
+  return entry
+
+
+def instance_shape(st, text, width, height, font_px, Pango):
+  # Layout constraints at one font size: the shape key for shaped_layout plus the
+  # font-size-dependent geometry prepare_instance needs afterwards.
+  style = st["style"]
+  aln = st["aln"]
+  placement_rect = st["placement_rect"]
+  shadow_offset_px = st["shadow_offset_px"]
+  shadow_blur_px = st["shadow_blur_px"]
+  max_width_pct = st["max_width_pct"]
+  tracking_pct = st["tracking_pct"]
+  line_spacing_pct = st["line_spacing_pct"]
+  has_any_margin = st["has_any_margin"]
+  font_family = st["font_family"]
+  font_weight = st["font_weight"]
+  font_style = st["font_style"]
+  margin_left_pct = st["margin_left_pct"]
+  margin_right_pct = st["margin_right_pct"]
+  margin_top_pct = st["margin_top_pct"]
+  margin_bottom_pct = st["margin_bottom_pct"]
+
+  outline_width_px = st["outline_width_px_default"]
+  if st["outline_width_pct"] is not None:
+    outline_width_px = font_px * (st["outline_width_pct"] / 100.0)
+  outline_width_px = clamp(outline_width_px, 0.0, 80.0)
+
   # Constrain layout width so that the final pill (text + padding + stroke/shadow)
   # fits within the X inset on both sides; otherwise we end up clamping the pill
   # against one edge, producing visibly asymmetric margins.
@@ -335,58 +762,120 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
   if not has_any_margin:
     max_w = min(width * max_width_pct, max_layout_w_allowed0)
   max_w = max(10.0, max_w)
-  layout.set_width(int(max_w * Pango.SCALE))
-  layout.set_wrap(Pango.WrapMode.WORD_CHAR)
-  if aln == "left":
-    layout.set_alignment(Pango.Alignment.LEFT)
-  elif aln == "right":
-    layout.set_alignment(Pango.Alignment.RIGHT)
-  else:
-    layout.set_alignment(Pango.Alignment.CENTER)
   # Clamp layout height so the text box always fits within the vertical margins.
   # We clamp by pixel height (not “number of lines”) so paragraph breaks / blank
   # lines behave consistently and we don’t get clipping at the bottom edge.
   max_box_h_allowed0 = max(10.0, region_h0)
   max_layout_h_allowed0 = max(10.0, max_box_h_allowed0 - (2.0 * (pad_y0 + stroke_pad0)) - abs(shadow_dy0) - (2.0 * shadow_blur0))
 
-  # Text shaping on by default; allow \n.
-  layout.set_text(text, -1)
-
-  # Extra line spacing, expressed as % of font size.
-  # Pango spacing is in Pango units (Pango.SCALE). This adds *extra* spacing between lines.
-  try:
-    extra_line_px = font_px * (line_spacing_pct / 100.0)
-    layout.set_spacing(int(extra_line_px * Pango.SCALE))
-  except Exception:
-    pass
+  # Everything that affects shaping/line breaking, in the Pango units it is applied in.
+  shape = (
+    text,
+    font_family,
+    font_weight,
+    font_style,
+    int(font_px * Pango.SCALE),
+    int(max_w * Pango.SCALE),
+    aln,
+    int(font_px * (tracking_pct / 100.0) * Pango.SCALE) if tracking_pct != 0.0 else 0,
+    int(font_px * (line_spacing_pct / 100.0) * Pango.SCALE),
+    int(max_layout_h_allowed0 * Pango.SCALE),
+  )
+  bounds = {
+    "outline_width_px": outline_width_px,
+    "stroke_pad0": stroke_pad0,
+    "placement_rect": placement_rect,
+    "region_x0": region_x0,
+    "region_y0": region_y0,
+    "region_w0": region_w0,
+    "region_h0": region_h0,
+  }
+  return shape, bounds
+
+
+def auto_fit_layout(ctx, st, text, width, height, Pango, PangoCairo):
+  # Binary search over fontSizePct in 0.1 steps for the largest size whose layout
+  # is not ellipsized. All probes re-shape one layout object in place; sizes
+  # already in the layout cache are answered without shaping. The common case
+  # (text fits at the max size) costs a single probe.
+  lo = int(round(st["auto_fit_min_pct"] * 10.0))
+  hi = int(round(st["auto_fit_max_pct"] * 10.0))
+  probe = {"layout": None, "shape": None}
+
+  def at(step):
+    pct = step / 10.0
+    px = clamp(height * (pct / 100.0), 8.0, 220.0)
+    shape, bounds = instance_shape(st, text, width, height, px, Pango)
+    return pct, px, shape, bounds
+
+  def fits(shape):
+    cached = _layouts.peek(("layout",) + shape, None)
+    if cached is not None:
+      return not layout_is_ellipsized(cached[0])
+    if probe["layout"] is None:
+      probe["layout"] = PangoCairo.create_layout(ctx)
+    build_layout(ctx, shape, Pango, PangoCairo, probe["layout"])
+    probe["shape"] = shape
+    return not layout_is_ellipsized(probe["layout"])
+
+  probes = 1
+  best = hi
+  if not fits(at(hi)[2]):
+    # Invariant: lo fits or nothing does; hi doesn't.
+    best = lo
+    lo_step = lo
+    hi_step = hi
+    while hi_step - lo_step > 1:
+      mid = (lo_step + hi_step) // 2
+      probes += 1
+      if fits(at(mid)[2]):
+        lo_step = mid
+      else:
+        hi_step = mid
+    best = lo_step
+  pct, px, shape, bounds = at(best)
+  if probe["layout"] is not None and probe["shape"] == shape:
+    # The probe already holds the winning shape: cache it as-is, no extra pass.
+    ink, logical = probe["layout"].get_pixel_extents()
+    entry = _layouts.get(("layout",) + shape, None, lambda: (probe["layout"], ink, logical), lambda _e: 2048 + 96 * len(text))
+  else:
+    entry = shaped_layout(ctx, shape, Pango, PangoCairo, probe["layout"])
+  timing_meta("autoFitProbes", probes, accumulate=True)
+  return pct, px, shape, bounds, entry
 
-  layout.set_ellipsize(Pango.EllipsizeMode.END)
-  try:
-    layout.set_height(int(max_layout_h_allowed0 * Pango.SCALE))
-  except Exception:
-    # If height clamp fails for any reason, fall back to “no limit”.
-    try:
-      layout.set_height(0)
-    except Exception:
-      pass
 
-  if tracking_pct != 0.0:
-    # Pango letter spacing is in Pango units (Pango.SCALE == 1024 units per device unit).
-    # GI bindings expose this as attr_letter_spacing_new().
-    letter_px = font_px * (tracking_pct / 100.0)
-    try:
-      new_fn = getattr(Pango, "attr_letter_spacing_new", None)
-      if callable(new_fn):
-        attrs = Pango.AttrList()
-        a = new_fn(int(letter_px * Pango.SCALE))
-        a.start_index = 0
-        a.end_index = len(text.encode("utf-8"))
-        attrs.insert(a)
-        layout.set_attributes(attrs)
-    except Exception:
-      pass
+def prepare_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo):
+  if not text:
+    return None
 
-  ink, logical = layout.get_pixel_extents()
+  st = normalize_instance_style(preset)
+  style = st["style"]
+  pos = st["pos"]
+  aln = st["aln"]
+  font_size_pct = st["font_size_pct"]
+  margin_left_pct = st["margin_left_pct"]
+  margin_right_pct = st["margin_right_pct"]
+  margin_top_pct = st["margin_top_pct"]
+  margin_bottom_pct = st["margin_bottom_pct"]
+  shadow_offset_px = st["shadow_offset_px"]
+  shadow_blur_px = st["shadow_blur_px"]
+  offset_x_px = st["offset_x_px"]
+  offset_y_px = st["offset_y_px"]
+
+  if st["auto_fit"]:
+    font_size_pct, font_px, shape, bounds, (layout, ink, logical) = auto_fit_layout(ctx, st, text, width, height, Pango, PangoCairo)
+  else:
+    font_px = height * (font_size_pct / 100.0)
+    font_px = clamp(font_px, 8.0, 220.0)
+    shape, bounds = instance_shape(st, text, width, height, font_px, Pango)
+    layout, ink, logical = shaped_layout(ctx, shape, Pango, PangoCairo)
+  outline_width_px = bounds["outline_width_px"]
+  stroke_pad0 = bounds["stroke_pad0"]
+  placement_rect = bounds["placement_rect"]
+  region_x0 = bounds["region_x0"]
+  region_y0 = bounds["region_y0"]
+  region_w0 = bounds["region_w0"]
+  region_h0 = bounds["region_h0"]
   # Prefer ink extents for sizing backgrounds (pill) so we don't clip glyphs.
   # logical extents can undercount depending on font metrics / stroke / layout alignment.
   content_x = float(ink.x)
@@ -432,16 +921,6 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
   box_w = content_w + 2.0 * (pad_x + stroke_pad) + abs(shadow_dx) + (2.0 * shadow_blur)
   box_h = content_h + 2.0 * (pad_y + stroke_pad) + abs(shadow_dy) + (2.0 * shadow_blur)
 
-  if measure_out is not None:
-    try:
-      measure_out["box_h"] = float(box_h)
-      measure_out["box_w"] = float(box_w)
-    except Exception:
-      pass
-
-  if measure_only:
-    return
-
   # Position the bounding box, then derive the layout draw origin.
   if aln == "left":
     box_x = region_x
@@ -483,6 +962,83 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
     else:
       box_y = clamp(box_y, -box_h, height)
 
+  return PreparedInstance(
+    text=text,
+    st=st,
+    width=width,
+    height=height,
+    font_size_pct=font_size_pct,
+    font_px=font_px,
+    outline_width_px=outline_width_px,
+    layout=layout,
+    ink=ink,
+    logical=logical,
+    pad_x=pad_x,
+    pad_y=pad_y,
+    stroke_pad=stroke_pad,
+    shadow_dx=shadow_dx,
+    shadow_dy=shadow_dy,
+    shadow_blur=shadow_blur,
+    region_x=region_x,
+    region_y=region_y,
+    region_w=region_w,
+    region_h=region_h,
+    box_x0=box_x0,
+    box_y0=box_y0,
+    box_w=box_w,
+    box_h=box_h,
+    box_x=box_x,
+    box_y=box_y,
+  )
+
+
+def measure_prepared(p, measure_out):
+  try:
+    measure_out["box_h"] = float(p.box_h)
+    measure_out["box_w"] = float(p.box_w)
+    measure_out["box_x"] = float(p.box_x)
+    measure_out["box_y"] = float(p.box_y)
+    # Shadow samples can land outside the box (negative offsets, blur ring)
+    # (the Gaussian mask is padded by 3 sigma = 1.5x the blur radius).
+    measure_out["bleed"] = abs(p.st["shadow_offset_px"]) + (1.5 * p.shadow_blur) + 2.0
+  except Exception:
+    pass
+
+
+def draw_prepared(ctx, p, Pango, PangoCairo, cairo, retarget=True, glyphs=True):
+  # retarget=False keeps the layout bound to the context it was shaped on: drawing
+  # through a scaled CTM then reuses the shaping instead of re-laying out.
+  # glyphs=False draws only the background (the animation base frame).
+  st = p.st
+  style = st["style"]
+  font_color = st["font_color"]
+  shadow_color = st["shadow_color"]
+  shadow_opacity = st["shadow_opacity"]
+  bg_color = st["bg_color"]
+  bg_opacity = st["bg_opacity"]
+  font_gradient_key = st["font_gradient_key"]
+  outline_opacity = st["outline_opacity"]
+  width = p.width
+  height = p.height
+  layout = p.layout
+  ink = p.ink
+  font_px = p.font_px
+  outline_width_px = p.outline_width_px
+  pad_x = p.pad_x
+  pad_y = p.pad_y
+  stroke_pad = p.stroke_pad
+  shadow_dx = p.shadow_dx
+  shadow_dy = p.shadow_dy
+  shadow_blur = p.shadow_blur
+  region_x = p.region_x
+  region_w = p.region_w
+  box_x0 = p.box_x0
+  box_y0 = p.box_y0
+  box_w = p.box_w
+  box_h = p.box_h
+  box_x = p.box_x
+  box_y = p.box_y
+
   x_draw = box_x - box_x0
   y_draw = box_y - box_y0
 
@@ -548,8 +1104,11 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
       for (rx, ry, rw, rh) in rects:
         rounded_rect(ctx, rx, ry, rw, rh, radius)
         ctx.fill()
+  if not glyphs:
+    return
   # Shadow (configurable offset/blur/opacity).
   if style in ("pill", "none", "merged_pill") and shadow_opacity > 0.0:
+    shadow_t0 = time.perf_counter()
     sr, sg, sb, _sa = hex_to_rgba(shadow_color, shadow_opacity)
 
     def shadow_samples(blur):
@@ -569,10 +1128,26 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
         samples.append((math.cos(ang) * r2, math.sin(ang) * r2, 0.9))
       return samples
 
-    samples = shadow_samples(shadow_blur)
+    drew_blurred = False
+    if shadow_blur > 0.01:
+      drew_blurred = draw_blurred_shadow(
+        ctx,
+        layout,
+        ink,
+        x_draw + shadow_dx,
+        y_draw + shadow_dy,
+        shadow_blur,
+        (sr, sg, sb, shadow_opacity),
+        PangoCairo,
+        cairo,
+        retarget,
+      )
+
+    samples = [] if drew_blurred else shadow_samples(shadow_blur)
     wsum = sum([w for (_x, _y, w) in samples]) or 1.0
     ctx.save()
-    PangoCairo.update_layout(ctx, layout)
+    if retarget:
+      PangoCairo.update_layout(ctx, layout)
     for ox, oy, w in samples:
       a = shadow_opacity * (w / wsum)
       if a <= 0.0001:
@@ -583,38 +1158,33 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
       PangoCairo.show_layout(ctx, layout)
       ctx.restore()
     ctx.restore()
+    timing_add("shadow", shadow_t0)
 
   # Optional gradient fill (screen-sized PNG masked by glyphs).
   gradient_surface = None
   gradient_pattern = None
   if font_gradient_key:
+    gradient_t0 = time.perf_counter()
     try:
-      import os
-      # Prevent traversal: filenames only.
-      if "/" not in font_gradient_key and "\\" not in font_gradient_key and ".." not in font_gradient_key:
-        gp = os.path.join(os.getcwd(), "assets", "font_gradients", font_gradient_key)
-        if os.path.isfile(gp):
-          gradient_surface = cairo.ImageSurface.create_from_png(gp)
-          gradient_pattern = cairo.SurfacePattern(gradient_surface)
-          try:
-            gradient_pattern.set_filter(cairo.FILTER_BILINEAR)
-          except Exception:
-            pass
-          try:
-            gradient_pattern.set_extend(cairo.EXTEND_PAD)
-          except Exception:
-            pass
+      gp = gradient_path(font_gradient_key)
+      if gp is not None:
+        gradient_surface = gradient_surface_for(gp, cairo)
+        gradient_pattern = cairo.SurfacePattern(gradient_surface)
+        try:
+          gradient_pattern.set_filter(cairo.FILTER_BILINEAR)
+        except Exception:
+          pass
+        try:
+          gradient_pattern.set_extend(cairo.EXTEND_PAD)
+        except Exception:
+          pass
     except Exception:
       gradient_surface = None
       gradient_pattern = None
+    timing_add("gradient_load", gradient_t0)
 
   # Resolve outline color. If unset/'auto', choose a high-contrast color based on fontColor.
-  outline_color = None
-  if outline_color_raw is not None and str(outline_color_raw).strip() != "":
-    s = str(outline_color_raw).strip()
-    if s.lower() != "auto":
-      outline_color = s
-
+  outline_color = st["outline_color"]
   if outline_color is None:
     fr, fg, fb, _ = hex_to_rgba(font_color, 1.0)
     # For gradients, "auto" is ambiguous; use fontColor as a hint and bias toward black.
@@ -628,7 +1198,8 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
   rr, gg, bb, aa = hex_to_rgba(font_color, 1.0)
   ctx.save()
   ctx.translate(x_draw, y_draw)
-  PangoCairo.update_layout(ctx, layout)
+  if retarget:
+    PangoCairo.update_layout(ctx, layout)
   PangoCairo.layout_path(ctx, layout)
   if outline_width_px > 0.0 and outline_opacity > 0.0:
     or_, og, ob, _oa = hex_to_rgba(outline_color, outline_opacity)
@@ -653,26 +1224,45 @@ def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo,
   ctx.restore()
 
 
-def main():
-  ap = argparse.ArgumentParser()
-  ap.add_argument("--input-json", required=True)
-  ap.add_argument("--out", required=True)
-  args = ap.parse_args()
+def render_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo, anchor_box_h_middle=None, anchor_box_h_bottom=None, measure_out=None, measure_only=False):
+  prepared = prepare_instance(ctx, width, height, text, preset, Pango, PangoCairo, cairo)
+  if prepared is None:
+    return
+  if measure_out is not None:
+    measure_prepared(prepared, measure_out)
+  if measure_only:
+    return
+  draw_prepared(ctx, prepared, Pango, PangoCairo, cairo)
+
+
+class RenderError(Exception):
+  def __init__(self, code, exit_code=2):
+    super().__init__(code)
+    self.code = code
+    self.exit_code = exit_code
 
-  try:
-    with open(args.input_json, "r", encoding="utf-8") as f:
-      payload = json.load(f)
-  except Exception as e:
-    sys.stderr.write(f"failed_read_input_json: {e}\n")
-    return 2
 
+def parse_frame(payload):
   frame = payload.get("frame") or {}
-  width = int(frame.get("width") or 0)
-  height = int(frame.get("height") or 0)
+  try:
+    width = int(frame.get("width") or 0)
+    height = int(frame.get("height") or 0)
+  except Exception:
+    width = 0
+    height = 0
   if width <= 0 or height <= 0:
-    sys.stderr.write("invalid_frame\n")
-    return 2
+    raise RenderError("invalid_frame")
+  return width, height
+
 
+def parse_render_input(payload):
+  if not isinstance(payload, dict):
+    raise RenderError("invalid_input")
+  width, height = parse_frame(payload)
+  return width, height, parse_instances(payload)
+
+
+def parse_instances(payload):
   instances_raw = payload.get("instances")
   instances = []
   if isinstance(instances_raw, list) and len(instances_raw) > 0:
@@ -687,16 +1277,24 @@ def main():
   else:
     text = str(payload.get("text") or "").replace("\r\n", "\n").strip()
     if not text:
-      sys.stderr.write("missing_text\n")
-      return 2
+      raise RenderError("missing_text")
     preset = payload.get("preset") or {}
     instances.append({"text": text, "preset": preset})
 
   if not instances:
-    sys.stderr.write("missing_text\n")
-    return 2
+    raise RenderError("missing_text")
+  return instances
 
+
+_render_libs = None
+
+
+def load_render_libs():
   # Import GI only after validating args; yields clearer error if missing.
+  global _render_libs
+  if _render_libs is not None:
+    return _render_libs
+  t0 = time.perf_counter()
   try:
     import gi  # type: ignore
     gi.require_foreign("cairo")
@@ -705,81 +1303,1881 @@ def main():
     from gi.repository import Pango, PangoCairo  # type: ignore
     import cairo  # type: ignore
   except Exception as e:
-    sys.stderr.write(f"missing_pango_deps: {e}\n")
-    return 3
+    raise RenderError(f"missing_pango_deps: {e}", 3)
+  _render_libs = (Pango, PangoCairo, cairo)
+  timing_add("import", t0)
+  return _render_libs
+
+
+_fontconfig_ready = False
 
-  surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+
+def init_fontconfig(libs):
+  # Fontconfig loads lazily on first font lookup; doing it explicitly keeps its
+  # cost out of the first instance's shaping time.
+  global _fontconfig_ready
+  if _fontconfig_ready:
+    return
+  _fontconfig_ready = True
+  t0 = time.perf_counter()
+  try:
+    libs[1].FontMap.get_default().list_families()
+  except Exception:
+    pass
+  timing_add("fontconfig", t0)
+
+
+def warm_up_fonts(libs):
+  # Force Fontconfig init and the default font map load up front so a long-lived
+  # renderer pays for the directory scan once, not on its first request.
+  Pango, PangoCairo, cairo = libs
+  init_fontconfig(libs)
+  try:
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 8, 8)
+    layout = PangoCairo.create_layout(cairo.Context(surface))
+    fd = Pango.FontDescription()
+    fd.set_family("DejaVu Sans")
+    fd.set_absolute_size(int(16 * Pango.SCALE))
+    layout.set_font_description(fd)
+    layout.set_text("Ag", -1)
+    layout.get_pixel_extents()
+  except Exception:
+    pass
+
+
+def crop_rect_for_boxes(width, height, boxes):
+  # Union of the instance boxes (plus shadow bleed), clipped to the frame. The
+  # origin is rounded down to even pixels: the overlay is composited into
+  # yuv420p output, where ffmpeg's overlay blends chroma at (x/2, y/2), so an
+  # odd origin would put the title's colour half a pixel off its edges. The far
+  # edge stays put, so width/height grow by at most one pixel.
+  x0 = None
+  for b in boxes:
+    bleed = float(b.get("bleed") or 0.0)
+    bx0 = float(b["box_x"]) - bleed
+    by0 = float(b["box_y"]) - bleed
+    bx1 = float(b["box_x"]) + float(b["box_w"]) + bleed
+    by1 = float(b["box_y"]) + float(b["box_h"]) + bleed
+    if x0 is None:
+      x0, y0, x1, y1 = bx0, by0, bx1, by1
+    else:
+      x0, y0, x1, y1 = min(x0, bx0), min(y0, by0), max(x1, bx1), max(y1, by1)
+  if x0 is None:
+    return 0, 0, 1, 1
+  ix0 = int(clamp(math.floor(x0), 0, width)) & ~1
+  iy0 = int(clamp(math.floor(y0), 0, height)) & ~1
+  ix1 = int(clamp(math.ceil(x1), 0, width))
+  iy1 = int(clamp(math.ceil(y1), 0, height))
+  if ix1 <= ix0 or iy1 <= iy0:
+    return 0, 0, 1, 1
+  return ix0, iy0, ix1 - ix0, iy1 - iy0
+
+
+def prepare_instances(ctx, width, height, instances, libs):
+  Pango, PangoCairo, cairo = libs
+  init_fontconfig(libs)
+  prepared = []
+  for idx, inst in enumerate(instances):
+    t0 = time.perf_counter()
+    p = prepare_instance(ctx, width, height, inst.get("text"), inst.get("preset") or {}, Pango, PangoCairo, cairo)
+    timing_add("shaping", t0)
+    if p is not None:
+      p.index = idx
+      prepared.append(p)
+      if _timings is not None:
+        timing_instance({
+          "index": idx,
+          "shapeMs": round((time.perf_counter() - t0) * 1000.0, 3),
+          "chars": len(p.text),
+          "lines": int(p.layout.get_line_count()),
+          "fontPx": round(p.font_px, 2),
+        })
+  return prepared
+
+
+def render_frame(libs, width, height, instances, crop=False, scale=1.0, prepared=None):
+  # Returns (surface, placement). With crop=True the surface only covers the union
+  # of the instance boxes and placement carries its offset within the frame.
+  # scale < 1.0 (preview) lays out at width x height but rasterizes onto a
+  # proportionally smaller surface; placement is then in preview pixels.
+  # prepared: instances already shaped for this frame (see shape_instances).
+  if prepared is None:
+    prepared = shape_instances(libs, width, height, instances)
+  if scale >= 1.0:
+    return draw_frame(libs, prepared, width, height, crop)
+  sw = max(1, int(round(width * scale)))
+  sh = max(1, int(round(height * scale)))
+  surface, placement = draw_frame(libs, prepared, sw, sh, crop, scale)
+  placement["scale"] = scale
+  return surface, placement
+
+
+def shape_instances(libs, width, height, instances):
+  # Shape every instance exactly once, before the target surface exists (its size
+  # may depend on the boxes). Layout metrics from a 1x1 image surface match any
+  # other image surface; draw_prepared re-targets the layout via update_layout.
+  cairo = libs[2]
+  scratch = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+  return prepare_instances(scratch, width, height, instances, libs)
+
+
+def draw_frame(libs, prepared, width, height, crop=False, scale=1.0, glyphs=True):
+  # scale != 1.0 draws instances prepared for a larger frame through a uniform
+  # CTM scale (see render_ladder); their boxes are scaled to match for crop.
+  Pango, PangoCairo, cairo = libs
+  ox, oy, sw, sh = 0, 0, width, height
+  if crop:
+    boxes = []
+    for p in prepared:
+      measure_out = {}
+      measure_prepared(p, measure_out)
+      if scale != 1.0:
+        measure_out = {k: float(v) * scale for k, v in measure_out.items()}
+      boxes.append(measure_out)
+    ox, oy, sw, sh = crop_rect_for_boxes(width, height, boxes)
+
+  surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, sw, sh)
   ctx = cairo.Context(surface)
   ctx.set_source_rgba(0.0, 0.0, 0.0, 0.0)
   ctx.set_operator(cairo.OPERATOR_SOURCE)
   ctx.paint()
   ctx.set_operator(cairo.OPERATOR_OVER)
+  if ox or oy:
+    # Draw in frame coordinates; gradient patterns stay frame-aligned too.
+    ctx.translate(-ox, -oy)
+  if scale != 1.0:
+    ctx.scale(scale, scale)
+
+  t0 = time.perf_counter()
+  for p in prepared:
+    draw_prepared(ctx, p, Pango, PangoCairo, cairo, retarget=(scale == 1.0), glyphs=glyphs)
+  timing_add("draw", t0)
+  timing_meta("surface", {"width": sw, "height": sh})
+  placement = {"x": ox, "y": oy, "width": sw, "height": sh, "frameWidth": width, "frameHeight": height}
+  fitted = [p for p in prepared if p.st["auto_fit"]]
+  if fitted:
+    # Report the sizes auto-fit chose, so callers can persist them.
+    placement["autoFit"] = [
+      {
+        "index": p.index,
+        "fontSizePct": round(p.font_size_pct, 2),
+        "fontPx": round(p.font_px, 2),
+        "ellipsized": layout_is_ellipsized(p.layout),
+      }
+      for p in fitted
+    ]
+  return surface, placement
+
+
+# Measure-only mode: shape on the 1x1 scratch context and report layout facts
+# (box rect, line count, ellipsis, final font size) without a frame surface or
+# PNG encode. "texts" measures many candidate strings against one preset.
+MAX_MEASURE_TEXTS = 500
+
+
+def layout_is_ellipsized(layout):
+  try:
+    return bool(layout.is_ellipsized())
+  except Exception:
+    return False
+
 
-  # Compute shared anchor heights so middle/bottom aligned instances keep
-  # consistent vertical spacing regardless of individual text box height.
-  anchor_box_h_middle = None
-  anchor_box_h_bottom = None
+def measure_prepared_instance(p):
+  measure_out = {}
+  measure_prepared(p, measure_out)
+  ellipsized = layout_is_ellipsized(p.layout)
+  fits = (
+    not ellipsized
+    and p.box_w <= p.region_w + 0.5
+    and p.box_h <= p.region_h + 0.5
+  )
+  return {
+    "box": {
+      "x": round(measure_out["box_x"], 2),
+      "y": round(measure_out["box_y"], 2),
+      "width": round(measure_out["box_w"], 2),
+      "height": round(measure_out["box_h"], 2),
+    },
+    "bleed": round(measure_out["bleed"], 2),
+    "lines": int(p.layout.get_line_count()),
+    "ellipsized": ellipsized,
+    "fits": fits,
+    "fontPx": round(p.font_px, 2),
+    "fontSizePct": round(p.font_size_pct, 2),
+    "autoFit": bool(p.st["auto_fit"]),
+  }
+
+
+def empty_measurement():
+  return {"box": None, "bleed": 0.0, "lines": 0, "ellipsized": False, "fits": True, "fontPx": None, "fontSizePct": None, "autoFit": False, "empty": True}
+
+
+def measure_text(ctx, width, height, text, preset, libs):
+  Pango, PangoCairo, cairo = libs
+  text = str(text or "").replace("\r\n", "\n").strip()
+  t0 = time.perf_counter()
+  p = prepare_instance(ctx, width, height, text, preset or {}, Pango, PangoCairo, cairo)
+  timing_add("shaping", t0)
+  if p is None:
+    return empty_measurement()
+  return measure_prepared_instance(p)
+
+
+def measure_payload(libs, payload):
+  if not isinstance(payload, dict):
+    raise RenderError("invalid_input")
+  texts = payload.get("texts")
+  if texts is None:
+    width, height, instances = parse_render_input(payload)
+  else:
+    if not isinstance(texts, list):
+      raise RenderError("invalid_texts")
+    if len(texts) > MAX_MEASURE_TEXTS:
+      raise RenderError("too_many_texts")
+    width, height = parse_frame(payload)
+  Pango, PangoCairo, cairo = libs
+  init_fontconfig(libs)
+  scratch = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+  frame = {"width": width, "height": height}
+  if texts is None:
+    results = [measure_text(scratch, width, height, inst["text"], inst["preset"], libs) for inst in instances]
+    return {"frame": frame, "instances": results}
+  preset = payload.get("preset") or {}
+  results = []
+  for t in texts:
+    m = measure_text(scratch, width, height, t, preset, libs)
+    m["text"] = str(t or "")
+    results.append(m)
+  return {"frame": frame, "results": results}
+
+
+def write_png(surface, out):
   try:
-    max_box_h_mid = 0.0
-    max_box_h_bot = 0.0
-    for inst in instances:
-      preset = inst.get("preset") or {}
-      pos = normalize_position(preset.get("position"))
-      if pos not in ("middle", "bottom"):
+    surface.write_to_png(out)
+  except Exception as e:
+    raise RenderError(f"failed_write_png: {e}", 4)
+
+
+def encode_png(surface):
+  buf = io.BytesIO()
+  write_png(surface, buf)
+  return buf.getvalue()
+
+
+# Output formats. "png" is the default; "bgra" is cairo's ARGB32 buffer as-is
+# (premultiplied, B,G,R,A byte order, no row padding) for ffmpeg
+# `-f rawvideo -pix_fmt bgra` + overlay=...:alpha=premultiplied; "rgba" is
+# straight-alpha R,G,B,A for `-pix_fmt rgba`.
+OUTPUT_FORMATS = ("png", "bgra", "rgba")
+
+
+def surface_bgra_bytes(surface, y0=0, y1=None):
+  # Rows [y0, y1) only when a band is given (incremental animation encodes).
+  surface.flush()
+  w = surface.get_width()
+  h = surface.get_height() if y1 is None else y1
+  stride = surface.get_stride()
+  data = bytes(surface.get_data()[y0 * stride:h * stride])
+  if stride != w * 4:
+    data = b"".join(data[y * stride:y * stride + w * 4] for y in range(h - y0))
+  if sys.byteorder == "big":
+    # ARGB32 is native-endian words: A,R,G,B in memory on big-endian hosts.
+    src = data
+    out = bytearray(len(src))
+    out[0::4] = src[3::4]
+    out[1::4] = src[2::4]
+    out[2::4] = src[1::4]
+    out[3::4] = src[0::4]
+    data = bytes(out)
+  return data
+
+
+def unpremultiplied_rgba(np, surface, y0=0, y1=None):
+  w = surface.get_width()
+  h = (surface.get_height() if y1 is None else y1) - y0
+  px = np.frombuffer(surface_bgra_bytes(surface, y0, y1), dtype=np.uint8).reshape(h, w, 4)
+  a = px[..., 3].astype(np.uint16)
+  nz = a > 0
+  rgba = np.zeros((h, w, 4), dtype=np.uint8)
+  rgba[..., 3] = px[..., 3]
+  for dst, src in ((0, 2), (1, 1), (2, 0)):
+    c = px[..., src].astype(np.uint16)
+    ch = rgba[..., dst]
+    ch[nz] = np.minimum(255, (c[nz] * 255 + a[nz] // 2) // a[nz])
+  return rgba
+
+
+def png_chunk(tag, body):
+  return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body) & 0xFFFFFFFF)
+
+
+def sub_filtered_rows(np, surface, y0=0, y1=None):
+  # PNG scanlines for rows [y0, y1), each prefixed with the Sub filter byte.
+  rgba = unpremultiplied_rgba(np, surface, y0, y1)
+  h, w = rgba.shape[0], rgba.shape[1]
+  rows = rgba.reshape(h, w * 4)
+  filtered = np.empty((h, w * 4 + 1), dtype=np.uint8)
+  filtered[:, 0] = 1
+  filtered[:, 1:5] = rows[:, :4]
+  filtered[:, 5:] = rows[:, 4:] - rows[:, :-4]
+  return filtered.tobytes()
+
+
+def png_from_idat(w, h, idat):
+  ihdr = struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0)
+  return b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", ihdr) + png_chunk(b"IDAT", idat) + png_chunk(b"IEND", b"")
+
+
+def encode_png_level(np, surface, level):
+  # cairo's write_to_png has no compression knob; encode ourselves with the Sub
+  # filter (cheap to vectorize, good on mostly-transparent frames).
+  filtered = sub_filtered_rows(np, surface)
+  return png_from_idat(surface.get_width(), surface.get_height(), zlib.compress(filtered, level))
+
+
+def encode_surface(surface, options):
+  fmt = options.get("format") or "png"
+  if fmt == "bgra":
+    return surface_bgra_bytes(surface)
+  if fmt == "rgba":
+    np = load_numpy()
+    if np is None:
+      raise RenderError("rgba_requires_numpy")
+    return unpremultiplied_rgba(np, surface).tobytes()
+  level = options.get("pngLevel")
+  if level is not None:
+    np = load_numpy()
+    if np is not None:
+      return encode_png_level(np, surface, level)
+  return encode_png(surface)
+
+
+def write_bytes(out, data):
+  t0 = time.perf_counter()
+  try:
+    write_bytes_to(out, data)
+  finally:
+    timing_add("write", t0)
+
+
+def write_bytes_to(out, data):
+  if out == "-":
+    try:
+      sys.stdout.buffer.write(data)
+      sys.stdout.buffer.flush()
+    except Exception as e:
+      raise RenderError(f"failed_write_png: {e}", 4)
+    return
+  try:
+    with open(out, "wb") as f:
+      f.write(data)
+  except Exception as e:
+    raise RenderError(f"failed_write_png: {e}", 4)
+
+
+# Content-addressed render cache. Keys hash the normalized input (text, normalized
+# style incl. font key, frame size, gradient file content), so presets that only
+# differ in ways render_instance ignores share one entry. Entries live under
+# <root>/<key[:2]>/<key>.png; mtime is bumped on every hit and eviction drops
+# the least recently used entries once the directory exceeds max_bytes.
+RENDER_CACHE_VERSION = 2
+RENDER_CACHE_ASSET_DIRS = ("fonts", "font_gradients")
+RENDER_CACHE_ASSET_RECHECK_SECONDS = 5.0
+# Shared stats.json is rewritten (under flock) at most this often, and at exit;
+# lookups only touch in-memory counters.
+RENDER_CACHE_STATS_FLUSH_SECONDS = 5.0
+
+_file_hash_memo = {}
+
+
+def file_content_hash(path):
+  try:
+    st = os.stat(path)
+  except OSError:
+    return None
+  memo_key = (path, st.st_size, st.st_mtime_ns)
+  h = _file_hash_memo.get(memo_key)
+  if h is None:
+    with open(path, "rb") as f:
+      h = hashlib.sha256(f.read()).hexdigest()
+    _file_hash_memo[memo_key] = h
+  return h
+
+
+def render_cache_key(width, height, instances, options=None):
+  items = []
+  for inst in instances:
+    st = normalize_instance_style(inst.get("preset") or {})
+    gp = gradient_path(st["font_gradient_key"])
+    items.append({
+      "text": inst.get("text"),
+      "style": st,
+      "gradient": file_content_hash(gp) if gp else None,
+    })
+  doc = {"v": RENDER_CACHE_VERSION, "frame": [int(width), int(height)], "instances": items, "blur": shadow_blur_impl()}
+  # Only non-default output options enter the key, so plain full-frame keys stay stable.
+  extra = {k: v for k, v in (options or {}).items() if v != DEFAULT_OUTPUT_OPTIONS.get(k)}
+  if extra:
+    doc["output"] = extra
+  raw = json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+  return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def assets_fingerprint():
+  # Cheap stat-based fingerprint of the font + gradient trees; any add/remove/edit
+  # changes it and invalidates the whole cache.
+  h = hashlib.sha256()
+  root = os.path.join(os.getcwd(), "assets")
+  for sub in RENDER_CACHE_ASSET_DIRS:
+    for dirpath, dirnames, filenames in os.walk(os.path.join(root, sub)):
+      dirnames.sort()
+      for name in sorted(filenames):
+        fp = os.path.join(dirpath, name)
+        try:
+          st = os.stat(fp)
+        except OSError:
+          continue
+        h.update(f"{os.path.relpath(fp, root)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+  return h.hexdigest()
+
+
+def atomic_write_bytes(path, data):
+  tmp = f"{path}.{os.getpid()}.tmp"
+  with open(tmp, "wb") as f:
+    f.write(data)
+  os.replace(tmp, path)
+
+
+class RenderCache:
+  def __init__(self, root, max_bytes):
+    self.root = root
+    self.max_bytes = max(0, int(max_bytes))
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._total_bytes = None
+    self._assets_checked_at = None
+    self._pending_stats = {}
+    self._stats_flushed_at = time.monotonic()
+    os.makedirs(root, exist_ok=True)
+    self.check_assets(force=True)
+    atexit.register(self.flush_stats)
+
+  def entry_path(self, key):
+    return os.path.join(self.root, key[:2], key + ".png")
+
+  def check_assets(self, force=False):
+    now = time.monotonic()
+    if not force and self._assets_checked_at is not None and now - self._assets_checked_at < RENDER_CACHE_ASSET_RECHECK_SECONDS:
+      return
+    self._assets_checked_at = now
+    fp = assets_fingerprint()
+    marker = os.path.join(self.root, "assets.fingerprint")
+    try:
+      with open(marker, "r", encoding="utf-8") as f:
+        prev = f.read().strip()
+    except OSError:
+      prev = None
+    if prev != fp:
+      if prev is not None:
+        self.clear()
+      atomic_write_bytes(marker, fp.encode("utf-8"))
+
+  def get(self, key):
+    # Returns (png_path, meta) or None. meta is the JSON stored alongside the PNG
+    # (e.g. crop placement), or None when the entry has none. Lookups aren't
+    # counted here: the caller may still reject the entry, so it reports the
+    # outcome through record_lookup().
+    self.check_assets()
+    p = self.entry_path(key)
+    try:
+      # LRU bookkeeping: mtime is the last-use time.
+      os.utime(p, None)
+    except OSError:
+      return None
+    meta = None
+    try:
+      with open(p[:-4] + ".json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    except (OSError, ValueError):
+      meta = None
+    return p, meta
+
+  def record_lookup(self, hit):
+    self._bump("hits" if hit else "misses")
+
+  def put(self, key, data, meta=None):
+    p = self.entry_path(key)
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    if meta is not None:
+      # Sidecar first: the PNG's presence is what marks the entry as complete.
+      atomic_write_bytes(p[:-4] + ".json", json.dumps(meta).encode("utf-8"))
+    atomic_write_bytes(p, data)
+    if self._total_bytes is not None:
+      self._total_bytes += len(data)
+    self.evict()
+
+  def _entries(self):
+    entries = []
+    for sub in os.listdir(self.root):
+      d = os.path.join(self.root, sub)
+      if len(sub) != 2 or not os.path.isdir(d):
         continue
-      measure_out = {}
-      render_instance(
-        ctx,
-        width,
-        height,
-        inst.get("text"),
-        preset,
-        Pango,
-        PangoCairo,
-        cairo,
-        None,
-        None,
-        measure_out,
-        True,
-      )
+      for name in os.listdir(d):
+        if not name.endswith(".png"):
+          continue
+        fp = os.path.join(d, name)
+        try:
+          st = os.stat(fp)
+        except OSError:
+          continue
+        entries.append((st.st_mtime, st.st_size, fp))
+    return entries
+
+  def evict(self):
+    if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+      return
+    entries = self._entries()
+    total = sum(e[1] for e in entries)
+    if total > self.max_bytes:
+      # Trim to 90% of the cap so we don't rescan on every insert near the limit.
+      target = int(self.max_bytes * 0.9)
+      evicted = 0
+      for _mtime, size, fp in sorted(entries):
+        if total <= target:
+          break
+        try:
+          os.unlink(fp)
+        except OSError:
+          continue
+        try:
+          os.unlink(fp[:-4] + ".json")
+        except OSError:
+          pass
+        total -= size
+        evicted += 1
+      if evicted:
+        self._bump("evictions", evicted)
+    self._total_bytes = total
+
+  def clear(self):
+    import shutil
+    for sub in os.listdir(self.root):
+      d = os.path.join(self.root, sub)
+      if len(sub) == 2 and os.path.isdir(d):
+        shutil.rmtree(d, ignore_errors=True)
+    self._total_bytes = 0
+    self._bump("invalidations")
+
+  def _bump(self, field, n=1):
+    if hasattr(self, field):
+      setattr(self, field, getattr(self, field) + n)
+    self._pending_stats[field] = self._pending_stats.get(field, 0) + n
+    if time.monotonic() - self._stats_flushed_at >= RENDER_CACHE_STATS_FLUSH_SECONDS:
+      self.flush_stats()
+
+  def flush_stats(self):
+    # Persist counters across processes (one-shot renders are separate processes).
+    self._stats_flushed_at = time.monotonic()
+    pending, self._pending_stats = self._pending_stats, {}
+    if not pending:
+      return
+    try:
+      import fcntl
+      fd = os.open(os.path.join(self.root, "stats.json"), os.O_RDWR | os.O_CREAT, 0o644)
+      with os.fdopen(fd, "r+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        raw = f.read()
+        try:
+          stats = json.loads(raw) if raw.strip() else {}
+        except ValueError:
+          stats = {}
+        for field, n in pending.items():
+          stats[field] = int(stats.get(field) or 0) + n
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(stats, sort_keys=True))
+    except Exception:
+      pass
+
+  def stats(self):
+    self.flush_stats()
+    try:
+      with open(os.path.join(self.root, "stats.json"), "r", encoding="utf-8") as f:
+        persisted = json.load(f)
+    except Exception:
+      persisted = {}
+    entries = self._entries()
+    return {
+      "hits": int(persisted.get("hits") or 0),
+      "misses": int(persisted.get("misses") or 0),
+      "evictions": int(persisted.get("evictions") or 0),
+      "invalidations": int(persisted.get("invalidations") or 0),
+      "entries": len(entries),
+      "bytes": sum(e[1] for e in entries),
+      "maxBytes": self.max_bytes,
+      "process": {"hits": self.hits, "misses": self.misses, "evictions": self.evictions},
+    }
+
+
+DEFAULT_OUTPUT_OPTIONS = {"crop": False, "format": "png", "pngLevel": None, "scale": None, "maxPreviewWidth": None}
+MIN_PREVIEW_SCALE = 0.05
+
+
+def normalize_output_format(value):
+  fmt = str(value or "png").strip().lower()
+  if fmt not in OUTPUT_FORMATS:
+    raise RenderError("invalid_format")
+  return fmt
+
+
+def normalize_png_level(value):
+  if value is None:
+    return None
+  try:
+    return int(clamp(int(value), 0, 9))
+  except Exception:
+    raise RenderError("invalid_png_level")
+
+
+def normalize_preview_scale(value):
+  if value is None:
+    return None
+  try:
+    v = float(value)
+  except Exception:
+    raise RenderError("invalid_scale")
+  if not math.isfinite(v) or v <= 0.0:
+    raise RenderError("invalid_scale")
+  v = clamp(v, MIN_PREVIEW_SCALE, 1.0)
+  return None if v >= 1.0 else v
+
+
+def normalize_max_preview_width(value):
+  if value is None:
+    return None
+  try:
+    return max(16, int(value))
+  except Exception:
+    raise RenderError("invalid_max_preview_width")
+
+
+def preview_scale(options, width):
+  # Preview rasterization scale: layout always happens at the logical frame size
+  # (so wrapping/ellipsis match the export); only the surface is smaller.
+  s = options.get("scale") or 1.0
+  mw = options.get("maxPreviewWidth")
+  if mw and width > mw:
+    s = min(s, float(mw) / float(width))
+  return max(MIN_PREVIEW_SCALE, s)
+
+
+def read_output_options(payload, overrides=None):
+  # Output options ride along with the render input so batch jobs and server
+  # requests can set them per render; CLI flags arrive as overrides.
+  src = payload if isinstance(payload, dict) else {}
+  options = dict(DEFAULT_OUTPUT_OPTIONS)
+  options["crop"] = src.get("crop") is True
+  options["format"] = src.get("format") or "png"
+  options["pngLevel"] = src.get("pngLevel")
+  options["scale"] = src.get("scale")
+  options["maxPreviewWidth"] = src.get("maxPreviewWidth")
+  for k, v in (overrides or {}).items():
+    if v is not None:
+      options[k] = v
+  options["format"] = normalize_output_format(options["format"])
+  options["pngLevel"] = normalize_png_level(options["pngLevel"]) if options["format"] == "png" else None
+  options["scale"] = normalize_preview_scale(options["scale"])
+  options["maxPreviewWidth"] = normalize_max_preview_width(options["maxPreviewWidth"])
+  return options
+
+
+def render_png_bytes(libs, width, height, instances, cache=None, options=None, scaled_from=None, ref=None):
+  # libs may be None: GI is only imported when we actually have to rasterize.
+  # Returns (bytes, info): info always has "placement" and, when a cache is
+  # used, the cache outcome/key. Raw formats bypass the cache: they are cheap to
+  # produce and large to keep. scaled_from=(ref, scale) draws ref's shaping through
+  # a CTM scale (ladder mode); that output gets its own cache key. ref (ladder
+  # reference, native render) keeps this render's shaping for those scaled draws.
+  options = options or dict(DEFAULT_OUTPUT_OPTIONS)
+  key_options = options
+  if scaled_from is not None:
+    key_options = dict(options, scaledFrom=[scaled_from[0]["width"], scaled_from[0]["height"]])
+  key = None
+  if cache is not None and options.get("format", "png") == "png":
+    t0 = time.perf_counter()
+    try:
+      key = render_cache_key(width, height, instances, key_options)
+      hit = cache.get(key)
+    except Exception:
+      key = None
+      hit = None
+    timing_add("cache_lookup", t0)
+    if hit is not None:
+      hit_path, meta = hit
+      placement = (meta or {}).get("placement")
+      if placement is None and not options["crop"]:
+        placement = {"x": 0, "y": 0, "width": width, "height": height, "frameWidth": width, "frameHeight": height}
+      if placement is not None:
+        try:
+          with open(hit_path, "rb") as f:
+            data = f.read()
+          cache.record_lookup(True)
+          timing_meta("cache", "hit")
+          timing_meta("bytes", len(data), accumulate=True)
+          return data, {"cache": "hit", "key": key, "placement": placement}
+        except OSError:
+          pass
+  if key is not None:
+    cache.record_lookup(False)
+  if libs is None:
+    libs = load_render_libs()
+  if scaled_from is None:
+    prepared = None
+    if ref is not None:
+      prepared = ref["prepared"] = shape_instances(libs, width, height, instances)
+    surface, placement = render_frame(libs, width, height, instances, crop=options["crop"], scale=preview_scale(options, width), prepared=prepared)
+  else:
+    ref, scale = scaled_from
+    if ref["prepared"] is None:
+      # The reference came from the cache, so it was never shaped.
+      ref["prepared"] = shape_instances(libs, ref["width"], ref["height"], instances)
+    surface, placement = draw_frame(libs, ref["prepared"], width, height, options["crop"], scale)
+  t0 = time.perf_counter()
+  data = encode_surface(surface, options)
+  timing_add("encode", t0)
+  timing_meta("format", options.get("format", "png"))
+  timing_meta("bytes", len(data), accumulate=True)
+  if key is not None:
+    timing_meta("cache", "miss")
+  if key is None:
+    return data, {"placement": placement}
+  try:
+    # Plain full-frame renders don't need their placement stored; anything else does.
+    full = placement == {"x": 0, "y": 0, "width": width, "height": height, "frameWidth": width, "frameHeight": height}
+    cache.put(key, data, None if full else {"placement": placement})
+  except Exception:
+    pass
+  return data, {"cache": "miss", "key": key, "placement": placement}
+
+
+def write_placement(path, placement):
+  try:
+    with open(path, "w", encoding="utf-8") as f:
+      f.write(json.dumps(placement) + "\n")
+  except Exception as e:
+    raise RenderError(f"failed_write_placement: {e}", 4)
+
+
+def render_to_png(libs, payload, out, cache=None, overrides=None, placement_out=None):
+  width, height, instances = parse_render_input(payload)
+  options = read_output_options(payload, overrides)
+  if options["crop"] and out == "-" and not placement_out:
+    raise RenderError("missing_placement_json")
+  data, info = render_png_bytes(libs, width, height, instances, cache, options)
+  write_bytes(out, data)
+  if options["crop"] or placement_out:
+    # Full-frame renders only write it on request (it carries the autoFit sizes).
+    write_placement(placement_out or (out + ".json"), info["placement"])
+  return info
+
+
+def read_batch_jobs(payload):
+  jobs = payload.get("jobs") if isinstance(payload, dict) else payload
+  if not isinstance(jobs, list):
+    raise RenderError("invalid_batch")
+  return jobs
+
+
+def render_batch(libs, jobs, cache=None):
+  # Each job is a normal render input plus "out" (and optional "id"). Jobs whose
+  # normalized input is identical are rendered once and the bytes fanned out.
+  manifest = []
+  rendered = {}
+  unique_renders = 0
+  for idx, job in enumerate(jobs):
+    job_id = job.get("id", idx) if isinstance(job, dict) else idx
+    entry = {"id": job_id, "ok": False}
+    manifest.append(entry)
+    try:
+      if not isinstance(job, dict):
+        raise RenderError("invalid_job")
+      out = str(job.get("out") or "").strip()
+      if not out or out == "-":
+        raise RenderError("missing_out")
+      entry["out"] = out
+      width, height, instances = parse_render_input(job)
+      options = read_output_options(job)
+      key = render_cache_key(width, height, instances, options)
+      entry["key"] = key
+      if key in rendered:
+        first_id, data, placement = rendered[key]
+        entry["dedupOf"] = first_id
+      else:
+        data, info = render_png_bytes(libs, width, height, instances, cache, options)
+        placement = info["placement"]
+        if info.get("cache"):
+          entry["cache"] = info["cache"]
+        rendered[key] = (job_id, data, placement)
+        unique_renders += 1
+      write_bytes(out, data)
+      if options["crop"]:
+        entry["placement"] = placement
+      entry["ok"] = True
+      entry["bytes"] = len(data)
+    except RenderError as e:
+      if e.exit_code == 3:
+        # Missing GI/Pango: nothing else in the batch can render either.
+        raise
+      entry["error"] = e.code
+    except Exception as e:
+      entry["error"] = f"render_failed: {e}"
+  ok_count = sum(1 for e in manifest if e["ok"])
+  return {
+    "ok": ok_count == len(manifest),
+    "total": len(manifest),
+    "succeeded": ok_count,
+    "failed": len(manifest) - ok_count,
+    "rendered": unique_renders,
+    "jobs": manifest,
+  }
+
+
+# Ladder mode: one title input rendered for every rendition of an output profile
+# (jobs/mixins/output/*.json) or an explicit "frames" list. Every frame is rendered
+# natively by default. With "scaleReuse": true, frames are rendered largest first and
+# a smaller frame with the same aspect ratio reuses the larger frame's shaped layouts
+# through a CTM scale. That output is a proportional downscale of the reference
+# rendition, not a native render at the smaller size: pixel-valued settings (shadow
+# offset/blur, offsetX/YPx, the default outline width, the stroke pad) shrink with
+# it. Reuse is still refused whenever the two frames would size or wrap the text
+# differently: a clamped font px or pill padding, or auto-fit sizing.
+LADDER_ASPECT_TOLERANCE_PX = 1.0
+MAX_LADDER_FRAMES = 16
+OUTPUT_EXTENSIONS = {"png": ".png", "bgra": ".bgra", "rgba": ".rgba"}
+
+
+def profile_path(name):
+  # Filenames only, like gradient keys.
+  if not name or "/" in name or "\\" in name or ".." in name:
+    return None
+  fp = os.path.join(os.getcwd(), "jobs", "mixins", "output", name if name.endswith(".json") else name + ".json")
+  return fp if os.path.isfile(fp) else None
+
+
+def profile_frames(name):
+  fp = profile_path(str(name or "").strip())
+  if fp is None:
+    raise RenderError("unknown_profile")
+  try:
+    with open(fp, "r", encoding="utf-8") as f:
+      doc = json.load(f)
+  except Exception:
+    raise RenderError("invalid_profile")
+  frames = []
+  for group in ((doc.get("Settings") or {}).get("OutputGroups") or []):
+    for output in (group.get("Outputs") or []):
+      vd = output.get("VideoDescription") or {}
       try:
-        box_h_val = float(measure_out.get("box_h") or 0.0)
-        if pos == "middle":
-          if box_h_val > max_box_h_mid:
-            max_box_h_mid = box_h_val
-        else:
-          if box_h_val > max_box_h_bot:
-            max_box_h_bot = box_h_val
+        w = int(vd.get("Width") or 0)
+        h = int(vd.get("Height") or 0)
       except Exception:
-        pass
-    if max_box_h_mid > 0.0:
-      anchor_box_h_middle = max_box_h_mid
-    if max_box_h_bot > 0.0:
-      anchor_box_h_bottom = max_box_h_bot
-  except Exception:
-    anchor_box_h_middle = None
-    anchor_box_h_bottom = None
+        continue
+      if w > 0 and h > 0:
+        frames.append({"width": w, "height": h, "name": str(output.get("NameModifier") or f"{w}x{h}")})
+  return frames
+
 
+def read_ladder_frames(payload, out_dir, fmt):
+  if payload.get("profile"):
+    raw = profile_frames(payload.get("profile"))
+  else:
+    raw = payload.get("frames")
+  if not isinstance(raw, list) or not raw:
+    raise RenderError("missing_frames")
+  frames = []
+  seen = set()
+  for fr in raw:
+    if not isinstance(fr, dict):
+      raise RenderError("invalid_frame")
+    width, height = parse_frame({"frame": fr})
+    name = str(fr.get("name") or f"{width}x{height}").strip()
+    # Profiles can repeat a size across groups (e.g. HLS + CMAF); render it once.
+    if (width, height, name) in seen:
+      continue
+    seen.add((width, height, name))
+    out = str(fr.get("out") or "").strip()
+    if not out:
+      if not out_dir or "/" in name or ".." in name:
+        raise RenderError("missing_out")
+      out = os.path.join(out_dir, name + OUTPUT_EXTENSIONS[fmt])
+    if out == "-":
+      raise RenderError("missing_out")
+    frames.append({"name": name, "width": width, "height": height, "out": out})
+  if len(frames) > MAX_LADDER_FRAMES:
+    raise RenderError("too_many_frames")
+  return frames
+
+
+def ladder_scale(ref_w, ref_h, width, height, instances):
+  # Uniform scale from a reference frame, or None when the frame must be shaped natively.
+  s = float(height) / float(ref_h)
+  if s >= 1.0 or abs(ref_w * s - width) > LADDER_ASPECT_TOLERANCE_PX:
+    return None
   for inst in instances:
-    render_instance(
-      ctx,
-      width,
-      height,
-      inst.get("text"),
-      inst.get("preset") or {},
-      Pango,
-      PangoCairo,
-      cairo,
-      anchor_box_h_middle,
-      anchor_box_h_bottom,
-    )
-
-  try:
-    surface.write_to_png(args.out)
+    st = normalize_instance_style(inst.get("preset") or {})
+    # Auto-fit picks its size per frame; the reference's pick needn't be this frame's.
+    if st["auto_fit"]:
+      return None
+    pct = st["font_size_pct"] / 100.0
+    for h in (ref_h, height):
+      font_px = h * pct
+      if clamp(font_px, 8.0, 220.0) != font_px:
+        return None
+      if st["style"] in ("pill", "merged_pill"):
+        if clamp(font_px * 0.45, 8.0, 40.0) != font_px * 0.45 or clamp(font_px * 0.30, 6.0, 28.0) != font_px * 0.30:
+          return None
+  return s
+
+
+def render_ladder(libs, payload, cache=None, overrides=None, out_dir=None):
+  if not isinstance(payload, dict):
+    raise RenderError("invalid_input")
+  instances = parse_instances(payload)
+  # Renditions are full-size by definition; preview scaling doesn't apply.
+  options = dict(read_output_options(payload, overrides), scale=None, maxPreviewWidth=None)
+  out_dir = payload.get("outDir") or out_dir
+  frames = read_ladder_frames(payload, out_dir, options["format"])
+  scale_reuse = payload.get("scaleReuse") is True
+
+  # Reference frames (rendered natively) with their prepared instances: kept from
+  # the native render, or shaped on first use when that render was a cache hit.
+  refs = []
+  entries = [None] * len(frames)
+  order = sorted(range(len(frames)), key=lambda i: -(frames[i]["width"] * frames[i]["height"]))
+  for i in order:
+    fr = frames[i]
+    width, height = fr["width"], fr["height"]
+    ref = None
+    scale = None
+    if scale_reuse:
+      for r in refs:
+        scale = ladder_scale(r["width"], r["height"], width, height, instances)
+        if scale is not None:
+          ref = r
+          break
+    entry = {"name": fr["name"], "width": width, "height": height, "out": fr["out"]}
+    if ref is None:
+      ref = {"width": width, "height": height, "prepared": None}
+      data, info = render_png_bytes(libs, width, height, instances, cache, options, ref=ref if scale_reuse else None)
+      refs.append(ref)
+      entry["mode"] = "native"
+    else:
+      data, info = render_png_bytes(libs, width, height, instances, cache, options, scaled_from=(ref, scale))
+      entry["mode"] = "scaled"
+      entry["scaledFrom"] = [ref["width"], ref["height"]]
+    if info.get("cache"):
+      entry["cache"] = info["cache"]
+    write_bytes(fr["out"], data)
+    if options["crop"]:
+      entry["placement"] = info["placement"]
+    entry["bytes"] = len(data)
+    entries[i] = entry
+  return {
+    "ok": True,
+    "format": options["format"],
+    "native": sum(1 for e in entries if e["mode"] == "native"),
+    "scaled": sum(1 for e in entries if e["mode"] == "scaled"),
+    "frames": entries,
+  }
+
+
+# Caption-track mode: a cue list ({start, end, text}, seconds) and one preset become
+# a single sprite atlas PNG plus a manifest. Each distinct cue text is shaped and
+# drawn once, cropped to its box (plus shadow bleed), and shelf-packed into the
+# atlas; every cue points at its sprite, so repeated cues cost nothing. The
+# manifest gives each sprite's atlas rect and its position in the frame, which is
+# all one ffmpeg pass needs (crop per sprite, overlay enabled per cue window).
+MAX_CAPTION_CUES = 5000
+MAX_ATLAS_SIDE = 16384
+DEFAULT_ATLAS_WIDTH = 4096
+ATLAS_PADDING = 2
+
+
+def read_caption_cues(payload):
+  raw = payload.get("cues")
+  if not isinstance(raw, list) or not raw:
+    raise RenderError("missing_cues")
+  if len(raw) > MAX_CAPTION_CUES:
+    raise RenderError("too_many_cues")
+  cues = []
+  for idx, cue in enumerate(raw):
+    if not isinstance(cue, dict):
+      raise RenderError("invalid_cue")
+    try:
+      start = float(cue.get("start"))
+      end = float(cue.get("end"))
+    except Exception:
+      raise RenderError("invalid_cue_timing")
+    if not math.isfinite(start) or not math.isfinite(end) or end <= start or start < 0.0:
+      raise RenderError("invalid_cue_timing")
+    text = str(cue.get("text") or "").replace("\r\n", "\n").strip()
+    cues.append({"index": idx, "start": start, "end": end, "text": text})
+  return cues
+
+
+def pack_shelves(sizes, max_width):
+  # Shelf packing, tallest first: returns ([(x, y)] in input order, atlas w, atlas h).
+  order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+  pos = [None] * len(sizes)
+  x = y = shelf_h = used_w = 0
+  for i in order:
+    w, h = sizes[i]
+    if x > 0 and x + w > max_width:
+      y += shelf_h + ATLAS_PADDING
+      x = 0
+      shelf_h = 0
+    pos[i] = (x, y)
+    x += w + ATLAS_PADDING
+    shelf_h = max(shelf_h, h)
+    used_w = max(used_w, x - ATLAS_PADDING)
+  return pos, max(1, used_w), max(1, y + shelf_h)
+
+
+def render_caption_atlas(libs, payload, options=None):
+  # Returns (atlas bytes, manifest).
+  if not isinstance(payload, dict):
+    raise RenderError("invalid_input")
+  width, height = parse_frame(payload)
+  preset = payload.get("preset") or {}
+  cues = read_caption_cues(payload)
+  options = dict(options or read_output_options(payload), crop=False, scale=None, maxPreviewWidth=None)
+  if options["format"] != "png":
+    raise RenderError("invalid_format")
+  try:
+    max_width = int(payload.get("maxAtlasWidth") or DEFAULT_ATLAS_WIDTH)
+  except Exception:
+    raise RenderError("invalid_atlas_width")
+  max_width = int(clamp(max_width, 64, MAX_ATLAS_SIDE))
+
+  if libs is None:
+    libs = load_render_libs()
+  Pango, PangoCairo, cairo = libs
+  init_fontconfig(libs)
+  scratch = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+
+  sprite_by_text = {}
+  sprites = []
+  for cue in cues:
+    if not cue["text"] or cue["text"] in sprite_by_text:
+      continue
+    t0 = time.perf_counter()
+    p = prepare_instance(scratch, width, height, cue["text"], preset, Pango, PangoCairo, cairo)
+    timing_add("shaping", t0)
+    if p is None:
+      continue
+    measure_out = {}
+    measure_prepared(p, measure_out)
+    ox, oy, sw, sh = crop_rect_for_boxes(width, height, [measure_out])
+    sprite_by_text[cue["text"]] = len(sprites)
+    sprites.append({"prepared": p, "frame": (ox, oy), "size": (sw, sh)})
+
+  for sp in sprites:
+    if sp["size"][0] > max_width:
+      max_width = sp["size"][0]
+  positions, atlas_w, atlas_h = pack_shelves([sp["size"] for sp in sprites], max_width)
+  if atlas_w > MAX_ATLAS_SIDE or atlas_h > MAX_ATLAS_SIDE:
+    raise RenderError("atlas_too_large")
+
+  surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, atlas_w, atlas_h)
+  ctx = cairo.Context(surface)
+  ctx.set_source_rgba(0.0, 0.0, 0.0, 0.0)
+  ctx.set_operator(cairo.OPERATOR_SOURCE)
+  ctx.paint()
+  ctx.set_operator(cairo.OPERATOR_OVER)
+  t0 = time.perf_counter()
+  for sp, (ax, ay) in zip(sprites, positions):
+    ox, oy = sp["frame"]
+    sw, sh = sp["size"]
+    ctx.save()
+    # Clip to the sprite's cell so shadow/outline can't bleed into a neighbour.
+    ctx.rectangle(ax, ay, sw, sh)
+    ctx.clip()
+    # Draw in frame coordinates, shifted so the crop rect lands on the cell.
+    ctx.translate(ax - ox, ay - oy)
+    draw_prepared(ctx, sp["prepared"], Pango, PangoCairo, cairo)
+    ctx.restore()
+    sp["atlas"] = (ax, ay)
+  timing_add("draw", t0)
+  timing_meta("surface", {"width": atlas_w, "height": atlas_h})
+
+  t0 = time.perf_counter()
+  data = encode_surface(surface, options)
+  timing_add("encode", t0)
+  timing_meta("bytes", len(data), accumulate=True)
+
+  manifest = {
+    "frame": {"width": width, "height": height},
+    "atlas": {"width": atlas_w, "height": atlas_h},
+    "sprites": [
+      {
+        "id": i,
+        "x": sp["atlas"][0],
+        "y": sp["atlas"][1],
+        "width": sp["size"][0],
+        "height": sp["size"][1],
+        "frameX": sp["frame"][0],
+        "frameY": sp["frame"][1],
+        "ellipsized": layout_is_ellipsized(sp["prepared"].layout),
+      }
+      for i, sp in enumerate(sprites)
+    ],
+    "cues": [
+      {
+        "index": cue["index"],
+        "start": cue["start"],
+        "end": cue["end"],
+        "sprite": sprite_by_text.get(cue["text"]),
+      }
+      for cue in cues
+    ],
+    "totalCues": len(cues),
+    "distinctSprites": len(sprites),
+  }
+  return data, manifest
+
+
+def render_captions_to(libs, payload, out, manifest_out=None, overrides=None):
+  if not out or out == "-":
+    raise RenderError("missing_out")
+  options = read_output_options(payload, overrides)
+  data, manifest = render_caption_atlas(libs, payload, options)
+  write_bytes(out, data)
+  manifest["atlas"]["out"] = out
+  if manifest_out:
+    try:
+      atomic_write_bytes(manifest_out, (json.dumps(manifest) + "\n").encode("utf-8"))
+    except Exception as e:
+      raise RenderError(f"failed_write_manifest: {e}", 4)
+  return manifest
+
+
+# Animated reveals: shape once, then build the frame sequence by uncovering the
+# final frame unit by unit (a cluster for "typewriter", a word for "word"). Two
+# surfaces are drawn up front: the base (backgrounds only) and the full frame.
+# Each unit owns integer rects derived from the layout's line/cluster iterators;
+# revealing it copies just those rects from the full frame into the working
+# surface, so the rasterization cost of an N-frame reveal is about one render.
+# Encoding is incremental too: only the row strips a reveal touched are
+# re-encoded, and frames where nothing new is revealed reuse the previous bytes.
+ANIMATION_MODES = ("typewriter", "word")
+DEFAULT_UNITS_PER_SECOND = {"typewriter": 20.0, "word": 4.0}
+MAX_ANIMATION_FPS = 120.0
+MAX_ANIMATION_FRAMES = 3600
+ANIMATION_STRIP_ROWS = 16
+
+
+def read_animation_options(payload):
+  raw = payload.get("animation") or {}
+  if not isinstance(raw, dict):
+    raise RenderError("invalid_animation")
+  mode = str(raw.get("mode") or "typewriter").strip().lower()
+  if mode not in ANIMATION_MODES:
+    raise RenderError("invalid_animation_mode")
+  try:
+    fps = float(raw.get("fps") or 30.0)
+    delay = float(raw.get("delay") or 0.0)
+    hold = float(raw.get("hold") or 0.0)
+    duration = None if raw.get("duration") is None else float(raw.get("duration"))
+    units_per_second = float(raw.get("unitsPerSecond") or DEFAULT_UNITS_PER_SECOND[mode])
+  except Exception:
+    raise RenderError("invalid_animation_timing")
+  for v in (fps, delay, hold, units_per_second) + (() if duration is None else (duration,)):
+    if not math.isfinite(v) or v < 0.0:
+      raise RenderError("invalid_animation_timing")
+  if fps <= 0.0 or fps > MAX_ANIMATION_FPS or units_per_second <= 0.0:
+    raise RenderError("invalid_animation_timing")
+  return {"mode": mode, "fps": fps, "delay": delay, "hold": hold, "duration": duration, "unitsPerSecond": units_per_second}
+
+
+def reveal_halo(p):
+  # How far one glyph's drawing reaches past its cluster box (left, right, up,
+  # down): half the outline stroke, or the shadow offset plus its blur (3 sigma =
+  # 1.5x the radius), plus a pixel of antialiasing.
+  st = p.st
+  stroke = p.outline_width_px * 0.5 if p.outline_width_px > 0.0 and st["outline_opacity"] > 0.0 else 0.0
+  left = right = up = down = stroke
+  if st["style"] in ("pill", "none", "merged_pill") and st["shadow_opacity"] > 0.0:
+    spread = 1.5 * p.shadow_blur
+    left = max(left, spread - p.shadow_dx)
+    right = max(right, spread + p.shadow_dx)
+    up = max(up, spread - p.shadow_dy)
+    down = max(down, spread + p.shadow_dy)
+  return tuple(int(math.ceil(v + 1.0)) for v in (left, right, up, down))
+
+
+def reveal_units(p, mode, Pango):
+  # Reveal units of one prepared instance in reading order, each a list of integer
+  # frame-space rects (x, y, w, h). Per line the rects tile the instance box plus
+  # its shadow bleed, so revealing every unit uncovers the whole full frame.
+  # Whitespace clusters join the unit before them. Rects split near cluster (and
+  # line) edges: each edge is moved toward the earlier unit by the later glyph's
+  # halo, so no unit uncovers the outline/shadow of text that isn't revealed yet.
+  # The part of a glyph's own halo past that edge appears with the next unit.
+  measure_out = {}
+  measure_prepared(p, measure_out)
+  bleed = measure_out.get("bleed", 0.0)
+  halo_left, halo_right, halo_up, _halo_down = reveal_halo(p)
+  left = int(math.floor(p.box_x - bleed))
+  right = int(math.ceil(p.box_x + p.box_w + bleed))
+  top = int(math.floor(p.box_y - bleed))
+  bottom = int(math.ceil(p.box_y + p.box_h + bleed))
+  x_draw = p.box_x - p.box_x0
+  y_draw = p.box_y - p.box_y0
+  layout = p.layout
+
+  # Line bands: line i owns [its logical top, the next line's top).
+  line_of = {}
+  tops = []
+  it = layout.get_iter()
+  while True:
+    _ink, logical = it.get_line_extents()
+    line_of[it.get_baseline()] = len(tops)
+    tops.append(int(round(y_draw + float(logical.y) / Pango.SCALE)))
+    if not it.next_line():
+      break
+  # Later lines reach up into earlier ones by halo_up.
+  edges = [top]
+  for t in tops[1:]:
+    edges.append(min(bottom, max(edges[-1], t - halo_up)))
+  edges.append(bottom)
+  bands = [(edges[i], max(edges[i], edges[i + 1])) for i in range(len(tops))]
+
+  text = layout.get_text() or ""
+  data = text.encode("utf-8")
+  clusters = []
+  it = layout.get_iter()
+  while True:
+    _ink, logical = it.get_cluster_extents()
+    if logical.width != 0:
+      x0 = min(logical.x, logical.x + logical.width)
+      ch = data[it.get_index():].decode("utf-8", "ignore")[:1]
+      clusters.append((line_of.get(it.get_baseline(), 0), x_draw + float(x0) / Pango.SCALE, it.get_index(), ch))
+    if not it.next_cluster():
+      break
+
+  # Unit keys: running cluster count (typewriter) or word number (word).
+  keys = []
+  word = -1
+  prev_space = True
+  count = 0
+  for _line, _x, idx, ch in clusters:
+    space = ch.isspace() or not ch
+    if mode == "word":
+      if not space and prev_space:
+        word += 1
+      keys.append(None if space else word)
+    else:
+      keys.append(None if space else count)
+      if not space:
+        count += 1
+    prev_space = space
+  first = next((k for k in keys if k is not None), 0)
+  last = first
+  for i, k in enumerate(keys):
+    if k is None:
+      keys[i] = last
+    last = keys[i]
+
+  units = {}
+  for line in range(len(bands)):
+    row = sorted((x, keys[i]) for i, (ln, x, _idx, _ch) in enumerate(clusters) if ln == line)
+    y0, y1 = bands[line]
+    edges = [left]
+    for j in range(1, len(row)):
+      x, key = row[j]
+      prev_key = row[j - 1][1]
+      if key > prev_key:
+        # The right cluster is revealed later: keep its halo out of the left rect.
+        x -= halo_left
+      elif key < prev_key:
+        x += halo_right
+      edges.append(min(right, max(edges[-1], int(round(x)))))
+    edges.append(right)
+    for j, (_x, key) in enumerate(row):
+      x0 = edges[j]
+      x1 = edges[j + 1]
+      if x1 <= x0 or y1 <= y0:
+        continue
+      rects = units.setdefault(key, [])
+      if rects and rects[-1][1] == y0 and rects[-1][0] + rects[-1][2] == x0:
+        # Adjacent clusters of one unit on one line: one clip rect.
+        px, py, pw, ph = rects[-1]
+        rects[-1] = (px, py, pw + x1 - x0, ph)
+      else:
+        rects.append((x0, y0, x1 - x0, y1 - y0))
+  if not units:
+    return [[(left, top, right - left, bottom - top)]]
+  return [units[k] for k in sorted(units)]
+
+
+def visible_units(t, total, timing, duration):
+  # Unit i appears at delay + i * duration / total.
+  if t < timing["delay"]:
+    return 0
+  if duration <= 0.0:
+    return total
+  return min(total, int(math.floor((t - timing["delay"]) * total / duration + 1e-9)) + 1)
+
+
+class FrameEncoder:
+  # Encodes successive states of one surface, re-encoding only dirty rows. Raw
+  # formats patch those rows into the previous frame. PNG (with numpy) keeps one
+  # raw-deflated chunk per ANIMATION_STRIP_ROWS strip, each ended with a full
+  # flush so strips compress independently (as pigz does), and re-deflates only
+  # the strips that changed; the bytes differ from cairo's encoder, the pixels
+  # don't. Without numpy, PNG frames are encoded whole.
+  def __init__(self, surface, options):
+    self.surface = surface
+    self.options = options
+    self.format = options.get("format") or "png"
+    self.np = load_numpy()
+    self.width = surface.get_width()
+    self.height = surface.get_height()
+    self.level = options.get("pngLevel")
+    if self.level is None:
+      self.level = zlib.Z_DEFAULT_COMPRESSION
+    self.frame = None
+    self.strips = None
+
+  def encode(self, y0=0, y1=None):
+    # Rows [y0, y1) changed since the previous call (everything on the first).
+    y1 = self.height if y1 is None else min(self.height, y1)
+    y0 = max(0, y0)
+    if self.format == "bgra" or (self.format == "rgba" and self.np is not None):
+      if self.frame is None:
+        self.frame = bytearray(encode_surface(self.surface, self.options))
+      elif y1 > y0:
+        row = self.width * 4
+        if self.format == "bgra":
+          band = surface_bgra_bytes(self.surface, y0, y1)
+        else:
+          band = unpremultiplied_rgba(self.np, self.surface, y0, y1).tobytes()
+        self.frame[y0 * row:y1 * row] = band
+      return bytes(self.frame)
+    if self.format != "png" or self.np is None:
+      return encode_surface(self.surface, self.options)
+    n = ANIMATION_STRIP_ROWS
+    if self.strips is None:
+      self.strips = [None] * ((self.height + n - 1) // n)
+      y0, y1 = 0, self.height
+    for k in range(y0 // n, (y1 + n - 1) // n) if y1 > y0 else ():
+      raw = sub_filtered_rows(self.np, self.surface, k * n, min(self.height, (k + 1) * n))
+      c = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+      self.strips[k] = (raw, c.compress(raw) + c.flush(zlib.Z_FULL_FLUSH))
+    adler = 1
+    for raw, _packed in self.strips:
+      adler = zlib.adler32(raw, adler)
+    # zlib header, the strips, an empty final block, the Adler-32 of the scanlines.
+    idat = b"\x78\x9c" + b"".join(packed for _raw, packed in self.strips) + b"\x03\x00" + struct.pack(">I", adler)
+    return png_from_idat(self.width, self.height, idat)
+
+
+def render_animation(libs, payload, sink, options=None):
+  # sink(index, data) receives every encoded frame in order. Returns the manifest.
+  width, height, instances = parse_render_input(payload)
+  timing = read_animation_options(payload)
+  options = dict(options or read_output_options(payload), scale=None, maxPreviewWidth=None)
+  if libs is None:
+    libs = load_render_libs()
+  Pango, PangoCairo, cairo = libs
+  scratch = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+  prepared = prepare_instances(scratch, width, height, instances, libs)
+
+  # Instances reveal one after another, in input order.
+  units = []
+  for p in prepared:
+    units.extend(reveal_units(p, timing["mode"], Pango))
+  total = len(units)
+  duration = timing["duration"]
+  if duration is None:
+    duration = total / timing["unitsPerSecond"]
+  frame_count = max(1, int(math.ceil((timing["delay"] + duration + timing["hold"]) * timing["fps"])))
+  if frame_count > MAX_ANIMATION_FRAMES:
+    raise RenderError("too_many_frames")
+
+  full, placement = draw_frame(libs, prepared, width, height, options["crop"])
+  base, _ = draw_frame(libs, prepared, width, height, options["crop"], glyphs=False)
+  ox, oy = placement["x"], placement["y"]
+  surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, placement["width"], placement["height"])
+  ctx = cairo.Context(surface)
+  ctx.set_operator(cairo.OPERATOR_SOURCE)
+  ctx.set_source_surface(base, 0, 0)
+  ctx.paint()
+
+  encoder = FrameEncoder(surface, options)
+  shown = -1
+  data = None
+  encoded = 0
+  for index in range(frame_count):
+    # The last frame always shows the whole title.
+    n = total if index == frame_count - 1 else visible_units(index / timing["fps"], total, timing, duration)
+    if n != shown:
+      t0 = time.perf_counter()
+      fresh = [r for u in units[max(0, shown):n] for r in u]
+      if fresh:
+        ctx.save()
+        for x, y, w, h in fresh:
+          ctx.rectangle(x - ox, y - oy, w, h)
+        ctx.clip()
+        ctx.set_source_surface(full, 0, 0)
+        ctx.paint()
+        ctx.restore()
+      timing_add("reveal", t0)
+      if fresh or data is None:
+        t0 = time.perf_counter()
+        if data is None:
+          data = encoder.encode()
+        else:
+          data = encoder.encode(min(y for _x, y, _w, _h in fresh) - oy, max(y + h for _x, y, _w, h in fresh) - oy)
+        timing_add("encode", t0)
+        encoded += 1
+      shown = n
+    sink(index, data)
+  timing_meta("frames", frame_count)
+  timing_meta("encodedFrames", encoded)
+
+  return {
+    "frame": {"width": width, "height": height},
+    "format": options["format"],
+    "placement": placement,
+    "mode": timing["mode"],
+    "fps": timing["fps"],
+    "duration": duration,
+    "units": total,
+    "frames": frame_count,
+    "encodedFrames": encoded,
+  }
+
+
+def render_animation_to(libs, payload, out=None, out_dir=None, overrides=None):
+  # out_dir: numbered frame_00000.<ext> files; out: one concatenated stream (raw
+  # frames for bgra/rgba, back-to-back PNGs for ffmpeg's image2pipe), "-" = stdout.
+  if not isinstance(payload, dict):
+    raise RenderError("invalid_input")
+  options = read_output_options(payload, overrides)
+  if out_dir:
+    ext = OUTPUT_EXTENSIONS[options["format"]]
+
+    def sink(index, data):
+      write_bytes(os.path.join(out_dir, f"frame_{index:05d}{ext}"), data)
+
+    manifest = render_animation(libs, payload, sink, options)
+    manifest["outDir"] = out_dir
+    manifest["pattern"] = f"frame_%05d{ext}"
+    return manifest
+  if not out:
+    raise RenderError("missing_out")
+  try:
+    stream = sys.stdout.buffer if out == "-" else open(out, "wb")
   except Exception as e:
-    sys.stderr.write(f"failed_write_png: {e}\n")
-    return 4
+    raise RenderError(f"failed_write_png: {e}", 4)
+  try:
+    def sink(_index, data):
+      t0 = time.perf_counter()
+      try:
+        stream.write(data)
+      except Exception as e:
+        raise RenderError(f"failed_write_png: {e}", 4)
+      timing_add("write", t0)
+
+    manifest = render_animation(libs, payload, sink, options)
+  finally:
+    if out == "-":
+      stream.flush()
+    else:
+      stream.close()
+  manifest["out"] = out
+  return manifest
+
+
+# Server mode: length-prefixed JSON frames (4-byte big-endian length + UTF-8 JSON)
+# over stdin/stdout or a Unix socket. Libraries and fonts are loaded once; each
+# request frame gets exactly one response frame, echoing the request "id".
+SERVER_PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def read_exact(stream, n):
+  buf = b""
+  while len(buf) < n:
+    chunk = stream.read(n - len(buf))
+    if not chunk:
+      if not buf:
+        return None
+      raise RenderError("truncated_frame")
+    buf += chunk
+  return buf
+
+
+def read_frame(stream):
+  header = read_exact(stream, FRAME_HEADER.size)
+  if header is None:
+    return None
+  (n,) = FRAME_HEADER.unpack(header)
+  if n > MAX_FRAME_BYTES:
+    raise RenderError("frame_too_large")
+  body = read_exact(stream, n)
+  return body if body is not None else b""
+
+
+def write_frame(stream, obj, data=None):
+  # data, when given, follows the JSON frame as one raw binary frame of the
+  # length announced in obj["dataLength"].
+  body = json.dumps(obj).encode("utf-8")
+  stream.write(FRAME_HEADER.pack(len(body)))
+  stream.write(body)
+  if data is not None:
+    stream.write(FRAME_HEADER.pack(len(data)))
+    stream.write(data)
+  stream.flush()
+
+
+def handle_request(libs, req, cache=None):
+  op = str(req.get("op") or "render").strip().lower()
+  if op == "ping":
+    return {"ok": True}
+  if op == "render":
+    # "inline": true returns the bytes in a binary frame after the response
+    # instead of writing a file.
+    inline = req.get("inline") is True
+    out = str(req.get("out") or "").strip()
+    if not out and not inline:
+      raise RenderError("missing_out")
+    use_cache = cache if req.get("cache", True) is not False else None
+    payload = req.get("input")
+    width, height, instances = parse_render_input(payload)
+    options = read_output_options(payload, {
+      "crop": req.get("crop") if isinstance(req.get("crop"), bool) else None,
+      "format": req.get("format"),
+      "pngLevel": req.get("pngLevel"),
+      "scale": req.get("scale"),
+      "maxPreviewWidth": req.get("maxPreviewWidth"),
+    })
+    data, info = render_png_bytes(libs, width, height, instances, use_cache, options)
+    if inline:
+      return dict(info, ok=True, format=options["format"], dataLength=len(data), inlineData=data)
+    write_bytes(out, data)
+    if req.get("placementOut"):
+      write_placement(str(req.get("placementOut")), info["placement"])
+    return dict(info, ok=True, out=out, format=options["format"])
+  if op == "batch":
+    result = render_batch(libs, read_batch_jobs(req), cache)
+    return dict(result, ok=True, allSucceeded=result["ok"])
+  if op == "measure":
+    return dict(measure_payload(libs, req.get("input")), ok=True)
+  if op == "captions":
+    out = str(req.get("out") or "").strip()
+    manifest = render_captions_to(libs, req.get("input"), out, req.get("manifestOut"), {"pngLevel": req.get("pngLevel")})
+    return dict(manifest, ok=True)
+  if op == "animate":
+    # File outputs only: frames would not fit one response frame.
+    out_dir = str(req.get("outDir") or "").strip()
+    out = str(req.get("out") or "").strip()
+    if out == "-":
+      raise RenderError("invalid_out")
+    if out_dir:
+      os.makedirs(out_dir, exist_ok=True)
+    manifest = render_animation_to(libs, req.get("input"), out, out_dir, {
+      "crop": req.get("crop") if isinstance(req.get("crop"), bool) else None,
+      "format": req.get("format"),
+      "pngLevel": req.get("pngLevel"),
+    })
+    return dict(manifest, ok=True)
+  if op == "ladder":
+    use_cache = cache if req.get("cache", True) is not False else None
+    return render_ladder(libs, req.get("input"), use_cache, {
+      "crop": req.get("crop") if isinstance(req.get("crop"), bool) else None,
+      "format": req.get("format"),
+      "pngLevel": req.get("pngLevel"),
+    }, req.get("outDir"))
+  if op == "cache_stats":
+    if cache is None:
+      raise RenderError("cache_disabled")
+    return {"ok": True, "stats": cache.stats()}
+  if op == "resource_stats":
+    return {"ok": True, "stats": _resources.stats(), "layouts": _layouts.stats()}
+  raise RenderError("unknown_op")
+
+
+def serve_stream(libs, rfile, wfile, cache=None, timings=False):
+  # Returns False when the client asked the server to shut down. With timings
+  # on (server flag or per-request "timings": true) responses carry "timings".
+  while True:
+    try:
+      raw = read_frame(rfile)
+    except RenderError as e:
+      # Framing is lost; report once and drop the connection.
+      write_frame(wfile, {"id": None, "ok": False, "error": e.code})
+      return True
+    if raw is None:
+      return True
+    req_id = None
+    keep_serving = True
+    try:
+      req = json.loads(raw.decode("utf-8"))
+      if not isinstance(req, dict):
+        raise RenderError("bad_request")
+      req_id = req.get("id")
+      if str(req.get("op") or "").strip().lower() == "shutdown":
+        resp = {"ok": True}
+        keep_serving = False
+      else:
+        timings_reset(timings or req.get("timings") is True)
+        resp = handle_request(libs, req, cache)
+        if _timings is not None:
+          resp["timings"] = timings_report()
+          timings_reset(False)
+    except RenderError as e:
+      resp = {"ok": False, "error": e.code}
+    except ValueError:
+      resp = {"ok": False, "error": "bad_request"}
+    except Exception as e:
+      resp = {"ok": False, "error": f"render_failed: {e}"}
+    resp["id"] = req_id
+    write_frame(wfile, resp, resp.pop("inlineData", None))
+    if not keep_serving:
+      return False
+
+
+def ready_frame():
+  frame = {"event": "ready", "pid": os.getpid(), "protocol": SERVER_PROTOCOL_VERSION}
+  if _timings is not None:
+    # Startup cost (import + Fontconfig + warm-up) is reported once, here.
+    frame["timings"] = timings_report()
+  return frame
+
+
+def serve_stdio(libs, cache=None, timings=False):
+  rfile = sys.stdin.buffer
+  wfile = sys.stdout.buffer
+  # stdout carries protocol frames only; keep stray prints out of the stream.
+  sys.stdout = sys.stderr
+  write_frame(wfile, ready_frame())
+  serve_stream(libs, rfile, wfile, cache, timings)
+
+
+def serve_unix_socket(libs, sock_path, cache=None, timings=False):
+  import socket
+  try:
+    os.unlink(sock_path)
+  except FileNotFoundError:
+    pass
+  srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    srv.bind(sock_path)
+    srv.listen(16)
+    sys.stderr.write(json.dumps(dict(ready_frame(), socket=sock_path)) + "\n")
+    sys.stderr.flush()
+    while True:
+      conn, _addr = srv.accept()
+      keep_serving = True
+      with conn:
+        rfile = conn.makefile("rb")
+        wfile = conn.makefile("wb")
+        try:
+          keep_serving = serve_stream(libs, rfile, wfile, cache, timings)
+        except (BrokenPipeError, ConnectionResetError):
+          pass
+        finally:
+          try:
+            rfile.close()
+            wfile.close()
+          except Exception:
+            pass
+      if not keep_serving:
+        break
+  finally:
+    srv.close()
+    try:
+      os.unlink(sock_path)
+    except Exception:
+      pass
+
 
+def main():
+  ap = argparse.ArgumentParser()
+  ap.add_argument("--input-json", help="render input JSON path, or - for stdin")
+  ap.add_argument("--out", help="output path, or - for stdout")
+  ap.add_argument("--format", choices=OUTPUT_FORMATS, help="png (default), bgra (premultiplied) or rgba (straight alpha) raw frames")
+  ap.add_argument("--png-level", type=int, help="zlib level 0-9 for png output (default: cairo's encoder)")
+  ap.add_argument("--scale", type=float, help="preview: lay out at the frame size, rasterize at this fraction of it (0.05-1)")
+  ap.add_argument("--max-preview-width", type=int, help="preview: downscale (as --scale) so the output is at most this wide")
+  ap.add_argument("--serve", action="store_true", help="long-lived mode: length-prefixed JSON requests on stdin/stdout")
+  ap.add_argument("--socket", help="with --serve: listen on this Unix socket path instead of stdin/stdout")
+  ap.add_argument("--crop", action="store_true", help="rasterize only the union of the title boxes and write placement JSON")
+  ap.add_argument("--placement-json", help="placement sidecar path (with --crop the default is <out>.json; otherwise written only when set)")
+  ap.add_argument("--batch-json", help="render every job in this JSON file ({\"jobs\": [...]}, each with frame/instances/out)")
+  ap.add_argument("--manifest", help="with --batch-json/--ladder-json/--captions-json/--animate-json: write the manifest here instead of stdout")
+  ap.add_argument("--ladder-json", help="render one input for every frame in \"frames\" or an output \"profile\" (jobs/mixins/output/*.json); path or -")
+  ap.add_argument("--captions-json", help="caption track: render {frame, preset, cues:[{start,end,text}]} into a sprite atlas at --out; manifest to --manifest or stdout")
+  ap.add_argument("--animate-json", help="animated reveal: render input plus \"animation\" {mode, fps, duration|unitsPerSecond, delay, hold}; frames to --out-dir, or one stream to --out")
+  ap.add_argument("--out-dir", help="with --ladder-json: write <name>.<format> here for frames without an \"out\"; with --animate-json: frame_00000.<format>, ...")
+  ap.add_argument("--measure-json", help="layout-only: measure this input (path or -) and print box/line/ellipsis JSON; \"texts\" measures many candidates")
+  ap.add_argument("--cache-dir", help="content-addressed PNG cache directory (disabled when unset)")
+  ap.add_argument("--cache-max-mb", type=float, default=256.0, help="cache size cap before LRU eviction")
+  ap.add_argument("--cache-stats", action="store_true", help="print cache counters as JSON and exit")
+  ap.add_argument("--cache-clear", action="store_true", help="drop every cached render and exit")
+  ap.add_argument("--timings", action="store_true", help="emit a JSON phase-timing record on stderr ({\"event\": \"timings\", ...})")
+  ap.add_argument("--timings-json", help="write the phase-timing record to this sidecar path instead of stderr")
+  args = ap.parse_args()
+
+  timings_reset(bool(args.timings or args.timings_json))
+  rc = 1
+  try:
+    rc = run(ap, args)
+    return rc
+  finally:
+    if not args.serve:
+      emit_timings(args, rc)
+
+
+def emit_timings(args, rc):
+  report = timings_report()
+  if report is None:
+    return
+  report["exitCode"] = rc
+  body = json.dumps(dict({"event": "timings"}, **report))
+  if args.timings_json:
+    try:
+      with open(args.timings_json, "w", encoding="utf-8") as f:
+        f.write(body + "\n")
+      return
+    except Exception as e:
+      sys.stderr.write(f"failed_write_timings: {e}\n")
+  sys.stderr.write(body + "\n")
+  sys.stderr.flush()
+
+
+def run(ap, args):
+  cache = None
+  if args.cache_dir:
+    try:
+      cache = RenderCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    except Exception as e:
+      sys.stderr.write(f"render_cache_unavailable: {e}\n")
+      cache = None
+  if args.cache_stats or args.cache_clear:
+    if cache is None:
+      sys.stderr.write("missing_cache_dir\n")
+      return 2
+    if args.cache_clear:
+      cache.clear()
+    sys.stdout.write(json.dumps(cache.stats()) + "\n")
+    return 0
+
+  if args.serve:
+    try:
+      libs = load_render_libs()
+    except RenderError as e:
+      sys.stderr.write(f"{e.code}\n")
+      return e.exit_code
+    warm_up_fonts(libs)
+    warm_up_resources(libs)
+    if args.socket:
+      serve_unix_socket(libs, args.socket, cache, args.timings)
+    else:
+      serve_stdio(libs, cache, args.timings)
+    return 0
+
+  try:
+    return run_mode(ap, args, cache)
+  except RenderError as e:
+    sys.stderr.write(f"{e.code}\n")
+    return e.exit_code
+
+
+def read_json_arg(path, error="failed_read_input_json"):
+  # A JSON document from a file path, or stdin for "-".
+  try:
+    if path == "-":
+      return json.load(sys.stdin)
+    with open(path, "r", encoding="utf-8") as f:
+      return json.load(f)
+  except Exception as e:
+    raise RenderError(f"{error}: {e}", 2)
+
+
+def write_json_result(obj, path=None, error="failed_write_manifest"):
+  # One JSON line to path, or to stdout when there is none.
+  body = json.dumps(obj) + "\n"
+  if not path:
+    sys.stdout.write(body)
+    return
+  try:
+    with open(path, "w", encoding="utf-8") as f:
+      f.write(body)
+  except Exception as e:
+    raise RenderError(f"{error}: {e}", 4)
+
+
+def run_mode(ap, args, cache):
+  # Everything after --serve / the cache commands; RenderErrors become exit codes in run().
+  if args.batch_json:
+    jobs = read_batch_jobs(read_json_arg(args.batch_json, "failed_read_batch_json"))
+    manifest = render_batch(None, jobs, cache)
+    write_json_result(manifest, args.manifest)
+    return 0 if manifest["ok"] else 5
+
+  if args.captions_json:
+    if not args.out or args.out == "-":
+      ap.error("--captions-json needs --out (the atlas PNG path)")
+    payload = read_json_arg(args.captions_json)
+    manifest = render_captions_to(None, payload, args.out, args.manifest, {"pngLevel": args.png_level})
+    if not args.manifest:
+      write_json_result(manifest)
+    return 0
+
+  if args.animate_json:
+    if not args.out_dir and not args.out:
+      ap.error("--animate-json needs --out-dir (numbered frames) or --out (one stream, - for stdout)")
+    payload = read_json_arg(args.animate_json)
+    if args.out_dir:
+      os.makedirs(args.out_dir, exist_ok=True)
+    overrides = {"crop": True if args.crop else None, "format": args.format, "pngLevel": args.png_level}
+    manifest = render_animation_to(None, payload, args.out, args.out_dir, overrides)
+    # With --out - the frames own stdout.
+    if args.manifest or args.out_dir or args.out != "-":
+      write_json_result(manifest, args.manifest)
+    return 0
+
+  if args.ladder_json:
+    payload = read_json_arg(args.ladder_json)
+    if args.out_dir:
+      os.makedirs(args.out_dir, exist_ok=True)
+    overrides = {"crop": True if args.crop else None, "format": args.format, "pngLevel": args.png_level}
+    write_json_result(render_ladder(None, payload, cache, overrides, args.out_dir), args.manifest)
+    return 0
+
+  if args.measure_json:
+    result = measure_payload(load_render_libs(), read_json_arg(args.measure_json))
+    out = args.out if args.out and args.out != "-" else None
+    write_json_result(result, out, "failed_write_measure")
+    return 0
+
+  if not args.input_json or not args.out:
+    ap.error("--input-json and --out are required unless --serve, --batch-json, --ladder-json, --captions-json, --animate-json or --measure-json is set")
+
+  payload = read_json_arg(args.input_json)
+  overrides = {
+    "crop": True if args.crop else None,
+    "format": args.format,
+    "pngLevel": args.png_level,
+    "scale": args.scale,
+    "maxPreviewWidth": args.max_preview_width,
+  }
+  render_to_png(None, payload, args.out, cache, overrides, args.placement_json)
   return 0
 
 
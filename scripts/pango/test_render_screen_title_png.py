@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# Pure-Python tests for render_screen_title_png.py: the parts that don't need
+# Pango/cairo. Run from the repo root:
+#   python3 -m unittest discover -s scripts/pango -p 'test_*.py'
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import render_screen_title_png as r  # noqa: E402
+
+
+def instance(text="Hello world", **preset):
+  return {"text": text, "preset": preset}
+
+
+class NormalizeInstanceStyleTest(unittest.TestCase):
+  def test_defaults(self):
+    st = r.normalize_instance_style({})
+    self.assertEqual(st["style"], "pill")
+    self.assertEqual(st["font_size_pct"], 4.5)
+    self.assertEqual(st["shadow_offset_px"], 2.0)
+    self.assertEqual(st["shadow_blur_px"], 0.0)
+    self.assertFalse(st["auto_fit"])
+    self.assertIsNone(st["auto_fit_min_pct"])
+
+  def test_legacy_styles(self):
+    self.assertEqual(r.normalize_instance_style({"style": "strip"})["style"], "pill")
+    self.assertEqual(r.normalize_instance_style({"style": "outline"})["style"], "none")
+
+  def test_clamps(self):
+    st = r.normalize_instance_style({"fontSizePct": 30, "shadowBlurPx": 99, "offsetXPx": -5000, "maxWidthPct": 5})
+    self.assertEqual(st["font_size_pct"], 8.0)
+    self.assertEqual(st["shadow_blur_px"], 20.0)
+    self.assertEqual(st["offset_x_px"], -1000.0)
+    self.assertEqual(st["max_width_pct"], 0.20)
+
+  def test_auto_fit_range(self):
+    st = r.normalize_instance_style({"autoFit": True, "fontSizePct": 6, "minFontSizePct": 7})
+    self.assertTrue(st["auto_fit"])
+    self.assertEqual(st["auto_fit_max_pct"], 6.0)
+    # min never exceeds max.
+    self.assertEqual(st["auto_fit_min_pct"], 6.0)
+
+  def test_not_a_dict(self):
+    self.assertEqual(r.normalize_instance_style(None), r.normalize_instance_style({}))
+
+
+class OutputOptionsTest(unittest.TestCase):
+  def test_defaults(self):
+    self.assertEqual(r.read_output_options({}), r.DEFAULT_OUTPUT_OPTIONS)
+
+  def test_overrides_win_over_payload(self):
+    options = r.read_output_options({"crop": True}, {"crop": None})
+    self.assertTrue(options["crop"])
+    self.assertFalse(r.read_output_options({"crop": True}, {"crop": False})["crop"])
+    options = r.read_output_options({"format": "bgra"}, {"format": "png", "pngLevel": None})
+    self.assertEqual(options["format"], "png")
+
+  def test_png_level_only_for_png(self):
+    self.assertEqual(r.read_output_options({"format": "png", "pngLevel": 3})["pngLevel"], 3)
+    self.assertEqual(r.read_output_options({"pngLevel": 42})["pngLevel"], 9)
+    self.assertIsNone(r.read_output_options({"format": "rgba", "pngLevel": 3})["pngLevel"])
+
+  def test_invalid(self):
+    with self.assertRaises(r.RenderError) as cm:
+      r.read_output_options({"format": "gif"})
+    self.assertEqual(cm.exception.code, "invalid_format")
+    with self.assertRaises(r.RenderError) as cm:
+      r.read_output_options({"pngLevel": "fast"})
+    self.assertEqual(cm.exception.code, "invalid_png_level")
+    with self.assertRaises(r.RenderError) as cm:
+      r.read_output_options({"maxPreviewWidth": "wide"})
+    self.assertEqual(cm.exception.code, "invalid_max_preview_width")
+    for scale in (0, -1, "half", float("nan")):
+      with self.assertRaises(r.RenderError):
+        r.read_output_options({"scale": scale})
+
+  def test_preview_scale(self):
+    # scale >= 1 means full size; maxPreviewWidth caps the surface width.
+    self.assertIsNone(r.read_output_options({"scale": 1.5})["scale"])
+    self.assertEqual(r.read_output_options({"scale": 0.001})["scale"], r.MIN_PREVIEW_SCALE)
+    self.assertEqual(r.preview_scale(r.read_output_options({}), 1080), 1.0)
+    self.assertEqual(r.preview_scale(r.read_output_options({"maxPreviewWidth": 540}), 1080), 0.5)
+    self.assertEqual(r.preview_scale(r.read_output_options({"scale": 0.25, "maxPreviewWidth": 540}), 1080), 0.25)
+    self.assertEqual(r.preview_scale(r.read_output_options({"maxPreviewWidth": 2000}), 1080), 1.0)
+
+
+class CropRectTest(unittest.TestCase):
+  def box(self, x, y, w, h, bleed=0.0):
+    return {"box_x": x, "box_y": y, "box_w": w, "box_h": h, "bleed": bleed}
+
+  def test_covers_boxes_and_bleed(self):
+    self.assertEqual(r.crop_rect_for_boxes(1080, 1920, [self.box(100, 200, 50, 20, 2)]), (98, 198, 54, 24))
+    self.assertEqual(
+      r.crop_rect_for_boxes(1080, 1920, [self.box(100, 200, 50, 20), self.box(300, 1000, 10, 10)]),
+      (100, 200, 210, 810),
+    )
+
+  def test_origin_is_even(self):
+    # Odd/fractional origins round down to even; the far edge stays put.
+    self.assertEqual(r.crop_rect_for_boxes(1080, 1920, [self.box(101.5, 203.2, 50, 20)]), (100, 202, 52, 22))
+    for x in (0.0, 0.5, 1.0, 1.9, 2.0, 3.3, 1077.0):
+      ox, oy, sw, sh = r.crop_rect_for_boxes(1080, 1920, [self.box(x, x, 1, 1)])
+      self.assertEqual((ox % 2, oy % 2), (0, 0))
+      self.assertGreaterEqual(ox + sw, x + 1)
+      self.assertGreaterEqual(oy + sh, x + 1)
+
+  def test_clipped_to_frame(self):
+    self.assertEqual(r.crop_rect_for_boxes(1080, 1920, [self.box(-10, 1900, 2000, 50)]), (0, 1900, 1080, 20))
+    self.assertEqual(r.crop_rect_for_boxes(1080, 1920, []), (0, 0, 1, 1))
+
+
+class RenderCacheKeyTest(unittest.TestCase):
+  def key(self, instances, options=None, width=1080, height=1920):
+    return r.render_cache_key(width, height, instances, options)
+
+  def test_stable(self):
+    self.assertEqual(self.key([instance(style="pill")]), self.key([instance(style="pill")]))
+
+  def test_keyed_on_normalized_style(self):
+    # Equivalent presets (legacy alias, explicit default) share an entry.
+    self.assertEqual(self.key([instance(style="strip")]), self.key([instance()]))
+    self.assertEqual(self.key([instance(fontSizePct=4.5)]), self.key([instance()]))
+    self.assertEqual(self.key([instance(fontSizePct=50)]), self.key([instance(fontSizePct=8)]))
+
+  def test_inputs_that_change_the_image(self):
+    base = self.key([instance()])
+    self.assertNotEqual(base, self.key([instance("Hello World")]))
+    self.assertNotEqual(base, self.key([instance(shadowBlurPx=2)]))
+    self.assertNotEqual(base, self.key([instance()], width=1920, height=1080))
+    self.assertNotEqual(base, self.key([instance(), instance("Second")]))
+
+  def test_only_non_default_options_enter_the_key(self):
+    base = self.key([instance()])
+    self.assertEqual(base, self.key([instance()], dict(r.DEFAULT_OUTPUT_OPTIONS)))
+    self.assertNotEqual(base, self.key([instance()], dict(r.DEFAULT_OUTPUT_OPTIONS, crop=True)))
+    self.assertNotEqual(base, self.key([instance()], dict(r.DEFAULT_OUTPUT_OPTIONS, scale=0.5)))
+
+
+class RenderCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.tmp = tempfile.TemporaryDirectory()
+    self.root = os.path.join(self.tmp.name, "cache")
+
+  def tearDown(self):
+    self.tmp.cleanup()
+
+  def test_put_get(self):
+    cache = r.RenderCache(self.root, 1 << 20)
+    self.assertIsNone(cache.get("ab" * 32))
+    cache.put("ab" * 32, b"png", {"placement": {"x": 1}})
+    path, meta = cache.get("ab" * 32)
+    with open(path, "rb") as f:
+      self.assertEqual(f.read(), b"png")
+    self.assertEqual(meta, {"placement": {"x": 1}})
+
+  def test_lookups_counted_by_caller(self):
+    cache = r.RenderCache(self.root, 1 << 20)
+    cache.put("cd" * 32, b"png")
+    cache.get("cd" * 32)
+    cache.get("ef" * 32)
+    self.assertEqual((cache.hits, cache.misses), (0, 0))
+    cache.record_lookup(True)
+    cache.record_lookup(False)
+    cache.record_lookup(False)
+    stats = cache.stats()
+    self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+    # Persisted counters are shared across processes (instances).
+    self.assertEqual(r.RenderCache(self.root, 1 << 20).stats()["hits"], 1)
+
+  def test_stats_written_in_batches(self):
+    cache = r.RenderCache(self.root, 1 << 20)
+    for _ in range(10):
+      cache.record_lookup(True)
+    self.assertFalse(os.path.exists(os.path.join(self.root, "stats.json")))
+    cache.flush_stats()
+    with open(os.path.join(self.root, "stats.json"), "r", encoding="utf-8") as f:
+      self.assertEqual(json.load(f)["hits"], 10)
+
+  def test_evicts_least_recently_used(self):
+    cache = r.RenderCache(self.root, 250)
+    for i, key in enumerate(("11" * 32, "22" * 32, "33" * 32)):
+      cache.put(key, b"x" * 100)
+      os.utime(cache.entry_path(key), (1000 + i, 1000 + i))
+      cache._total_bytes = None
+    self.assertIsNone(cache.get("11" * 32))
+    self.assertIsNotNone(cache.get("33" * 32))
+
+
+class LadderTest(unittest.TestCase):
+  def test_scale_reuse_for_same_aspect(self):
+    self.assertAlmostEqual(r.ladder_scale(1080, 1920, 720, 1280, [instance()]), 2.0 / 3.0)
+
+  def test_no_reuse(self):
+    # Upscale, other aspect, auto-fit, clamped font px, clamped pill padding.
+    self.assertIsNone(r.ladder_scale(720, 1280, 1080, 1920, [instance()]))
+    self.assertIsNone(r.ladder_scale(1080, 1920, 1080, 1080, [instance()]))
+    self.assertIsNone(r.ladder_scale(1080, 1920, 720, 1280, [instance(autoFit=True)]))
+    self.assertIsNone(r.ladder_scale(1080, 1920, 720, 1280, [instance(fontSizePct=1)]))
+    self.assertIsNone(r.ladder_scale(1920, 1080, 640, 360, [instance(style="pill")]))
+    self.assertIsNotNone(r.ladder_scale(1920, 1080, 640, 360, [instance(style="none")]))
+
+  def test_frames(self):
+    frames = r.read_ladder_frames({"frames": [
+      {"width": 1280, "height": 720, "name": "720p"},
+      {"width": 1280, "height": 720, "name": "720p"},
+      {"width": 640, "height": 360, "out": "/tmp/x.png"},
+    ]}, "/out", "png")
+    self.assertEqual([f["out"] for f in frames], ["/out/720p.png", "/tmp/x.png"])
+    self.assertEqual(frames[1]["name"], "640x360")
+    with self.assertRaises(r.RenderError):
+      r.read_ladder_frames({"frames": [{"width": 640, "height": 360}]}, None, "png")
+
+
+class PackShelvesTest(unittest.TestCase):
+  def test_no_overlap_within_width(self):
+    sizes = [(300, 40), (120, 80), (500, 40), (90, 30), (700, 60), (10, 10), (400, 80)]
+    pos, w, h = r.pack_shelves(sizes, 800)
+    rects = [(x, y, sw, sh) for (x, y), (sw, sh) in zip(pos, sizes)]
+    for i, a in enumerate(rects):
+      self.assertLessEqual(a[0] + a[2], w)
+      self.assertLessEqual(a[1] + a[3], h)
+      self.assertLessEqual(w, 800)
+      for b in rects[i + 1:]:
+        apart_x = a[0] + a[2] + r.ATLAS_PADDING <= b[0] or b[0] + b[2] + r.ATLAS_PADDING <= a[0]
+        apart_y = a[1] + a[3] + r.ATLAS_PADDING <= b[1] or b[1] + b[3] + r.ATLAS_PADDING <= a[1]
+        self.assertTrue(apart_x or apart_y, (a, b))
+
+  def test_oversized_sprite_gets_its_own_shelf(self):
+    pos, w, _h = r.pack_shelves([(50, 10), (900, 20)], 800)
+    self.assertEqual(pos[1], (0, 0))
+    self.assertEqual(w, 900)
+
+
+class AnimationTest(unittest.TestCase):
+  def test_options(self):
+    opts = r.read_animation_options({"animation": {"mode": "word", "fps": 24}})
+    self.assertEqual(opts["unitsPerSecond"], r.DEFAULT_UNITS_PER_SECOND["word"])
+    for bad in ({"mode": "fade"}, {"fps": 500}, {"delay": -1}, {"fps": "fast"}):
+      with self.assertRaises(r.RenderError):
+        r.read_animation_options({"animation": bad})
+
+  def test_visible_units(self):
+    timing = {"delay": 0.5}
+    self.assertEqual(r.visible_units(0.0, 10, timing, 2.0), 0)
+    self.assertEqual(r.visible_units(0.5, 10, timing, 2.0), 1)
+    self.assertEqual(r.visible_units(1.5, 10, timing, 2.0), 6)
+    self.assertEqual(r.visible_units(9.0, 10, timing, 2.0), 10)
+    self.assertEqual(r.visible_units(0.5, 10, timing, 0.0), 10)
+
+
+class FakeSurface:
+  # The slice of cairo.ImageSurface FrameEncoder reads: premultiplied ARGB32
+  # rows (little-endian B,G,R,A) with a padded stride.
+  def __init__(self, w, h):
+    self.w = w
+    self.h = h
+    self.stride = w * 4 + 8
+    self.data = bytearray(self.stride * h)
+
+  def set_pixel(self, x, y, r_, g, b, a):
+    o = y * self.stride + x * 4
+    self.data[o:o + 4] = bytes((b, g, r_, a))
+
+  def flush(self):
+    pass
+
+  def get_width(self):
+    return self.w
+
+  def get_height(self):
+    return self.h
+
+  def get_stride(self):
+    return self.stride
+
+  def get_data(self):
+    return memoryview(self.data)
+
+
+def decode_sub_png(png):
+  # Minimal decoder for the Sub-filtered RGBA PNGs this renderer writes.
+  pos = 8
+  idat = b""
+  while pos < len(png):
+    (n,) = struct.unpack(">I", png[pos:pos + 4])
+    tag = png[pos + 4:pos + 8]
+    body = png[pos + 8:pos + 8 + n]
+    if tag == b"IHDR":
+      w, h = struct.unpack(">II", body[:8])
+    elif tag == b"IDAT":
+      idat += body
+    pos += 12 + n
+  raw = zlib.decompress(idat)
+  rows = []
+  for y in range(h):
+    line = bytearray(raw[y * (w * 4 + 1) + 1:(y + 1) * (w * 4 + 1)])
+    for i in range(4, len(line)):
+      line[i] = (line[i] + line[i - 4]) & 0xFF
+    rows.append(bytes(line))
+  return w, h, rows
+
+
+@unittest.skipIf(r.load_numpy() is None, "numpy not installed")
+class FrameEncoderTest(unittest.TestCase):
+  def test_png_dirty_strips_match_a_full_encode(self):
+    np = r.load_numpy()
+    s = FakeSurface(7, 40)
+    s.set_pixel(1, 1, 255, 0, 0, 255)
+    enc = r.FrameEncoder(s, dict(r.DEFAULT_OUTPUT_OPTIONS, pngLevel=6))
+    enc.encode()
+    s.set_pixel(3, 33, 64, 32, 16, 128)
+    s.set_pixel(6, 39, 1, 2, 3, 4)
+    w, h, rows = decode_sub_png(enc.encode(33, 40))
+    self.assertEqual((w, h), (7, 40))
+    expected = r.unpremultiplied_rgba(np, s).reshape(h, w * 4)
+    self.assertEqual(rows, [bytes(row) for row in expected])
+
+  def test_raw_formats_patch_rows(self):
+    for fmt in ("bgra", "rgba"):
+      s = FakeSurface(5, 20)
+      enc = r.FrameEncoder(s, dict(r.DEFAULT_OUTPUT_OPTIONS, format=fmt))
+      enc.encode()
+      s.set_pixel(2, 12, 200, 100, 50, 200)
+      self.assertEqual(enc.encode(12, 13), r.encode_surface(s, {"format": fmt}))
+
+
+class JsonArgsTest(unittest.TestCase):
+  def test_read_errors(self):
+    with self.assertRaises(r.RenderError) as cm:
+      r.read_json_arg("/nonexistent/input.json")
+    self.assertTrue(cm.exception.code.startswith("failed_read_input_json:"))
+    self.assertEqual(cm.exception.exit_code, 2)
+
+  def test_write_to_file_or_stdout(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      path = os.path.join(tmp, "m.json")
+      r.write_json_result({"ok": True}, path)
+      self.assertEqual(r.read_json_arg(path), {"ok": True})
+    out = io.StringIO()
+    stdout, sys.stdout = sys.stdout, out
+    try:
+      r.write_json_result({"ok": 1})
+    finally:
+      sys.stdout = stdout
+    self.assertEqual(out.getvalue(), '{"ok": 1}\n')
+    with self.assertRaises(r.RenderError) as cm:
+      r.write_json_result({}, "/nonexistent/dir/m.json")
+    self.assertEqual(cm.exception.exit_code, 4)
+
+
+class BatchJobsTest(unittest.TestCase):
+  def test_list_or_jobs_object(self):
+    jobs = [{"out": "/tmp/a.png"}]
+    self.assertEqual(r.read_batch_jobs(jobs), jobs)
+    self.assertEqual(r.read_batch_jobs({"jobs": jobs}), jobs)
+
+  def test_invalid(self):
+    for payload in ({}, {"jobs": {}}, "jobs", None):
+      with self.assertRaises(r.RenderError) as cm:
+        r.read_batch_jobs(payload)
+      self.assertEqual(cm.exception.code, "invalid_batch")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -64,6 +64,23 @@ export const SCREEN_TITLE_RENDERER: 'drawtext' | 'pango' = (() => {
   return raw === 'pango' ? 'pango' : 'drawtext'
 })()
 
+// Optional on-disk cache for Pango screen-title PNGs (content-addressed, LRU-evicted).
+// Leave SCREEN_TITLE_RENDER_CACHE_DIR empty to disable.
+export const SCREEN_TITLE_RENDER_CACHE_DIR = String(process.env.SCREEN_TITLE_RENDER_CACHE_DIR || '').trim()
+export const SCREEN_TITLE_RENDER_CACHE_MAX_MB = envInt('SCREEN_TITLE_RENDER_CACHE_MAX_MB', 256, { min: 1, max: 16384 })
+// Ask the Pango renderer for per-phase timings and attach them to its subprocess span.
+export const SCREEN_TITLE_RENDER_TIMINGS = envBool('SCREEN_TITLE_RENDER_TIMINGS', false)
+// Warm `render_screen_title_png.py --serve` workers shared by previews and burn-ins.
+// 0 (the default) disables the pool: one renderer process per request. When all workers
+// are busy, up to MAX_QUEUE requests wait; beyond that callers get 503 screen_title_renderer_busy.
+export const SCREEN_TITLE_RENDER_POOL_SIZE = envInt('SCREEN_TITLE_RENDER_POOL_SIZE', 0, { min: 0, max: 32 })
+export const SCREEN_TITLE_RENDER_POOL_MAX_QUEUE = envInt('SCREEN_TITLE_RENDER_POOL_MAX_QUEUE', 32, { min: 0, max: 1000 })
+export const SCREEN_TITLE_RENDER_POOL_TIMEOUT_MS = envInt('SCREEN_TITLE_RENDER_POOL_TIMEOUT_MS', 30000, { min: 1000, max: 300000 })
+export const SCREEN_TITLE_RENDER_POOL_PREWARM = envBool('SCREEN_TITLE_RENDER_POOL_PREWARM', false)
+// Font index written by scripts/pango/build_font_index.py (npm run fonts:index). When the file
+// is missing or unreadable, fc: keys are listed via fc-list instead. Empty disables the index.
+export const SCREEN_TITLE_FONT_INDEX = String(process.env.SCREEN_TITLE_FONT_INDEX ?? '/tmp/fontconfig-cache/screen-title-fonts.json').trim()
+
 // Optional audio cleanup: gentle high-pass on the video's original audio only (helps wind/rumble).
 export const MEDIA_VIDEO_HIGHPASS_ENABLED = envBool('MEDIA_VIDEO_HIGHPASS_ENABLED', false);
 export const MEDIA_VIDEO_HIGHPASS_HZ = (() => {
@@ -1,12 +1,10 @@
 import { Router } from 'express'
-import fs from 'fs'
-import os from 'os'
-import path from 'path'
+import type { Response } from 'express'
 import { requireAuth } from '../middleware/auth'
 import { getPool } from '../db'
 import { DomainError } from '../core/errors'
 import * as screenTitlePresetsSvc from '../features/screen-title-presets/service'
-import { renderScreenTitlePngWithPango } from '../services/pango/screenTitlePng'
+import { measureScreenTitlesWithPango, renderScreenTitleImageWithPango, type ScreenTitleImage } from '../services/pango/screenTitlePng'
 
 export const screenTitlePreviewRouter = Router()
 
@@ -34,6 +32,15 @@ function normalizeFrame(raw: any): { width: number; height: number } {
   return { width: w, height: h }
 }
 
+// Editor previews are shown scaled down; the renderer lays out at the full frame and
+// rasterizes at this width so the PNG is a fraction of the export size.
+function normalizeMaxPreviewWidth(raw: any): number | undefined {
+  if (raw == null) return undefined
+  const n = Number(raw)
+  if (!Number.isFinite(n) || n <= 0) return undefined
+  return normalizeInt(n, 1080, 120, 4096)
+}
+
 function sanitizePresetDraft(raw: any): any {
   const styleRaw = String(raw?.style || 'pill').trim().toLowerCase()
   const style =
@@ -58,6 +65,10 @@ function sanitizePresetDraft(raw: any): any {
     fontKey: String(raw?.fontKey || 'dejavu_sans_bold').trim() || 'dejavu_sans_bold',
     sizeKey: String(raw?.sizeKey || '18').trim() || '18',
     fontSizePct: normalizePct(raw?.fontSizePct, 4.5, 1, 12),
+    // Draft-only: shrink to the largest size in [min, max] that fits without ellipsis.
+    autoFit: raw?.autoFit === true,
+    minFontSizePct: raw?.minFontSizePct == null ? null : normalizePct(raw?.minFontSizePct, 1, 1, 8),
+    maxFontSizePct: raw?.maxFontSizePct == null ? null : normalizePct(raw?.maxFontSizePct, 8, 1, 8),
     trackingPct: normalizePct(raw?.trackingPct, 0, -20, 50),
     lineSpacingPct: normalizePct(raw?.lineSpacingPct, 0, -20, 200),
     fontColor: normalizeHexColor(raw?.fontColor, '#ffffff'),
@@ -82,9 +93,19 @@ function sanitizePresetDraft(raw: any): any {
   }
 }
 
+// PNG body; when the preset has autoFit, the size the renderer settled on rides
+// along as JSON in X-Screen-Title-Auto-Fit ([{ index, fontSizePct, fontPx, ellipsized }])
+// so the editor can show or persist it without a separate measure call.
+function sendPreviewImage(res: Response, image: ScreenTitleImage) {
+  res.setHeader('Content-Type', 'image/png')
+  res.setHeader('Cache-Control', 'no-store')
+  if (image.placement.autoFit?.length) res.setHeader('X-Screen-Title-Auto-Fit', JSON.stringify(image.placement.autoFit))
+  res.setHeader('Content-Length', String(image.data.length))
+  res.status(200).end(image.data)
+}
+
 screenTitlePreviewRouter.post('/api/screen-titles/preview', requireAuth, async (req, res, next) => {
   const db = getPool()
-  const tmpDir = fs.mkdtempSync(path.join(os.tmpdir(), 'bacs-screen-title-preview-'))
   try {
     const body = req.body || {}
     const uploadId = Number(body.uploadId)
@@ -110,28 +131,17 @@ screenTitlePreviewRouter.post('/api/screen-titles/preview', requireAuth, async (
     const portrait = Number.isFinite(w) && Number.isFinite(h) && w > 0 && h > 0 ? (h >= w) : true
     const frame = w > 0 && h > 0 ? { width: w, height: h } : (portrait ? { width: 1080, height: 1920 } : { width: 1920, height: 1080 })
 
-    const outPath = path.join(tmpDir, 'preview.png')
-    await renderScreenTitlePngWithPango({
+    const image = await renderScreenTitleImageWithPango({
       input: { text, preset, frame },
-      outPath,
+      maxPreviewWidth: normalizeMaxPreviewWidth(body.maxPreviewWidth),
     })
-
-    // Avoid res.sendFile() here because it streams asynchronously; we'd delete tmpDir in finally
-    // before the file is fully read. Read into memory and send as a single response.
-    const png = fs.readFileSync(outPath)
-    res.setHeader('Content-Type', 'image/png')
-    res.setHeader('Cache-Control', 'no-store')
-    res.setHeader('Content-Length', String(png.length))
-    res.status(200).end(png)
+    sendPreviewImage(res, image)
   } catch (err) {
     next(err)
-  } finally {
-    try { fs.rmSync(tmpDir, { recursive: true, force: true }) } catch {}
   }
 })
 
 screenTitlePreviewRouter.post('/api/screen-title-presets/preview', requireAuth, async (req, res, next) => {
-  const tmpDir = fs.mkdtempSync(path.join(os.tmpdir(), 'bacs-screen-title-preset-preview-'))
   try {
     const body = req.body || {}
     const presetId = Number(body.presetId)
@@ -151,20 +161,43 @@ screenTitlePreviewRouter.post('/api/screen-title-presets/preview', requireAuth,
     }
 
     const frame = normalizeFrame(body.frame)
-    const outPath = path.join(tmpDir, 'preview.png')
-    await renderScreenTitlePngWithPango({
+    const image = await renderScreenTitleImageWithPango({
       input: { text, preset, frame },
-      outPath,
+      maxPreviewWidth: normalizeMaxPreviewWidth(body.maxPreviewWidth),
     })
+    sendPreviewImage(res, image)
+  } catch (err) {
+    next(err)
+  }
+})
 
-    const png = fs.readFileSync(outPath)
-    res.setHeader('Content-Type', 'image/png')
+// Layout-only check for live typing: many candidate texts, one renderer call, no PNG.
+screenTitlePreviewRouter.post('/api/screen-titles/measure', requireAuth, async (req, res, next) => {
+  try {
+    const body = req.body || {}
+    const presetId = Number(body.presetId)
+    const hasPresetId = Number.isFinite(presetId) && presetId > 0
+    const textsRaw = Array.isArray(body.texts) ? body.texts : body.text != null ? [body.text] : []
+    if (!textsRaw.length) throw new DomainError('missing_text', 'missing_text', 400)
+    if (textsRaw.length > 50) throw new DomainError('too_many_texts', 'too_many_texts', 400)
+    const texts = textsRaw.map((t: any) => String(t ?? '').replace(/\r\n/g, '\n'))
+    for (const text of texts) {
+      if (text.length > 1000) throw new DomainError('invalid_screen_title', 'invalid_screen_title', 400)
+      if (text.split('\n').length > 30) throw new DomainError('invalid_screen_title_lines', 'invalid_screen_title_lines', 400)
+    }
+
+    let preset: any = null
+    if (hasPresetId) {
+      preset = await screenTitlePresetsSvc.getActiveForUser(presetId, Number(req.user!.id))
+    } else {
+      preset = sanitizePresetDraft(body.preset || {})
+    }
+
+    const frame = normalizeFrame(body.frame)
+    const result = await measureScreenTitlesWithPango({ input: { frame, preset, texts } })
     res.setHeader('Cache-Control', 'no-store')
-    res.setHeader('Content-Length', String(png.length))
-    res.status(200).end(png)
+    res.json(result)
   } catch (err) {
     next(err)
-  } finally {
-    try { fs.rmSync(tmpDir, { recursive: true, force: true }) } catch {}
   }
 })
@@ -6,6 +6,7 @@ import { ensureSchema, getPool, seedRbac } from './db';
 import { getMediaConvertClient } from './aws/mediaconvert';
 import { ASSEMBLYAI_AUTOTRANSCRIBE, ASSEMBLYAI_ENABLED, MEDIA_JOBS_ENABLED, PORT, STATUS_POLL_MS } from './config';
 import { startMediaJobsWorker, stopMediaJobsWorkerAndWait } from './services/mediaJobs/worker';
+import { closePangoRendererPool, prewarmPangoRendererPool } from './services/pango/rendererPool';
 import * as mediaJobs from './features/media-jobs/service'
 import { getLogger, logError, observabilityConfig } from './lib/logger';
 import { shutdownObservability } from './lib/observability';
@@ -51,6 +52,8 @@ async function start() {
     logError(serverLogger, err, 'server_error')
   });
 
+  try { prewarmPangoRendererPool(); } catch (e) { serverLogger.warn({ err: e }, 'pango_renderer_prewarm_failed') }
+
   startBackgroundJobs().catch((err) => {
     logError(serverLogger, err, 'background_jobs_failed_to_start')
   });
@@ -304,6 +307,7 @@ async function gracefulStop(signal: NodeJS.Signals) {
   }
 
   try { await stopMediaJobsWorkerAndWait({ timeoutMs: 1500 }); } catch {}
+  try { closePangoRendererPool(); } catch {}
 
   const waitForPolling = (async () => {
     const deadline = Date.now() + 5000;
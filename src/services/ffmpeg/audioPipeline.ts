@@ -741,9 +741,12 @@ async function burnScreenTitleWithPango(opts: {
 
   return await withTempDir('bacs-pango-title-', async (tmpDir) => {
     const pngPath = path.join(tmpDir, 'screen-title.png')
-    await renderScreenTitlePngWithPango({
-      input: { text: rawText, preset, frame },
+    // Cropped overlay: only the title boxes are encoded/decoded/blended per frame.
+    const placement = await renderScreenTitlePngWithPango({
+      input: { text: rawText, preset, frame, crop: true },
       outPath: pngPath,
+      // Read once by ffmpeg and deleted; spend nothing on compression.
+      pngLevel: 1,
     })
 
     const filterParts: string[] = []
@@ -763,7 +766,7 @@ async function burnScreenTitleWithPango(opts: {
     filterParts.push(ovChain.join(',') + `[ovt]`)
 
     const enableExpr = endS != null ? `between(t\\,0\\,${endS.toFixed(3)})` : '1'
-    filterParts.push(`[base0][ovt]overlay=0:0:eof_action=pass:enable='${enableExpr}'[vout]`)
+    filterParts.push(`[base0][ovt]overlay=${placement.x}:${placement.y}:eof_action=pass:enable='${enableExpr}'[vout]`)
 
     const filter = filterParts.join(';')
     await runFfmpeg(
@@ -1,5 +1,7 @@
 import { spawnSync } from 'child_process'
+import fs from 'fs'
 import path from 'path'
+import { SCREEN_TITLE_FONT_INDEX } from '../../config'
 
 export type ScreenTitleFontVariant = {
   key: string
@@ -94,13 +96,22 @@ function getScreenTitleFontsCached(): Cache {
   return cache
 }
 
-function loadFromFontconfig(): Cache {
-  const cwd = process.cwd()
-  const fontDir = path.resolve(cwd, 'assets', 'fonts')
-  const fontConfigFile = path.resolve(cwd, 'assets', 'fonts', 'fonts.conf')
-
-  const builtInFamilyNames = new Set(BUILT_IN_FAMILIES.map((f) => f.label))
+// Prebuilt by scripts/pango/build_font_index.py (same file/family/style rows as fc-list),
+// so a fresh process doesn't pay for a Fontconfig scan just to validate fc: keys.
+function readFontIndexLines(): string[] | null {
+  if (!SCREEN_TITLE_FONT_INDEX) return null
+  try {
+    const index = JSON.parse(fs.readFileSync(path.resolve(process.cwd(), SCREEN_TITLE_FONT_INDEX), 'utf8'))
+    if (!index || index.version !== 1 || !Array.isArray(index.fonts)) return null
+    return index.fonts
+      .filter((f: any) => f && f.file && f.family && f.style)
+      .map((f: any) => `${path.resolve(process.cwd(), String(f.file))}\t${String(f.family)}\t${String(f.style)}`)
+  } catch {
+    return null
+  }
+}
 
+function listFontconfigLines(fontConfigFile: string): string[] {
   // We ask fc-list for file, family, style. Then we filter to only files under assets/fonts.
   const args = ['-f', '%{file}\t%{family[0]}\t%{style}\n']
   const out = spawnSync('fc-list', args, {
@@ -110,8 +121,17 @@ function loadFromFontconfig(): Cache {
     },
     encoding: 'utf8',
   })
+  return String(out.stdout || '').split('\n').map((l) => l.trim()).filter(Boolean)
+}
+
+function loadFromFontconfig(): Cache {
+  const cwd = process.cwd()
+  const fontDir = path.resolve(cwd, 'assets', 'fonts')
+  const fontConfigFile = path.resolve(cwd, 'assets', 'fonts', 'fonts.conf')
+
+  const builtInFamilyNames = new Set(BUILT_IN_FAMILIES.map((f) => f.label))
 
-  const lines = String(out.stdout || '').split('\n').map((l) => l.trim()).filter(Boolean)
+  const lines = readFontIndexLines() ?? listFontconfigLines(fontConfigFile)
 
   const variants: ScreenTitleFontVariant[] = []
   for (const line of lines) {
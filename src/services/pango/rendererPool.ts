@@ -0,0 +1,385 @@
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process'
+import { createHash } from 'crypto'
+import path from 'path'
+import { metrics } from '@opentelemetry/api'
+import { DomainError } from '../../core/errors'
+import {
+  SCREEN_TITLE_RENDER_CACHE_DIR,
+  SCREEN_TITLE_RENDER_CACHE_MAX_MB,
+  SCREEN_TITLE_RENDER_POOL_MAX_QUEUE,
+  SCREEN_TITLE_RENDER_POOL_PREWARM,
+  SCREEN_TITLE_RENDER_POOL_SIZE,
+  SCREEN_TITLE_RENDER_POOL_TIMEOUT_MS,
+} from '../../config'
+
+// Fixed-size pool of warm `render_screen_title_png.py --serve` workers.
+// - At most SCREEN_TITLE_RENDER_POOL_SIZE renderer processes, started on first use
+//   and kept alive (GI import + Fontconfig paid once per worker).
+// - Requests wait in a bounded FIFO queue; when it is full, callers get a 503
+//   (screen_title_renderer_busy) instead of piling up more work.
+// - Concurrent requests with identical input share one in-flight render.
+
+const meter = metrics.getMeter('aws.pango.renderer')
+
+const queueDepth = meter.createUpDownCounter('screen_title_render.queue_depth', {
+  description: 'Screen-title render requests waiting for a pool worker',
+})
+
+const queueWaitMs = meter.createHistogram('screen_title_render.queue_wait_ms', {
+  description: 'Time a screen-title render request waited for a pool worker',
+  unit: 'ms',
+})
+
+const renderDurationMs = meter.createHistogram('screen_title_render.duration_ms', {
+  description: 'Worker round trip per screen-title render request',
+  unit: 'ms',
+})
+
+const coalescedTotal = meter.createCounter('screen_title_render.coalesced_total', {
+  description: 'Requests served by joining an identical in-flight render',
+})
+
+const rejectedTotal = meter.createCounter('screen_title_render.rejected_total', {
+  description: 'Requests rejected because the render queue was full',
+})
+
+const workerRestartsTotal = meter.createCounter('screen_title_render.worker_restarts_total', {
+  description: 'Pool workers that exited or timed out and were replaced',
+})
+
+export type PangoRendererRequest = {
+  op: 'render' | 'measure'
+  input: any
+  format?: 'png' | 'bgra' | 'rgba'
+  pngLevel?: number
+  crop?: boolean
+  scale?: number
+  maxPreviewWidth?: number
+  timings?: boolean
+}
+
+export type PangoRendererResult = {
+  resp: any
+  // Inline image bytes for render requests.
+  data: Buffer | null
+  queueWaitMs: number
+  coalesced: boolean
+}
+
+export function pangoRendererSpawnSpec(rendererArgs: string[]): { command: string; args: string[]; env: NodeJS.ProcessEnv } {
+  const scriptPath = path.join(process.cwd(), 'scripts', 'pango', 'render_screen_title_png.py')
+  const args = ['-u', scriptPath, ...rendererArgs]
+  if (SCREEN_TITLE_RENDER_CACHE_DIR) {
+    args.push('--cache-dir', path.resolve(process.cwd(), SCREEN_TITLE_RENDER_CACHE_DIR))
+    args.push('--cache-max-mb', String(SCREEN_TITLE_RENDER_CACHE_MAX_MB))
+  }
+  const fontConfigFile = path.join(process.cwd(), 'assets', 'fonts', 'fonts.conf')
+  return {
+    command: 'python3',
+    args,
+    env: {
+      ...process.env,
+      FONTCONFIG_FILE: fontConfigFile,
+    },
+  }
+}
+
+// Key order-insensitive JSON so equal inputs built in different orders coalesce.
+// Object fields that are null or undefined are dropped: the renderer reads every
+// input/preset field with .get(), so they mean the same as an absent field.
+function stableStringify(value: any): string {
+  if (value === null || typeof value !== 'object') return JSON.stringify(value) ?? 'null'
+  if (Array.isArray(value)) return `[${value.map(stableStringify).join(',')}]`
+  const keys = Object.keys(value).filter((k) => value[k] != null).sort()
+  return `{${keys.map((k) => `${JSON.stringify(k)}:${stableStringify(value[k])}`).join(',')}}`
+}
+
+// The request as the worker receives it. Output options are folded out of the
+// input (request fields win, as in the renderer) and left off when they are the
+// renderer's defaults, so the same render spelled two ways is one wire payload.
+function wireRequest(req: PangoRendererRequest): Record<string, any> {
+  const wire: Record<string, any> = { op: req.op, input: req.input }
+  if (req.op === 'render') {
+    const raw = req.input && typeof req.input === 'object' && !Array.isArray(req.input) ? req.input : null
+    const { crop, format, pngLevel, scale, maxPreviewWidth, ...input } = raw || {}
+    if (raw) wire.input = input
+    wire.inline = true
+    const fmt = req.format ?? format ?? 'png'
+    if (fmt !== 'png') wire.format = fmt
+    const level = req.pngLevel ?? pngLevel
+    if (fmt === 'png' && level != null) wire.pngLevel = level
+    if ((req.crop ?? crop) === true) wire.crop = true
+    // scale >= 1 is a full-size render; anything else (including junk) goes to the renderer to validate.
+    const s = req.scale ?? scale
+    if (s != null && !(Number(s) >= 1)) wire.scale = s
+    const mw = req.maxPreviewWidth ?? maxPreviewWidth
+    if (mw != null) wire.maxPreviewWidth = Number.isFinite(Number(mw)) ? Math.round(Number(mw)) : mw
+  }
+  if (req.timings) wire.timings = true
+  return wire
+}
+
+function requestKey(wire: Record<string, any>): string {
+  return createHash('sha256').update(stableStringify(wire)).digest('hex')
+}
+
+const FRAME_HEADER_BYTES = 4
+
+class RendererWorker {
+  private proc: ChildProcessWithoutNullStreams
+  private pending: Buffer = Buffer.alloc(0)
+  private frames: Buffer[] = []
+  private frameWaiters: Array<(frame: Buffer | null) => void> = []
+  private stderrTail = ''
+  private nextId = 1
+  dead = false
+  readonly ready: Promise<void>
+
+  constructor(private readonly onExit: (worker: RendererWorker) => void) {
+    const spec = pangoRendererSpawnSpec(['--serve'])
+    this.proc = spawn(spec.command, spec.args, { stdio: ['pipe', 'pipe', 'pipe'], env: spec.env })
+    this.proc.stdout.on('data', (d: Buffer) => this.onData(d))
+    this.proc.stderr.on('data', (d) => {
+      this.stderrTail = (this.stderrTail + String(d)).slice(-4000)
+    })
+    this.proc.stdin.on('error', () => {})
+    this.proc.on('error', () => this.markDead())
+    this.proc.on('close', () => this.markDead())
+    this.ready = this.readFrame().then((frame) => {
+      const msg = frame ? JSON.parse(frame.toString('utf8')) : null
+      if (!msg || msg.event !== 'ready') throw new Error(`pango_worker_not_ready:${this.stderrTail.slice(-800)}`)
+    })
+    // Avoid unhandled rejections when nobody is waiting on ready yet.
+    this.ready.catch(() => {})
+  }
+
+  private onData(d: Buffer) {
+    this.pending = this.pending.length ? Buffer.concat([this.pending, d]) : d
+    while (this.pending.length >= FRAME_HEADER_BYTES) {
+      const n = this.pending.readUInt32BE(0)
+      if (this.pending.length < FRAME_HEADER_BYTES + n) break
+      const frame = this.pending.subarray(FRAME_HEADER_BYTES, FRAME_HEADER_BYTES + n)
+      this.pending = this.pending.subarray(FRAME_HEADER_BYTES + n)
+      const waiter = this.frameWaiters.shift()
+      if (waiter) waiter(frame)
+      else this.frames.push(frame)
+    }
+  }
+
+  private readFrame(): Promise<Buffer | null> {
+    const frame = this.frames.shift()
+    if (frame) return Promise.resolve(frame)
+    if (this.dead) return Promise.resolve(null)
+    return new Promise((resolve) => this.frameWaiters.push(resolve))
+  }
+
+  private markDead() {
+    if (this.dead) return
+    this.dead = true
+    for (const waiter of this.frameWaiters.splice(0)) waiter(null)
+    this.onExit(this)
+  }
+
+  kill() {
+    try { this.proc.kill('SIGKILL') } catch {}
+    this.markDead()
+  }
+
+  shutdown() {
+    try { this.proc.stdin.end() } catch {}
+  }
+
+  // The deadline covers worker start-up too: a renderer stuck before its ready
+  // frame (GI import, Fontconfig) is killed and the request fails, not hangs.
+  async request(req: Record<string, any>, timeoutMs: number): Promise<{ resp: any; data: Buffer | null }> {
+    let timer: NodeJS.Timeout | undefined
+    const timeout = new Promise<never>((_resolve, reject) => {
+      timer = setTimeout(() => {
+        this.kill()
+        reject(new Error('pango_worker_timeout'))
+      }, timeoutMs)
+    })
+    try {
+      return await Promise.race([this.send(req), timeout])
+    } finally {
+      clearTimeout(timer)
+    }
+  }
+
+  private async send(req: Record<string, any>): Promise<{ resp: any; data: Buffer | null }> {
+    await this.ready
+    const id = this.nextId++
+    const body = Buffer.from(JSON.stringify({ ...req, id }), 'utf8')
+    const header = Buffer.alloc(FRAME_HEADER_BYTES)
+    header.writeUInt32BE(body.length, 0)
+    this.proc.stdin.write(Buffer.concat([header, body]))
+    return await this.readResponse()
+  }
+
+  private async readResponse(): Promise<{ resp: any; data: Buffer | null }> {
+    const frame = await this.readFrame()
+    if (!frame) throw new Error(`pango_worker_exited:${this.stderrTail.slice(-800)}`)
+    const resp = JSON.parse(frame.toString('utf8'))
+    let data: Buffer | null = null
+    if (resp && resp.dataLength != null) {
+      data = await this.readFrame()
+      if (!data) throw new Error(`pango_worker_exited:${this.stderrTail.slice(-800)}`)
+    }
+    return { resp, data }
+  }
+}
+
+type QueuedRequest = {
+  req: PangoRendererRequest
+  wire: Record<string, any>
+  enqueuedAt: number
+  resolve: (value: { resp: any; data: Buffer | null; queueWaitMs: number }) => void
+  reject: (err: any) => void
+}
+
+export class PangoRendererPool {
+  private workers = new Set<RendererWorker>()
+  private idle: RendererWorker[] = []
+  private queue: QueuedRequest[] = []
+  private inflight = new Map<string, Promise<{ resp: any; data: Buffer | null; queueWaitMs: number }>>()
+
+  constructor(
+    private readonly size: number,
+    private readonly maxQueue: number,
+    private readonly timeoutMs: number
+  ) {}
+
+  stats() {
+    return {
+      size: this.size,
+      workers: this.workers.size,
+      idle: this.idle.length,
+      queued: this.queue.length,
+      inflight: this.inflight.size,
+    }
+  }
+
+  // Start every worker now instead of on first request.
+  prewarm() {
+    while (this.workers.size < this.size) this.idle.push(this.startWorker())
+  }
+
+  async run(req: PangoRendererRequest): Promise<PangoRendererResult> {
+    const wire = wireRequest(req)
+    const key = requestKey(wire)
+    const existing = this.inflight.get(key)
+    if (existing) {
+      coalescedTotal.add(1, { op: req.op })
+      const out = await existing
+      return { ...out, coalesced: true }
+    }
+    const hasCapacity = this.idle.length > 0 || this.workers.size < this.size
+    if (!hasCapacity && this.queue.length >= this.maxQueue) {
+      rejectedTotal.add(1, { op: req.op })
+      throw new DomainError('screen_title_renderer_busy', 'screen_title_renderer_busy', 503)
+    }
+    const p = new Promise<{ resp: any; data: Buffer | null; queueWaitMs: number }>((resolve, reject) => {
+      this.queue.push({ req, wire, enqueuedAt: Date.now(), resolve, reject })
+      queueDepth.add(1)
+    })
+    this.inflight.set(key, p)
+    const cleanup = () => {
+      if (this.inflight.get(key) === p) this.inflight.delete(key)
+    }
+    p.then(cleanup, cleanup)
+    this.pump()
+    const out = await p
+    return { ...out, coalesced: false }
+  }
+
+  close() {
+    for (const job of this.queue.splice(0)) {
+      queueDepth.add(-1)
+      job.reject(new Error('pango_pool_closed'))
+    }
+    for (const w of this.workers) w.shutdown()
+  }
+
+  private startWorker(): RendererWorker {
+    const worker = new RendererWorker((w) => this.onWorkerExit(w))
+    this.workers.add(worker)
+    return worker
+  }
+
+  private onWorkerExit(worker: RendererWorker) {
+    if (!this.workers.delete(worker)) return
+    this.idle = this.idle.filter((w) => w !== worker)
+    workerRestartsTotal.add(1)
+    // A replacement starts lazily on the next pump.
+    if (this.queue.length) setImmediate(() => this.pump())
+  }
+
+  private takeWorker(): RendererWorker | null {
+    while (this.idle.length) {
+      const w = this.idle.pop()!
+      if (!w.dead) return w
+    }
+    if (this.workers.size < this.size) return this.startWorker()
+    return null
+  }
+
+  private pump() {
+    while (this.queue.length) {
+      const worker = this.takeWorker()
+      if (!worker) return
+      const job = this.queue.shift()!
+      queueDepth.add(-1)
+      const waited = Date.now() - job.enqueuedAt
+      queueWaitMs.record(waited, { op: job.req.op })
+      void this.dispatch(worker, job, waited)
+    }
+  }
+
+  private async dispatch(worker: RendererWorker, job: QueuedRequest, waited: number) {
+    const started = Date.now()
+    const { req, wire } = job
+    try {
+      const { resp, data } = await worker.request(wire, this.timeoutMs)
+      renderDurationMs.record(Date.now() - started, { op: req.op, outcome: resp?.ok ? 'ok' : 'error' })
+      if (!resp || resp.ok !== true) {
+        const code = String(resp?.error || 'render_failed')
+        job.reject(new Error(`pango_renderer_failed:${code}`))
+      } else {
+        job.resolve({ resp, data, queueWaitMs: waited })
+      }
+    } catch (err) {
+      renderDurationMs.record(Date.now() - started, { op: req.op, outcome: 'error' })
+      job.reject(err)
+    } finally {
+      if (!worker.dead) this.idle.push(worker)
+      this.pump()
+    }
+  }
+}
+
+let sharedPool: PangoRendererPool | null = null
+
+// null when SCREEN_TITLE_RENDER_POOL_SIZE=0 (one renderer process per request).
+export function getPangoRendererPool(): PangoRendererPool | null {
+  if (SCREEN_TITLE_RENDER_POOL_SIZE <= 0) return null
+  if (!sharedPool) {
+    sharedPool = new PangoRendererPool(
+      SCREEN_TITLE_RENDER_POOL_SIZE,
+      SCREEN_TITLE_RENDER_POOL_MAX_QUEUE,
+      SCREEN_TITLE_RENDER_POOL_TIMEOUT_MS
+    )
+  }
+  return sharedPool
+}
+
+// Called at startup; starts the workers only when SCREEN_TITLE_RENDER_POOL_PREWARM is set.
+export function prewarmPangoRendererPool() {
+  if (!SCREEN_TITLE_RENDER_POOL_PREWARM) return
+  getPangoRendererPool()?.prewarm()
+}
+
+export function closePangoRendererPool() {
+  if (!sharedPool) return
+  sharedPool.close()
+  sharedPool = null
+}
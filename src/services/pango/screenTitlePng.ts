@@ -3,6 +3,10 @@ import os from 'os'
 import path from 'path'
 import { spawn } from 'child_process'
 import { randomUUID } from 'crypto'
+import type { Span } from '@opentelemetry/api'
+import { SCREEN_TITLE_RENDER_TIMINGS } from '../../config'
+import { markSubprocessResult, withSubprocessSpan } from '../../lib/subprocessObservability'
+import { getPangoRendererPool, pangoRendererSpawnSpec, type PangoRendererRequest, type PangoRendererResult } from './rendererPool'
 
 export type ScreenTitlePngInstance = {
   text: string
@@ -14,43 +18,437 @@ export type ScreenTitlePngInput = {
   preset?: any
   instances?: ScreenTitlePngInstance[]
   frame: { width: number; height: number }
+  // Rasterize only the union of the title boxes instead of the full frame.
+  crop?: boolean
 }
 
+// Where a cropped overlay PNG sits inside the full frame.
+export type ScreenTitlePngPlacement = {
+  x: number
+  y: number
+  width: number
+  height: number
+  frameWidth: number
+  frameHeight: number
+  // Preview renders: fraction of the logical frame the image was rasterized at.
+  scale?: number
+  // Sizes chosen for instances whose preset has autoFit: true.
+  autoFit?: Array<{ index: number; fontSizePct: number; fontPx: number; ellipsized: boolean }>
+}
+
+export type ScreenTitlePngBatchJob = ScreenTitlePngInput & {
+  id?: string | number
+  outPath: string
+}
+
+export type ScreenTitlePngBatchResult = {
+  id: string | number
+  ok: boolean
+  out?: string
+  key?: string
+  cache?: 'hit' | 'miss'
+  dedupOf?: string | number
+  placement?: ScreenTitlePngPlacement
+  bytes?: number
+  error?: string
+}
+
+export type ScreenTitlePngBatchManifest = {
+  ok: boolean
+  total: number
+  succeeded: number
+  failed: number
+  rendered: number
+  jobs: ScreenTitlePngBatchResult[]
+}
+
+// png: straight-alpha PNG. bgra: cairo's premultiplied buffer (ffmpeg rawvideo
+// pix_fmt bgra, overlay alpha=premultiplied). rgba: straight-alpha raw frame.
+export type ScreenTitleImageFormat = 'png' | 'bgra' | 'rgba'
+
+export type ScreenTitleImageOptions = {
+  format?: ScreenTitleImageFormat
+  // zlib level 0-9 for png; unset keeps cairo's encoder.
+  pngLevel?: number
+  // Preview rasterization: layout still happens at input.frame (so wrapping and
+  // ellipsis match the export), the image comes back downscaled.
+  scale?: number
+  maxPreviewWidth?: number
+}
+
+// Returns the overlay placement: the cropped rect when input.crop is set, else the full frame.
 export async function renderScreenTitlePngWithPango(opts: {
   input: ScreenTitlePngInput
   outPath: string
-}): Promise<void> {
+} & ScreenTitleImageOptions): Promise<ScreenTitlePngPlacement> {
+  if (getPangoRendererPool()) {
+    const out = await runPooledPangoRenderer({
+      op: 'render',
+      input: opts.input,
+      format: opts.format,
+      pngLevel: opts.pngLevel,
+      crop: Boolean(opts.input.crop),
+    })
+    await fs.promises.writeFile(opts.outPath, out.data || Buffer.alloc(0))
+    return (out.resp.placement as ScreenTitlePngPlacement) || fullFramePlacement(opts.input.frame)
+  }
+  const args = ['--input-json', '-', '--out', opts.outPath, ...imageOptionArgs(opts)]
+  if (!opts.input.crop) {
+    await runPythonPangoRenderer(args, { stdin: JSON.stringify(opts.input) })
+    return fullFramePlacement(opts.input.frame)
+  }
   const tmpDir = fs.mkdtempSync(path.join(os.tmpdir(), 'bacs-pango-screen-title-'))
-  const inputPath = path.join(tmpDir, `input-${randomUUID()}.json`)
+  const placementPath = path.join(tmpDir, 'placement.json')
   try {
-    fs.writeFileSync(inputPath, JSON.stringify(opts.input), 'utf8')
-    await runPythonPangoRenderer(inputPath, opts.outPath)
+    args.push('--placement-json', placementPath)
+    await runPythonPangoRenderer(args, { stdin: JSON.stringify(opts.input) })
+    return JSON.parse(fs.readFileSync(placementPath, 'utf8')) as ScreenTitlePngPlacement
   } finally {
     try { fs.rmSync(tmpDir, { recursive: true, force: true }) } catch {}
   }
 }
 
-async function runPythonPangoRenderer(inputJsonPath: string, outPath: string): Promise<void> {
-  await new Promise<void>((resolve, reject) => {
-    const scriptPath = path.join(process.cwd(), 'scripts', 'pango', 'render_screen_title_png.py')
-    const args = ['-u', scriptPath, '--input-json', inputJsonPath, '--out', outPath]
-    const fontConfigFile = path.join(process.cwd(), 'assets', 'fonts', 'fonts.conf')
-    const p = spawn('python3', args, {
-      stdio: ['ignore', 'pipe', 'pipe'],
-      env: {
-        ...process.env,
-        FONTCONFIG_FILE: fontConfigFile,
-      },
-    })
-    let stderr = ''
-    const maxStderr = 8000
-    p.stderr.on('data', (d) => {
-      stderr = (stderr + String(d)).slice(-maxStderr)
+export type ScreenTitleImage = {
+  data: Buffer
+  // Full-frame placement, plus the preview scale and any autoFit sizes.
+  placement: ScreenTitlePngPlacement
+}
+
+// Render straight into memory: input over stdin, image bytes over stdout. Full
+// frame only. The placement comes back with the image so auto-fit sizes reach
+// the caller; without the pool that needs a sidecar file, which is only written
+// when some instance asks for autoFit.
+export async function renderScreenTitleImageWithPango(opts: {
+  input: ScreenTitlePngInput
+} & ScreenTitleImageOptions): Promise<ScreenTitleImage> {
+  const input = { ...opts.input, crop: false }
+  if (getPangoRendererPool()) {
+    const out = await runPooledPangoRenderer({
+      op: 'render',
+      input,
+      format: opts.format,
+      pngLevel: opts.pngLevel,
+      scale: opts.scale,
+      maxPreviewWidth: opts.maxPreviewWidth,
     })
-    p.on('error', (err) => reject(err))
-    p.on('close', (code) => {
-      if (code === 0) return resolve()
-      reject(new Error(`pango_renderer_failed:${code}:${stderr.slice(0, 800)}`))
+    return {
+      data: out.data || Buffer.alloc(0),
+      placement: (out.resp.placement as ScreenTitlePngPlacement) || fullFramePlacement(input.frame),
+    }
+  }
+  const args = ['--input-json', '-', '--out', '-', ...imageOptionArgs(opts)]
+  if (!usesAutoFit(input)) {
+    const data = await runPythonPangoRenderer(args, { stdin: JSON.stringify(input) })
+    return { data, placement: fullFramePlacement(input.frame) }
+  }
+  const tmpDir = fs.mkdtempSync(path.join(os.tmpdir(), 'bacs-pango-screen-title-'))
+  const placementPath = path.join(tmpDir, 'placement.json')
+  try {
+    args.push('--placement-json', placementPath)
+    const data = await runPythonPangoRenderer(args, { stdin: JSON.stringify(input) })
+    return { data, placement: JSON.parse(fs.readFileSync(placementPath, 'utf8')) as ScreenTitlePngPlacement }
+  } finally {
+    try { fs.rmSync(tmpDir, { recursive: true, force: true }) } catch {}
+  }
+}
+
+function usesAutoFit(input: ScreenTitlePngInput): boolean {
+  const presets = Array.isArray(input.instances) && input.instances.length ? input.instances.map((i) => i?.preset) : [input.preset]
+  return presets.some((p) => p?.autoFit === true)
+}
+
+function imageOptionArgs(opts: ScreenTitleImageOptions): string[] {
+  const args: string[] = []
+  if (opts.format) args.push('--format', opts.format)
+  if (opts.pngLevel != null) args.push('--png-level', String(Math.round(opts.pngLevel)))
+  if (opts.scale != null) args.push('--scale', String(opts.scale))
+  if (opts.maxPreviewWidth != null) args.push('--max-preview-width', String(Math.round(opts.maxPreviewWidth)))
+  return args
+}
+
+function fullFramePlacement(frame: { width: number; height: number }): ScreenTitlePngPlacement {
+  const { width, height } = frame
+  return { x: 0, y: 0, width, height, frameWidth: width, frameHeight: height }
+}
+
+export type ScreenTitleMeasurement = {
+  // Title box in frame pixels (null for empty text).
+  box: { x: number; y: number; width: number; height: number } | null
+  bleed: number
+  lines: number
+  ellipsized: boolean
+  fits: boolean
+  fontPx: number | null
+  // Effective size: the preset's fontSizePct, or the size auto-fit settled on.
+  fontSizePct: number | null
+  autoFit: boolean
+  empty?: boolean
+  text?: string
+}
+
+export type ScreenTitleMeasureInput =
+  | (ScreenTitlePngInput & { texts?: undefined })
+  | { frame: { width: number; height: number }; preset: any; texts: string[] }
+
+export type ScreenTitleMeasureResult = {
+  frame: { width: number; height: number }
+  // Set for render-style input (text / instances).
+  instances?: ScreenTitleMeasurement[]
+  // Set for { texts: [...] } input, one per candidate, in order.
+  results?: ScreenTitleMeasurement[]
+}
+
+// Layout-only: box rects, line counts and ellipsis without rasterizing a frame.
+export async function measureScreenTitlesWithPango(opts: {
+  input: ScreenTitleMeasureInput
+}): Promise<ScreenTitleMeasureResult> {
+  if (getPangoRendererPool()) {
+    const out = await runPooledPangoRenderer({ op: 'measure', input: opts.input })
+    const { ok, id, timings, ...result } = out.resp
+    return result as ScreenTitleMeasureResult
+  }
+  const out = await runPythonPangoRenderer(['--measure-json', '-'], { stdin: JSON.stringify(opts.input) })
+  return JSON.parse(out.toString('utf8')) as ScreenTitleMeasureResult
+}
+
+// Render many title PNGs in one renderer process (one GI import + font setup).
+// Jobs with identical normalized input are rendered once. Per-job failures are
+// reported in the manifest rather than thrown.
+export async function renderScreenTitlePngBatchWithPango(opts: {
+  jobs: ScreenTitlePngBatchJob[]
+}): Promise<ScreenTitlePngBatchManifest> {
+  const tmpDir = fs.mkdtempSync(path.join(os.tmpdir(), 'bacs-pango-screen-title-batch-'))
+  const batchPath = path.join(tmpDir, `batch-${randomUUID()}.json`)
+  const manifestPath = path.join(tmpDir, 'manifest.json')
+  try {
+    const jobs = opts.jobs.map((job, i) => {
+      const { outPath, id, ...input } = job
+      return { ...input, id: id != null ? id : i, out: outPath }
     })
+    fs.writeFileSync(batchPath, JSON.stringify({ jobs }), 'utf8')
+    // Exit code 5 means "manifest written, some jobs failed".
+    await runPythonPangoRenderer(['--batch-json', batchPath, '--manifest', manifestPath], { okCodes: [0, 5] })
+    return JSON.parse(fs.readFileSync(manifestPath, 'utf8')) as ScreenTitlePngBatchManifest
+  } finally {
+    try { fs.rmSync(tmpDir, { recursive: true, force: true }) } catch {}
+  }
+}
+
+export type CaptionCue = { start: number; end: number; text: string }
+
+export type CaptionAtlasSprite = {
+  id: number
+  // Rect inside the atlas PNG.
+  x: number
+  y: number
+  width: number
+  height: number
+  // Where the sprite's top-left sits in the video frame.
+  frameX: number
+  frameY: number
+  ellipsized: boolean
+}
+
+export type CaptionAtlasManifest = {
+  frame: { width: number; height: number }
+  atlas: { width: number; height: number; out: string }
+  sprites: CaptionAtlasSprite[]
+  // sprite is null for cues with empty text.
+  cues: Array<{ index: number; start: number; end: number; sprite: number | null }>
+  totalCues: number
+  distinctSprites: number
+}
+
+// One renderer call for a whole caption track: every distinct cue text is drawn once
+// into a packed atlas PNG; the manifest maps cues to atlas rects and frame positions.
+export async function renderCaptionAtlasWithPango(opts: {
+  frame: { width: number; height: number }
+  preset: any
+  cues: CaptionCue[]
+  outPath: string
+  maxAtlasWidth?: number
+}): Promise<CaptionAtlasManifest> {
+  const input = { frame: opts.frame, preset: opts.preset, cues: opts.cues, maxAtlasWidth: opts.maxAtlasWidth }
+  const stdout = await runPythonPangoRenderer(
+    ['--captions-json', '-', '--out', opts.outPath, '--png-level', '1'],
+    { stdin: JSON.stringify(input) }
+  )
+  return JSON.parse(stdout.toString('utf8')) as CaptionAtlasManifest
+}
+
+// filter_complex parts that burn a caption atlas onto a video in one pass: the atlas
+// (looped still input) is split once per sprite, cropped, and overlaid at the sprite's
+// frame position, enabled during every cue that uses it.
+export function captionAtlasOverlayFilter(
+  manifest: CaptionAtlasManifest,
+  labels: { base: string; atlas: string; out: string }
+): string[] {
+  const windows = new Map<number, Array<[number, number]>>()
+  for (const cue of manifest.cues) {
+    if (cue.sprite == null) continue
+    const arr = windows.get(cue.sprite) || []
+    arr.push([cue.start, cue.end])
+    windows.set(cue.sprite, arr)
+  }
+  const used = manifest.sprites.filter((sp) => windows.has(sp.id))
+  if (!used.length) return [`[${labels.base}]null[${labels.out}]`]
+
+  const parts: string[] = []
+  if (used.length === 1) parts.push(`[${labels.atlas}]format=rgba[cap_s0]`)
+  else parts.push(`[${labels.atlas}]format=rgba,split=${used.length}${used.map((_sp, i) => `[cap_s${i}]`).join('')}`)
+  let prev = labels.base
+  used.forEach((sp, i) => {
+    parts.push(`[cap_s${i}]crop=${sp.width}:${sp.height}:${sp.x}:${sp.y}[cap_c${i}]`)
+    const enable = (windows.get(sp.id) || [])
+      .map(([a, b]) => `between(t\\,${a.toFixed(3)}\\,${b.toFixed(3)})`)
+      .join('+')
+    const next = i === used.length - 1 ? labels.out : `cap_v${i}`
+    parts.push(`[${prev}][cap_c${i}]overlay=${sp.frameX}:${sp.frameY}:shortest=1:enable='${enable}'[${next}]`)
+    prev = next
   })
+  return parts
+}
+
+// Structured record the renderer prints on stderr with --timings.
+// Server-mode responses carry the same record (without "event") under "timings".
+export type ScreenTitleRenderTimings = {
+  event?: 'timings'
+  totalMs: number
+  // import, fontconfig, shaping, shadow, gradient_load, draw, cache_lookup, encode, write
+  phases: Record<string, number>
+  instances: Array<{ index: number; shapeMs: number; chars: number; lines: number; fontPx: number }>
+  surface?: { width: number; height: number }
+  format?: string
+  bytes?: number
+  cache?: 'hit' | 'miss'
+  exitCode?: number
+}
+
+function parseTimingsLine(line: string): ScreenTitleRenderTimings | null {
+  if (!line.startsWith('{"event": "timings"')) return null
+  try {
+    return JSON.parse(line) as ScreenTitleRenderTimings
+  } catch {
+    return null
+  }
+}
+
+export function applyRendererTimings(span: Span, timings: ScreenTitleRenderTimings) {
+  const attrs: Record<string, string | number> = {
+    'pango.total_ms': timings.totalMs,
+    'pango.instances': timings.instances.length,
+  }
+  for (const [phase, ms] of Object.entries(timings.phases || {})) attrs[`pango.phase.${phase}_ms`] = ms
+  if (timings.surface) {
+    attrs['pango.surface.width'] = timings.surface.width
+    attrs['pango.surface.height'] = timings.surface.height
+  }
+  if (timings.format) attrs['pango.output_format'] = timings.format
+  if (timings.bytes != null) attrs['pango.output_bytes'] = timings.bytes
+  if (timings.cache) attrs['pango.cache'] = timings.cache
+  span.setAttributes(attrs)
+  for (const inst of timings.instances) {
+    span.addEvent('pango.instance.shaped', {
+      'pango.instance.index': inst.index,
+      'pango.instance.shape_ms': inst.shapeMs,
+      'pango.instance.chars': inst.chars,
+      'pango.instance.lines': inst.lines,
+      'pango.instance.font_px': inst.fontPx,
+    })
+  }
+}
+
+function rendererMode(rendererArgs: string[]): string {
+  if (rendererArgs.includes('--batch-json')) return 'batch'
+  if (rendererArgs.includes('--measure-json')) return 'measure'
+  if (rendererArgs.includes('--captions-json')) return 'captions'
+  return 'render'
+}
+
+// Pool path: one warm --serve worker round trip, traced like the one-shot process.
+async function runPooledPangoRenderer(req: PangoRendererRequest): Promise<PangoRendererResult> {
+  const pool = getPangoRendererPool()!
+  return await withSubprocessSpan(
+    {
+      spanName: 'subprocess.pango.render',
+      command: 'python3',
+      operation: 'subprocess.pango.render',
+      attrs: { 'subprocess.command_label': `pool.${req.op}` },
+    },
+    async (span) => {
+      const out = await pool.run({ ...req, timings: SCREEN_TITLE_RENDER_TIMINGS || undefined })
+      span.setAttributes({
+        'pango.pool.queue_wait_ms': out.queueWaitMs,
+        'pango.pool.coalesced': out.coalesced,
+      })
+      if (out.resp?.timings) {
+        try { applyRendererTimings(span, out.resp.timings as ScreenTitleRenderTimings) } catch {}
+      }
+      markSubprocessResult(span, { exitCode: 0, success: true })
+      return out
+    }
+  )
+}
+
+async function runPythonPangoRenderer(
+  rendererArgs: string[],
+  opts: { okCodes?: number[]; stdin?: string } = {}
+): Promise<Buffer> {
+  const okCodes = opts.okCodes || [0]
+  return await withSubprocessSpan(
+    {
+      spanName: 'subprocess.pango.render',
+      command: 'python3',
+      operation: 'subprocess.pango.render',
+      attrs: { 'subprocess.command_label': rendererMode(rendererArgs) },
+    },
+    async (span) => {
+      return await new Promise<Buffer>((resolve, reject) => {
+        const spec = pangoRendererSpawnSpec(SCREEN_TITLE_RENDER_TIMINGS ? [...rendererArgs, '--timings'] : rendererArgs)
+        const p = spawn(spec.command, spec.args, {
+          stdio: ['pipe', 'pipe', 'pipe'],
+          env: spec.env,
+        })
+        const chunks: Buffer[] = []
+        p.stdout.on('data', (d: Buffer) => {
+          chunks.push(d)
+        })
+        let stderr = ''
+        const maxStderr = 8000
+        // The timings record is one stderr line; scan complete lines as they arrive so
+        // it survives the stderr tail truncation.
+        let pendingLine = ''
+        let timings: ScreenTitleRenderTimings | null = null
+        p.stderr.on('data', (d) => {
+          const chunk = String(d)
+          stderr = (stderr + chunk).slice(-maxStderr)
+          pendingLine = (pendingLine + chunk).slice(-1024 * 1024)
+          let nl = pendingLine.indexOf('\n')
+          while (nl >= 0) {
+            timings = parseTimingsLine(pendingLine.slice(0, nl)) || timings
+            pendingLine = pendingLine.slice(nl + 1)
+            nl = pendingLine.indexOf('\n')
+          }
+        })
+        p.on('error', (err) => reject(err))
+        p.on('close', (code) => {
+          if (timings) {
+            try { applyRendererTimings(span, timings) } catch {}
+          }
+          const success = code != null && okCodes.includes(code)
+          markSubprocessResult(span, { exitCode: code, success })
+          if (success) return resolve(Buffer.concat(chunks))
+          const errText = stderr
+            .split('\n')
+            .filter((line) => !parseTimingsLine(line))
+            .join('\n')
+          reject(new Error(`pango_renderer_failed:${code}:${errText.slice(0, 800)}`))
+        })
+        // The renderer may exit before reading stdin (bad args); the close handler reports that.
+        p.stdin.on('error', () => {})
+        if (opts.stdin != null) p.stdin.end(opts.stdin, 'utf8')
+        else p.stdin.end()
+      })
+    }
+  )
 }